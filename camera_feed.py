@@ -1,15 +1,69 @@
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
 from picamera2 import Picamera2
+import threading
 import time
 import cv2
 import numpy as np
 
+# governor.py is shared with the web app and lives in drone-control-website/;
+# run from the repository root with drone-control-website on PYTHONPATH
+from governor import create_governor
+
 app = FastAPI()
 
 # Global camera objects
 picam2 = None
 
+# Full sensor resolution with optimized JPEG while the Pi stays cool; the
+# governor (governor.py) steps down to smaller, cheaper frames when it runs
+# hot or frames take longer than their 33 ms budget
+FEED_LADDER = [
+    {"fps": 30, "size": (1536, 864), "jpeg_quality": 85, "jpeg_optimize": 1},
+    {"fps": 30, "size": (1280, 720), "jpeg_quality": 80, "jpeg_optimize": 1},
+    {"fps": 25, "size": (1280, 720), "jpeg_quality": 75, "jpeg_optimize": 0},
+    {"fps": 20, "size": (960, 540), "jpeg_quality": 70, "jpeg_optimize": 0},
+    {"fps": 15, "size": (640, 360), "jpeg_quality": 65, "jpeg_optimize": 0},
+]
+governor = create_governor("feed", FEED_LADDER, target_latency=0.033)
+camera_settings = None
+camera_lock = threading.Lock()
+
+def frame_duration(settings):
+    duration = int(1000000 / settings["fps"])
+    return (duration, duration)
+
+def configure_camera(settings):
+    global camera_settings
+    config = picam2.create_video_configuration(
+        main={
+            "size": settings["size"],  # Native sensor resolution at level 0
+            "format": "XBGR8888"
+        },
+        controls={
+            "FrameDurationLimits": frame_duration(settings),  # 30 FPS at level 0
+            "AwbEnable": True,
+            "AeEnable": True
+        }
+    )
+    picam2.configure(config)
+    camera_settings = settings
+
+# Apply a new governor level between frames; viewers share the camera
+def apply_camera_settings():
+    global camera_settings
+    with camera_lock:
+        settings = governor.settings
+        if settings is camera_settings:
+            return
+        if settings["size"] != camera_settings["size"]:
+            picam2.stop()
+            configure_camera(settings)
+            picam2.start()
+        else:
+            picam2.set_controls({"FrameDurationLimits": frame_duration(settings)})
+            camera_settings = settings
+
 def initialize_camera():
     global picam2
     try:
@@ -17,18 +71,7 @@ def initialize_camera():
         print("Camera initialized successfully.")
 
         # High-resolution configuration with sensor's native aspect ratio (16:9)
-        config = picam2.create_video_configuration(
-            main={
-                "size": (1536, 864),  # Native sensor resolution
-                "format": "XBGR8888"
-            },
-            controls={
-                "FrameDurationLimits": (33333, 33333),  # 30 FPS
-                "AwbEnable": True,
-                "AeEnable": True
-            }
-        )
-        picam2.configure(config)
+        configure_camera(governor.settings)
         print("Camera configured successfully.")
         
         picam2.start()
@@ -41,14 +84,20 @@ def initialize_camera():
 def generate_frames():
     while True:
         try:
+            if governor.settings is not camera_settings:
+                apply_camera_settings()
+            settings = camera_settings
+
             # Capture full sensor frame
             rgb = picam2.capture_array("main")
+            captured = time.perf_counter()
             
             # Convert to BGR and encode
             bgr = cv2.cvtColor(rgb, cv2.COLOR_RGBA2BGR)
             _, jpeg = cv2.imencode('.jpg', bgr, 
-                                  [int(cv2.IMWRITE_JPEG_QUALITY), 85,
-                                   int(cv2.IMWRITE_JPEG_OPTIMIZE), 1])
+                                  [int(cv2.IMWRITE_JPEG_QUALITY), settings["jpeg_quality"],
+                                   int(cv2.IMWRITE_JPEG_OPTIMIZE), settings["jpeg_optimize"]])
+            governor.observe(time.perf_counter() - captured)
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
         except Exception as e:
@@ -106,6 +155,7 @@ def cleanup():
 if __name__ == '__main__':
     try:
         initialize_camera()
+        governor.start()
         import uvicorn
         uvicorn.run(app, host="0.0.0.0", port=5000)
     finally:
@@ -0,0 +1,183 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from multiprocessing.connection import Listener
+
+logger = logging.getLogger(__name__)
+
+# Supervisor for a persistent, warm AI worker (drone.py --worker).
+#
+# The worker is started once, loads the model, opens the camera and then
+# waits paused. Switching to AI mode only sends "resume" over the control
+# channel; leaving AI mode sends "pause". The worker pushes heartbeats with
+# its inference stats, and the supervisor restarts it if it dies or stops
+# answering, or if it reports that it failed to load the model.
+
+HEARTBEAT_TIMEOUT = 5.0
+RESTART_BACKOFF_MAX = 30.0
+# Heartbeats for this long after a start clear the restart backoff
+STABLE_PERIOD = 60.0
+
+
+class AIWorkerSupervisor:
+    def __init__(self, command=None, cwd=None, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.command = command or ["python3", "drone.py", "--worker"]
+        self.cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+        self.heartbeat_timeout = heartbeat_timeout
+        self.authkey = os.urandom(16)
+        self.listener = None
+        self.process = None
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.running = False
+        self.want_active = False
+        self.state = "stopped"
+        self.restarts = 0  # over the server's lifetime
+        self.failures = 0  # in a row, without a stable run in between; sets the backoff
+        self.started_at = 0.0
+        self.last_heartbeat = 0.0
+        self.stats = {}
+        self.error = None
+        self.pending_switch = None
+        self.last_switch_ms = None
+
+    def start(self):
+        self.listener = Listener(("127.0.0.1", 0), authkey=self.authkey)
+        self.running = True
+        self._spawn()
+        threading.Thread(target=self._monitor, name="ai-supervisor", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self._send({"cmd": "shutdown"})
+        with self.lock:
+            process = self.process
+        if process and process.poll() is None:
+            try:
+                process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+                process.wait()
+        if self.listener:
+            self.listener.close()
+        self.state = "stopped"
+
+    def resume(self):
+        self.want_active = True
+        self._switch("resume")
+
+    def pause(self):
+        self.want_active = False
+        self._switch("pause")
+
+    def status(self):
+        with self.lock:
+            pid = self.process.pid if self.process else None
+        age = time.time() - self.last_heartbeat if self.last_heartbeat else None
+        return {
+            "state": self.state,
+            "pid": pid,
+            "restarts": self.restarts,
+            "consecutive_failures": self.failures,
+            "error": self.error,
+            "heartbeat_age_s": round(age, 2) if age is not None else None,
+            "last_switch_ms": self.last_switch_ms,
+            "stats": self.stats,
+        }
+
+    def _switch(self, cmd):
+        self.pending_switch = (cmd, time.perf_counter())
+        if not self._send({"cmd": cmd}):
+            logger.warning(f"AI worker not connected, '{cmd}' will be applied when it is ready")
+
+    def _send(self, message):
+        conn = self.conn
+        if conn is None:
+            return False
+        try:
+            with self.send_lock:
+                conn.send(message)
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def _spawn(self):
+        env = dict(os.environ)
+        address = self.listener.address
+        env["AEROSENSE_WORKER_ADDRESS"] = f"{address[0]}:{address[1]}"
+        env["AEROSENSE_WORKER_AUTHKEY"] = self.authkey.hex()
+        with self.lock:
+            self.process = subprocess.Popen(self.command, cwd=self.cwd, env=env)
+        self.state = "starting"
+        self.started_at = self.last_heartbeat = time.time()
+        logger.info(f"AI worker started (pid {self.process.pid})")
+        threading.Thread(target=self._accept, name="ai-worker-channel", daemon=True).start()
+
+    def _accept(self):
+        try:
+            conn = self.listener.accept()
+        except (OSError, EOFError):
+            return
+        self.conn = conn
+        # Bring a fresh or restarted worker to the state the operator selected
+        self._send({"cmd": "resume" if self.want_active else "pause"})
+        self._read(conn)
+
+    def _read(self, conn):
+        while self.running:
+            try:
+                message = conn.recv()
+            except (OSError, EOFError):
+                break
+            self.last_heartbeat = time.time()
+            if message.get("type") == "heartbeat":
+                self.state = message.get("state", self.state)
+                self.stats = message.get("stats", {})
+                self.error = message.get("error")
+                if (self.failures and self.state != "failed"
+                        and self.last_heartbeat - self.started_at >= STABLE_PERIOD):
+                    logger.info(f"AI worker stable for {STABLE_PERIOD:.0f} s, restart backoff reset")
+                    self.failures = 0
+            elif message.get("type") == "ack":
+                self.state = message.get("state", self.state)
+                pending = self.pending_switch
+                if pending and pending[0] == message.get("cmd"):
+                    self.last_switch_ms = round((time.perf_counter() - pending[1]) * 1000, 2)
+                    self.pending_switch = None
+        if self.conn is conn:
+            self.conn = None
+        conn.close()
+
+    def _restart(self, reason):
+        logger.warning(f"Restarting AI worker: {reason}")
+        self.state = "restarting"
+        self.restarts += 1
+        self.failures += 1
+        with self.lock:
+            process = self.process
+        if process and process.poll() is None:
+            process.kill()
+            process.wait()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        time.sleep(min(RESTART_BACKOFF_MAX, 2 ** min(self.failures, 5) * 0.5))
+        if self.running:
+            self._spawn()
+
+    def _monitor(self):
+        while self.running:
+            time.sleep(1)
+            with self.lock:
+                process = self.process
+            if process is None:
+                continue
+            if process.poll() is not None:
+                self._restart(f"exited with code {process.returncode}")
+            elif self.state == "failed":
+                self._restart(f"failed to start: {self.error}")
+            elif time.time() - self.last_heartbeat > self.heartbeat_timeout:
+                self._restart("heartbeat timeout")
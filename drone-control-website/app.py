@@ -1,16 +1,13 @@
-import subprocess
-from flask import Flask, render_template, Response, request
+from flask import Flask, render_template, Response, request, jsonify
 from flask_socketio import SocketIO
-import random
-import time
+from werkzeug.wsgi import wrap_file
 import logging
-import threading
 import os
 import eventlet
 import atexit
-
-# Global variable to store the AI process
-ai_process = None
+from assets import AssetPipeline
+from control_server import ControlServer
+import metrics
 
 # SSL Certificate Paths
 ssl_key = "/home/GokulDragon/ssl/key.pem"
@@ -23,15 +20,16 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins="*")
 
-# Simulated drone telemetry
-simulated_drone = {
-    "lat": 51.5074,
-    "lon": -0.1278,
-    "alt": 10.0,
-    "armed": False,
-    "battery": 85,
-    "signal": 98
-}
+# Fleet, telemetry, AI worker and the Socket.IO event handlers (control_server.py);
+# asgi_app.py serves the same handlers and the video from a single process
+control = ControlServer(socketio)
+fleet = control.fleet
+telemetry = control.telemetry
+ai_worker = control.ai_worker
+
+# Content-hashed, precompressed static files on /assets (assets.py)
+assets = AssetPipeline(os.path.join(app.root_path, 'static')).build()
+app.jinja_env.globals.update(asset_url=assets.url, asset_urls=assets.urls)
 
 # Get the host IP address for use in templates
 def get_host_ip():
@@ -47,26 +45,6 @@ def get_host_ip():
         s.close()
     return ip_address
 
-# Synchronous telemetry task
-def telemetry_task():
-    while True:
-        time.sleep(0.1)  # Simulate a delay
-        simulated_drone["lat"] += random.uniform(-0.0001, 0.0001)
-        simulated_drone["lon"] += random.uniform(-0.0001, 0.0001)
-        simulated_drone["alt"] += random.uniform(-0.1, 0.1)
-        simulated_drone["battery"] = max(0, min(100, simulated_drone["battery"] + random.uniform(-0.05, 0.01)))
-        simulated_drone["signal"] = max(0, min(100, simulated_drone["signal"] + random.uniform(-0.5, 0.5)))
-        
-        # Emit telemetry data to all clients
-        socketio.emit('telemetry', {
-            'lat': simulated_drone["lat"],
-            'lon': simulated_drone["lon"],
-            'alt': simulated_drone["alt"],
-            'armed': simulated_drone["armed"],
-            'battery': simulated_drone["battery"],
-            'signal': simulated_drone["signal"]
-        })
-
 @app.route('/')
 def login():
     return render_template('login.html')
@@ -77,74 +55,71 @@ def controls():
     host_ip = get_host_ip()
     return render_template('controls.html', fastapi_url=f"https://{host_ip}:8000")
 
+@app.route('/assets/<path:name>')
+def asset(name):
+    status, path, headers = assets.resolve(name, request.headers.get('If-None-Match'),
+                                           request.headers.get('Accept-Encoding'))
+    if path is None:
+        return Response(status=status, headers=headers)
+    # Streamed through the server's wsgi.file_wrapper when it has one
+    return Response(wrap_file(request.environ, open(path, 'rb')), status, headers, direct_passthrough=True)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/telemetry/stats')
+def telemetry_stats():
+    return jsonify(telemetry.metrics())
+
+@app.route('/control/stats')
+def control_stats():
+    return jsonify(control.control_stats())
+
+@app.route('/telemetry/history')
+def telemetry_history():
+    try:
+        return jsonify(control.telemetry_history(
+            lambda name, default, type: request.args.get(name, default, type=type)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/flightlog/stats')
+def flight_log_stats():
+    return jsonify(control.flight_log.stats() if control.flight_log else {'enabled': False})
+
+@app.route('/vehicles')
+def vehicles():
+    return jsonify(fleet.describe())
+
+@app.route('/vehicle/stats')
+def vehicle_stats():
+    return jsonify(fleet.stats())
+
+@app.route('/geofence')
+def geofence_stats():
+    return jsonify(control.geofence.stats() if control.geofence else {"zones": 0})
+
+@app.route('/ai/status')
+def ai_status():
+    return jsonify(control.ai_status())
+
 @socketio.on('connect')
 def handle_connect():
-    print("Client connected")
-    # Start the telemetry task in a background thread
-    threading.Thread(target=telemetry_task, daemon=True).start()
-    socketio.emit('arm', simulated_drone["armed"])
-
-@socketio.on('control')
-def handle_control(data):
-    print(f"Received control: {data}")
-    
-    if isinstance(data, dict):
-        if data.get('type') == 'keyboard':
-            if data.get('code') == 'arm':
-                simulated_drone["armed"] = True
-                socketio.emit('arm', True)
-            elif data.get('code') == 'disarm':
-                simulated_drone["armed"] = False
-                socketio.emit('arm', False)
-            elif data.get('code') == 'takeoff' and simulated_drone["armed"]:
-                print("Takeoff command received")
-                socketio.emit('status', "Taking off...")
-            elif data.get('code') == 'land' and simulated_drone["armed"]:
-                print("Land command received")
-                socketio.emit('status', "Landing...")
-                
-        elif data.get('type') in ['left-joystick', 'right-joystick']:
-            if simulated_drone["armed"]:
-                x = data.get('x', 0)
-                y = data.get('y', 0)
-                print(f"Processing joystick: {data['type']} X:{x} Y:{y}")
-
-    elif isinstance(data, str):
-        if data == 'arm':
-            simulated_drone["armed"] = True
-            socketio.emit('arm', True)
-        elif data == 'disarm':
-            simulated_drone["armed"] = False
-            socketio.emit('arm', False)
-        elif data == 'takeoff' and simulated_drone["armed"]:
-            socketio.emit('status', "Taking off...")
-        elif data == 'land' and simulated_drone["armed"]:
-            socketio.emit('status', "Landing...")
-
-
-@socketio.on('mode')
-def handle_mode_change(mode):
-    global ai_process
-
-    if mode == "ai":
-        if ai_process is None:
-            print("Starting AI Control...")
-            ai_process = subprocess.Popen(["python3", "drone.py"])
-    else:
-        if ai_process is not None:
-            print("Stopping AI Control...")
-            socketio.emit('stop_ai')  # Send stop signal to drone.py
-            ai_process.terminate()
-            ai_process = None
-
-def cleanup():
-    global ai_process
-    if ai_process and ai_process.poll() is None:  # Ensure it's running before killing
-        ai_process.terminate()
-        ai_process.wait()
-        ai_process = None
-
-atexit.register(cleanup)
+    control.connect(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    control.disconnect(request.sid)
+
+# Every other event goes to its ControlServer handler, with the client's sid
+def bind(event, handler):
+    socketio.on_event(event, lambda *args: handler(request.sid, *args))
+
+for event, handler in control.events().items():
+    bind(event, handler)
+
+atexit.register(control.close)
 
 
 if __name__ == '__main__':
@@ -155,6 +130,9 @@ if __name__ == '__main__':
         print("❌ ERROR: SSL certificate or key file not found!")
         exit(1)
 
+    # Warm AI worker, telemetry history and the AI command queue from startup
+    control.start()
+
     host_ip = get_host_ip()
     print(f"🔹 Server running! Access it at: **https://{host_ip}:5000**")
 
@@ -164,4 +142,4 @@ if __name__ == '__main__':
                           certfile=ssl_cert,
                           keyfile=ssl_key,
                           server_side=True),app
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+# Encode video on a pool so JPEG encoding overlaps capture and stays off the event loop
+os.environ.setdefault("AEROSENSE_ENCODE_WORKERS", "2")
+
+import socketio
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+
+import streaming
+from assets import AssetPipeline
+from control_server import ControlServer
+from profiling import install_signal_handler
+
+# Optional single-process deployment: the Socket.IO control channel
+# (python-socketio ASGI), telemetry, the web pages and the video endpoints
+# of streaming.py in one asyncio event loop on one TLS port, instead of
+# app.py (eventlet, port 5000) plus streaming.py (uvicorn, port 8000). The
+# page and the video share an origin, so there is no CORS.
+#
+# The control handlers are the same ControlServer ones app.py serves; they
+# run inline on the event loop, as they ran inline on eventlet's hub.
+# Background tasks (telemetry, control loops, AI command queue) run as
+# threads and emit through the loop.
+#
+# Usage: python asgi_app.py
+#        uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --ssl-keyfile ... --ssl-certfile ...
+# bench_deployment.py compares it with the two-process setup.
+
+logger = logging.getLogger(__name__)
+
+ssl_key = "/home/GokulDragon/ssl/key.pem"
+ssl_cert = "/home/GokulDragon/ssl/cert.pem"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# The part of the Flask-SocketIO interface ControlServer, Fleet,
+# TelemetryPublisher and ControlLoop use, over a python-socketio AsyncServer
+class ThreadedSocketIO:
+    def __init__(self, sio):
+        self.sio = sio
+        self.server = RoomManager(sio)
+        self.loop = None  # set at startup
+
+    # Thread-safe and non-blocking; the emit runs on the event loop
+    def emit(self, event, *args, to=None, room=None, namespace=None, skip_sid=None):
+        if self.loop is None:
+            return
+        data = args[0] if len(args) == 1 else tuple(args) if args else None
+        asyncio.run_coroutine_threadsafe(
+            self.sio.emit(event, data, to=to or room, namespace=namespace, skip_sid=skip_sid), self.loop)
+
+    def start_background_task(self, target, *args, **kwargs):
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def create_event(self):
+        return threading.Event()
+
+
+# Synchronous room membership (AsyncServer.enter_room is a coroutine); called
+# from handlers, so always on the event loop thread
+class RoomManager:
+    def __init__(self, sio):
+        self.sio = sio
+
+    @property
+    def eio(self):
+        return self.sio.eio
+
+    def enter_room(self, sid, room, namespace=None):
+        self.sio.manager.basic_enter_room(sid, namespace or '/', room)
+
+    def leave_room(self, sid, room, namespace=None):
+        self.sio.manager.basic_leave_room(sid, namespace or '/', room)
+
+
+# Connect and events can be emitted to before the connect handler returns
+sio = socketio.AsyncServer(async_mode='asgi', always_connect=True)
+bridge = ThreadedSocketIO(sio)
+control = ControlServer(bridge)
+fleet = control.fleet
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    control.connect(sid)
+
+
+@sio.event
+async def disconnect(sid, *args):
+    control.disconnect(sid)
+
+
+def bind(event, handler):
+    async def on_event(sid, *args):
+        return handler(sid, *args)
+    sio.on(event, on_event)
+
+
+for event, handler in control.events().items():
+    bind(event, handler)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    bridge.loop = asyncio.get_running_loop()
+    control.start()
+    streaming.start_capture()
+    yield
+    control.close()
+
+
+web = FastAPI(lifespan=lifespan)
+web.include_router(streaming.router)
+web.mount("/static", StaticFiles(directory=os.path.join(HERE, "static")), name="static")
+templates = Jinja2Templates(directory=os.path.join(HERE, "templates"))
+
+# Content-hashed, precompressed static files on /assets (assets.py)
+assets = AssetPipeline(os.path.join(HERE, "static")).build()
+templates.env.globals.update(asset_url=assets.url, asset_urls=assets.urls)
+
+
+@web.get("/assets/{name:path}")
+def asset(name: str, request: Request):
+    status, path, headers = assets.resolve(name, request.headers.get('if-none-match'),
+                                           request.headers.get('accept-encoding'))
+    if path is None:
+        return Response(status_code=status, headers=headers)
+    return FileResponse(path, headers=headers)
+
+
+@web.get("/")
+def login(request: Request):
+    return templates.TemplateResponse(request, 'login.html')
+
+
+@web.get("/controls")
+def controls(request: Request):
+    # Video is served from this origin
+    return templates.TemplateResponse(request, 'controls.html',
+                                      {'fastapi_url': str(request.base_url).rstrip('/')})
+
+
+@web.get("/telemetry/stats")
+def telemetry_stats():
+    return control.telemetry.metrics()
+
+
+@web.get("/control/stats")
+def control_stats():
+    return control.control_stats()
+
+
+@web.get("/telemetry/history")
+def telemetry_history(request: Request):
+    def get(name, default, type):
+        try:
+            return type(request.query_params[name])
+        except (KeyError, ValueError):
+            return default
+    try:
+        return control.telemetry_history(get)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+
+@web.get("/flightlog/stats")
+def flight_log_stats():
+    return control.flight_log.stats() if control.flight_log else {'enabled': False}
+
+
+@web.get("/vehicles")
+def vehicles():
+    return fleet.describe()
+
+
+@web.get("/vehicle/stats")
+def vehicle_stats():
+    return fleet.stats()
+
+
+@web.get("/geofence")
+def geofence_stats():
+    return control.geofence.stats() if control.geofence else {"zones": 0}
+
+
+@web.get("/ai/status")
+def ai_status():
+    return control.ai_status()
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=web)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not os.path.exists(ssl_key) or not os.path.exists(ssl_cert):
+        print("❌ ERROR: SSL certificate or key file not found!")
+        exit(1)
+    install_signal_handler(streaming.profiler)
+    uvicorn.run(app, host="0.0.0.0", port=5000, ssl_keyfile=ssl_key, ssl_certfile=ssl_cert)
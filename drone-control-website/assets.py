@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import sys
+
+import metrics
+
+# Optional: brotli variants are only built when the brotli package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Static asset pipeline for the web pages (the multi-megabyte MediaPipe bundle
+# in particular), served on /assets by app.py and asgi_app.py.
+#
+# build() walks static/ once, at startup or ahead of time with
+# `python assets.py`:
+#   - every file gets a content-hashed name, static/mediapipe/hands.js ->
+#     /assets/mediapipe/hands.<sha256[:12]>.js; templates link through
+#     asset_url() and scripts get the hashed names via urls()
+#   - gzip and (with the brotli package) brotli variants are written to
+#     AEROSENSE_ASSET_CACHE (default assets-cache/ next to this file,
+#     whatever the working directory), keyed by content hash so a rebuild
+#     only compresses changed files; a variant is kept if it saves 10%
+#   - url() returns None for a file that is not under static/, so templates
+#     can leave out optional files instead of linking a 404
+# Requests pick the smallest variant the client accepts. Hashed names are
+# served `Cache-Control: immutable` for a year; plain names must revalidate.
+# Both carry a strong ETag and If-None-Match gets a 304. Files are streamed
+# from disk by the server's file response (wsgi.file_wrapper / FileResponse,
+# which can use sendfile on plain connections) rather than read into memory.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("AEROSENSE_ASSET_CACHE", os.path.join(HERE, "assets-cache"))
+PREFIX = "/assets"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS = 1024
+# Already compressed formats, not worth another pass
+INCOMPRESSIBLE = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".gz", ".br", ".zip"}
+ENCODINGS = ("br", "gzip")  # preference order
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+ASSET_RESPONSES = metrics.counter("aerosense_asset_responses_total", "Static asset responses",
+                                  ["status", "encoding"])
+ASSET_BYTES = metrics.counter("aerosense_asset_bytes_total", "Static asset bytes sent", ["encoding"])
+
+mimetypes.add_type("application/wasm", ".wasm")
+
+
+class Asset:
+    def __init__(self, name, path, digest, size):
+        self.name = name  # relative to static/, with forward slashes
+        self.path = path
+        self.digest = digest
+        self.size = size
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f"{stem}.{digest[:12]}{ext}"
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type == "application/javascript":
+            self.content_type += "; charset=utf-8"
+        self.variants = {}  # encoding -> (path, size)
+
+    def etag(self, encoding=None):
+        return f'"{self.digest[:16]}-{encoding}"' if encoding else f'"{self.digest[:16]}"'
+
+
+class AssetPipeline:
+    def __init__(self, root, cache_dir=CACHE_DIR, prefix=PREFIX):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.prefix = prefix
+        self.assets = {}  # name -> Asset
+        self.by_hashed_name = {}
+
+    def build(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        assets = {}
+        compressed = 0
+        for directory, _, files in os.walk(self.root):
+            for filename in sorted(files):
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                asset = Asset(name, path, file_digest(path), os.path.getsize(path))
+                compressed += self._compress(asset)
+                assets[name] = asset
+        self.assets = assets
+        self.by_hashed_name = {asset.hashed_name: asset for asset in assets.values()}
+        saved = sum(asset.size - min(size for _, size in asset.variants.values())
+                    for asset in assets.values() if asset.variants)
+        logger.info(f"Asset pipeline: {len(assets)} files, {compressed} variants built, "
+                    f"{saved / 1024:.0f} KiB saved per full load with the best encoding")
+        return self
+
+    # Write missing gzip/brotli variants for an asset; returns how many were built
+    def _compress(self, asset):
+        if asset.size < MIN_COMPRESS or os.path.splitext(asset.name)[1].lower() in INCOMPRESSIBLE:
+            return 0
+        built = 0
+        data = None
+        for encoding in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            path = os.path.join(self.cache_dir, asset.digest + SUFFIXES[encoding])
+            skipped = path + ".skip"  # compressed, but not enough smaller to be worth serving
+            if os.path.exists(skipped):
+                continue
+            if not os.path.exists(path):
+                if data is None:
+                    with open(asset.path, "rb") as f:
+                        data = f.read()
+                packed = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+                if len(packed) > asset.size * 0.9:
+                    open(skipped, "w").close()
+                    continue
+                # Write then rename, so a concurrent server never serves a partial file
+                with open(path + ".tmp", "wb") as f:
+                    f.write(packed)
+                os.replace(path + ".tmp", path)
+                built += 1
+            asset.variants[encoding] = (path, os.path.getsize(path))
+        return built
+
+    # Hashed URL of a file under static/, or None if there is no such file
+    def url(self, name):
+        asset = self.assets.get(name)
+        return f"{self.prefix}/{asset.hashed_name}" if asset else None
+
+    # Hashed URLs of every asset under a directory, keyed by file name (for MediaPipe's locateFile)
+    def urls(self, directory):
+        directory = directory.rstrip("/") + "/"
+        return {name[len(directory):]: self.url(name) for name in self.assets if name.startswith(directory)}
+
+    # Pick the response for /assets/<name>: (status, path or None, headers)
+    def resolve(self, name, if_none_match=None, accept_encoding=None):
+        asset = self.by_hashed_name.get(name)
+        cache_control = IMMUTABLE
+        if asset is None:
+            asset = self.assets.get(name)
+            cache_control = REVALIDATE
+        if asset is None:
+            ASSET_RESPONSES.labels("404", "none").inc()
+            return 404, None, {}
+
+        encoding = None
+        if asset.variants:
+            accepted = accepted_encodings(accept_encoding)
+            encoding = next((e for e in ENCODINGS if e in asset.variants and e in accepted), None)
+        headers = {"ETag": asset.etag(encoding), "Cache-Control": cache_control}
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if if_none_match and etag_matches(if_none_match, asset):
+            ASSET_RESPONSES.labels("304", encoding or "identity").inc()
+            return 304, None, headers
+
+        if encoding:
+            path, size = asset.variants[encoding]
+            headers["Content-Encoding"] = encoding
+        else:
+            path, size = asset.path, asset.size
+        headers["Content-Type"] = asset.content_type
+        headers["Content-Length"] = str(size)
+        ASSET_RESPONSES.labels("200", encoding or "identity").inc()
+        ASSET_BYTES.labels(encoding or "identity").inc(size)
+        return 200, path, headers
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Content codings with a non-zero q in an Accept-Encoding header
+def accepted_encodings(header):
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+# If-None-Match against any representation of the asset (weak comparison)
+def etag_matches(header, asset):
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(asset.etag(encoding) in tags for encoding in (None, *asset.variants))
+
+
+if __name__ == '__main__':
+    # Build ahead of time, e.g. at install: python assets.py [static dir]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(HERE, "static")
+    AssetPipeline(root).build()
@@ -0,0 +1,179 @@
+import argparse
+import contextlib
+import gc
+import resource
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_pool import PART_HEADER, PART_TRAILER, FramePool, mjpeg_part
+
+# Per-frame allocation churn of the streaming.py capture loop, with fresh
+# arrays per frame (AEROSENSE_FRAME_POOL=0, the old loop) against pooled
+# buffers (the default).
+#
+# Each frame goes capture -> BGRA to BGR -> overlay -> JPEG -> publish to
+# --viewers MJPEG viewers, as in streaming.py. The camera is simulated by a
+# fixed XRGB8888 buffer refreshed in place from a few synthetic scenes
+# (--camera uses picamera2 instead). Reported per frame:
+#   ms          median loop time
+#   faults      minor page faults (fresh pages mapped for new allocations)
+#   churn KB    bytes allocated and freed within the frame (tracemalloc
+#               peak over the frame, in a separate traced run)
+#   gc/1k       garbage collections per 1000 frames, and the time they took
+# Run it on the Pi: the allocator and page-fault costs are what differ there.
+#
+# Usage: python bench_capture_alloc.py --frames 600 --viewers 3 [--camera]
+
+
+def synthetic_camera(width, height, scenes=8, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(scenes):
+        image = np.empty((height, width, 4), np.uint8)
+        image[..., 0] = (x + i * 40) % 256
+        image[..., 1] = (y * 2 + i * 20) % 256
+        image[..., 2] = ((x + y) // 2) % 256
+        image[..., 3] = 255
+        image[..., :3] = np.clip(image[..., :3] + rng.normal(0, 12, (height, width, 3)), 0, 255)
+        frames.append(image)
+    buffer = np.empty_like(frames[0])
+
+    # capture(i) -> (array, release); the array is only valid until release()
+    def capture(i):
+        np.copyto(buffer, frames[i % scenes])  # the sensor writing the buffer
+        return buffer, lambda: None
+    return capture
+
+
+def picamera(width, height):
+    from picamera2 import MappedArray, Picamera2
+    picam2 = Picamera2()
+    picam2.configure(picam2.create_video_configuration(main={"size": (width, height), "format": "XRGB8888"}))
+    picam2.start()
+    time.sleep(1)
+
+    def capture(i):
+        stack = contextlib.ExitStack()
+        request = picam2.capture_request()
+        stack.callback(request.release)
+        mapped = stack.enter_context(MappedArray(request, "main"))
+        return mapped.array[:height, :width], stack.close
+    return capture
+
+
+def overlay(bgr):
+    cv2.putText(bgr, time.strftime("%Y-%m-%d %H:%M:%S"), (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
+                0.7, (255, 255, 255), 2, cv2.LINE_AA)
+    cv2.putText(bgr, "Camera Feed Active", (10, bgr.shape[0] - 10),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+
+
+# The loop before pooling: capture_array() copy, fresh conversion, tobytes()
+# and a concatenated chunk per viewer
+def fresh_frame(capture, i, quality, viewers):
+    image, release = capture(i)
+    rgb = image.copy()
+    release()
+    bgr = cv2.cvtColor(rgb, cv2.COLOR_BGRA2BGR)
+    overlay(bgr)
+    _, jpeg = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    frame = jpeg.tobytes()
+    sent = 0
+    for _ in range(viewers):
+        sent += len(PART_HEADER + frame + PART_TRAILER)
+    return sent
+
+
+def pooled_frame(capture, i, quality, viewers, pool):
+    image, release = capture(i)
+    bgr = pool.acquire(image.shape[:2] + (3,))
+    cv2.cvtColor(image, cv2.COLOR_BGRA2BGR, dst=bgr)
+    release()
+    overlay(bgr)
+    _, jpeg = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    pool.release(bgr)
+    part = mjpeg_part(jpeg)
+    sent = 0
+    for _ in range(viewers):
+        sent += len(part)
+    return sent
+
+
+def measure(run, frames):
+    for i in range(30):  # warm up: first-use allocations, pool fill
+        run(i)
+
+    collections = [0]
+    paused = [0.0]
+    started = [0.0]
+
+    def on_gc(phase, info):
+        if phase == "start":
+            started[0] = time.perf_counter()
+        else:
+            collections[0] += 1
+            paused[0] += time.perf_counter() - started[0]
+    gc.callbacks.append(on_gc)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    times = []
+    try:
+        for i in range(frames):
+            start = time.perf_counter()
+            run(i)
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.callbacks.remove(on_gc)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+    # Churn in a separate run, tracemalloc slows everything down
+    tracemalloc.start()
+    churn = []
+    try:
+        for i in range(min(frames, 200)):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run(i)
+            churn.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ms": np.median(times) * 1000,
+        "faults": faults / frames,
+        "churn_kb": np.mean(churn) / 1024,
+        "gc_per_1k": collections[0] * 1000 / frames,
+        "gc_ms": paused[0] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture loop allocation benchmark")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--size", default="640x360")
+    parser.add_argument("--quality", type=int, default=70)
+    parser.add_argument("--viewers", type=int, default=3)
+    parser.add_argument("--camera", action="store_true", help="capture from picamera2")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    capture = picamera(width, height) if args.camera else synthetic_camera(width, height)
+
+    pool = FramePool(1)
+    modes = {
+        "fresh": lambda i: fresh_frame(capture, i, args.quality, args.viewers),
+        "pooled": lambda i: pooled_frame(capture, i, args.quality, args.viewers, pool),
+    }
+    print(f"{args.size}, JPEG q{args.quality}, {args.viewers} viewers, {args.frames} frames")
+    print(f"{'mode':<8} {'ms':>7} {'faults':>8} {'churn KB':>9} {'gc/1k':>6} {'gc ms':>7}")
+    for mode, run in modes.items():
+        result = measure(run, args.frames)
+        print(f"{mode:<8} {result['ms']:7.2f} {result['faults']:8.1f} {result['churn_kb']:9.0f} "
+              f"{result['gc_per_1k']:6.1f} {result['gc_ms']:7.2f}")
+    print(f"pool allocated {pool.allocated} buffer(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import loadtest
+
+# Single-process ASGI deployment (asgi_app.py) against the two-process one
+# (app.py under eventlet + streaming.py under uvicorn).
+#
+# For each deployment it starts the server process(es) locally without TLS,
+# with a simulated fleet, and runs the same load: loadtest.py pilots and
+# spectators on the control channel plus MJPEG viewers on /video_feed. It
+# reports control round trip, telemetry delivery, video frames delivered and
+# CPU / RSS summed over the server processes. Run it on the Pi: streaming.py
+# needs picamera2 (without a camera it serves its error frame).
+#
+# Server output is discarded unless --server-logs names a directory for it;
+# check those logs when a metric reads zero, since a failing background task
+# in the server does not stop the benchmark.
+#
+# Usage: python bench_deployment.py --pilots 5 --spectators 20 --viewers 2 --seconds 30
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    "split": [
+        ("control", "import app; app.control.start(); "
+                    "app.socketio.run(app.app, host='127.0.0.1', port={port}, log_output=False)"),
+        ("video", "import streaming, uvicorn; streaming.start_capture(); "
+                  "uvicorn.run(streaming.app, host='127.0.0.1', port={video_port}, log_level='warning')"),
+    ],
+    "unified": [
+        ("control", "import asgi_app, uvicorn; "
+                    "uvicorn.run(asgi_app.app, host='127.0.0.1', port={port}, log_level='warning')"),
+    ],
+}
+
+
+def start(deployment, vehicles, port, video_port, log_dir=None):
+    env = dict(os.environ, AEROSENSE_VEHICLE=f"fleet:{vehicles}", AEROSENSE_FLIGHT_LOG="")
+    processes = []
+    for name, code in SERVERS[deployment]:
+        code = code.format(port=port, video_port=video_port)
+        output = subprocess.DEVNULL
+        if log_dir is not None:
+            output = open(os.path.join(log_dir, f"{deployment}-{name}.log"), "w")
+        processes.append(subprocess.Popen([sys.executable, "-c", code], cwd=HERE, env=env,
+                                          stdout=output, stderr=subprocess.STDOUT))
+        if log_dir is not None:
+            output.close()
+    deadline = time.monotonic() + 30
+    urls = [f"http://127.0.0.1:{port}/vehicles"]
+    urls.append(f"http://127.0.0.1:{video_port if deployment == 'split' else port}/healthcheck")
+    for url in urls:
+        while True:
+            try:
+                loadtest.get_json(url)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    stop(processes)
+                    raise RuntimeError(f"{deployment} deployment did not start")
+                time.sleep(0.2)
+    return processes
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+# One MJPEG viewer; returns (frames, bytes) received while recording
+async def watch_video(port, start_at, stop_at):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /video_feed HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+    frames = received = 0
+    tail = b""
+    try:
+        while time.monotonic() < stop_at:
+            chunk = await asyncio.wait_for(reader.read(65536), timeout=5)
+            if not chunk:
+                break
+            if time.monotonic() >= start_at:
+                received += len(chunk)
+                # Boundaries can straddle two reads
+                frames += (tail + chunk).count(b"--frame")
+            tail = chunk[-7:]
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+    return frames, received
+
+
+async def run(args, deployment, processes):
+    port = args.port
+    video_port = args.video_port if deployment == "split" else port
+    start_at = time.monotonic() + args.warmup
+    stop_at = start_at + args.seconds
+    load = loadtest.run_load(args, f"http://127.0.0.1:{port}", [p.pid for p in processes])
+    viewers = [watch_video(video_port, start_at, stop_at) for _ in range(args.viewers)]
+    results, *video = await asyncio.gather(load, *viewers)
+    frames = sum(f for f, _ in video)
+    results["video"] = {
+        "viewers": args.viewers,
+        "fps_per_viewer": round(frames / max(1, args.viewers) / args.seconds, 1),
+        "mbit_s": round(sum(b for _, b in video) * 8 / 1e6 / args.seconds, 2),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unified ASGI vs two-process deployment benchmark")
+    parser.add_argument("--deployments", default="split,unified")
+    parser.add_argument("--vehicles", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5097)
+    parser.add_argument("--video-port", type=int, default=8097)
+    parser.add_argument("--pilots", type=int, default=5)
+    parser.add_argument("--spectators", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--mode-switch", type=float, default=0.0,
+                        help="mean seconds between a pilot's mode switches, 0 to disable")
+    parser.add_argument("--connect-batch", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results of every deployment as JSON")
+    parser.add_argument("--server-logs", help="directory for each server process's output")
+    args = parser.parse_args()
+    args.insecure = False
+    if args.server_logs:
+        os.makedirs(args.server_logs, exist_ok=True)
+
+    reports = {}
+    for deployment in args.deployments.split(","):
+        processes = start(deployment, args.vehicles, args.port, args.video_port, args.server_logs)
+        try:
+            reports[deployment] = {"results": asyncio.run(run(args, deployment, processes))}
+        finally:
+            stop(processes)
+        time.sleep(1)  # let the ports close
+
+    baseline = None
+    for deployment, report in reports.items():
+        video = report["results"]["video"]
+        print(f"--- {deployment} ({len(SERVERS[deployment])} process(es)), video "
+              f"{video['fps_per_viewer']} fps/viewer, {video['mbit_s']} Mbit/s")
+        loadtest.print_summary(report, baseline)
+        baseline = baseline or report
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "reports": reports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
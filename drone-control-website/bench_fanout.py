@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import socketio
+
+# Telemetry fan-out benchmark for the multi-vehicle server.
+#
+# For each (vehicles, clients) pair it starts app.py in a subprocess with
+# AEROSENSE_VEHICLE=fleet:<vehicles>, connects the clients over WebSocket,
+# spreads them round-robin across the vehicles on the 20 Hz 'pilot' tier, and
+# measures for --seconds:
+#   - delivered packets/s against the expected clients x 20 Hz
+#   - packets from the wrong vehicle (should be 0, rooms are per vehicle)
+#   - inter-arrival p50/p95 at the clients (jitter)
+#   - server emit-call latency, late ticks and Engine.IO queue depth from
+#     /telemetry/stats
+#
+# Usage: python bench_fanout.py [--vehicles 1,10,100] [--clients 1,10,50,200]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TIER = "pilot"
+TIER_HZ = 20.0
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def start_server(vehicles, port):
+    env = dict(os.environ, AEROSENSE_VEHICLE=f"fleet:{vehicles}")
+    code = f"import app; app.socketio.run(app.app, host='127.0.0.1', port={port}, log_output=False)"
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            get_json(f"http://127.0.0.1:{port}/vehicles")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start")
+
+
+class BenchClient:
+    def __init__(self, url, vehicle_id):
+        self.vehicle_id = vehicle_id
+        self.received = 0
+        self.wrong_vehicle = 0
+        self.gaps = []
+        self.last = None
+        self.counting = False
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('telemetry_bin', self.on_packet)
+        self.sio.connect(url, transports=['websocket'], wait_timeout=10)
+        self.sio.call('select_vehicle', {'vehicle_id': vehicle_id}, timeout=10)
+        self.sio.call('telemetry_subscribe', {'tier': TIER}, timeout=10)
+
+    def on_packet(self, packet, vehicle_id=None):
+        now = time.perf_counter()
+        if not self.counting:
+            return
+        if vehicle_id != self.vehicle_id:
+            self.wrong_vehicle += 1
+            return
+        self.received += 1
+        if self.last is not None:
+            self.gaps.append(now - self.last)
+        self.last = now
+
+    def close(self):
+        self.sio.disconnect()
+
+
+def run(vehicles, clients, seconds, port):
+    server = start_server(vehicles, port)
+    url = f"http://127.0.0.1:{port}"
+    bench_clients = []
+    try:
+        # Connect in parallel, a few hundred sequential handshakes take a while
+        lock = threading.Lock()
+
+        def connect(i):
+            client = BenchClient(url, str(i % vehicles + 1))
+            with lock:
+                bench_clients.append(client)
+
+        threads = [threading.Thread(target=connect, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        time.sleep(1.0)  # let keyframes and schedules settle
+        before = get_json(f"{url}/telemetry/stats")
+        for client in bench_clients:
+            client.counting = True
+        time.sleep(seconds)
+        for client in bench_clients:
+            client.counting = False
+        after = get_json(f"{url}/telemetry/stats")
+    finally:
+        for client in bench_clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+        server.terminate()
+        server.wait()
+
+    received = sum(c.received for c in bench_clients)
+    gaps = [gap for c in bench_clients for gap in c.gaps]
+    expected = clients * TIER_HZ * seconds
+    return {
+        "vehicles": vehicles,
+        "clients": len(bench_clients),
+        "received_per_s": round(received / seconds, 1),
+        "delivery_pct": round(100.0 * received / expected, 1) if expected else 0.0,
+        "wrong_vehicle": sum(c.wrong_vehicle for c in bench_clients),
+        "gap_p50_ms": round(percentile(gaps, 0.5) * 1000, 2),
+        "gap_p95_ms": round(percentile(gaps, 0.95) * 1000, 2),
+        "emits_per_s": round((after["emitted"] - before["emitted"]) / seconds, 1),
+        "late_ticks": after["late_ticks"] - before["late_ticks"],
+        "emit_p95_ms": after["emit_latency_p95_ms"],
+        "queue_depth": after["queue_depth"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-vehicle telemetry fan-out benchmark")
+    parser.add_argument("--vehicles", default="1,10,100")
+    parser.add_argument("--clients", default="1,10,50,200")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    columns = ["vehicles", "clients", "received_per_s", "delivery_pct", "wrong_vehicle",
+               "gap_p50_ms", "gap_p95_ms", "emits_per_s", "late_ticks", "emit_p95_ms", "queue_depth"]
+    print(" ".join(f"{c:>14}" for c in columns))
+    results = []
+    for vehicles in (int(n) for n in args.vehicles.split(",")):
+        for clients in (int(n) for n in args.clients.split(",")):
+            result = run(vehicles, clients, args.seconds, args.port)
+            results.append(result)
+            print(" ".join(f"{result[c]:>14}" for c in columns), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
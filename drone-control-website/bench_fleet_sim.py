@@ -0,0 +1,45 @@
+import argparse
+import time
+
+from fleet_sim import FleetSimulator
+
+# Fleet simulator throughput: steps per second and vehicle-steps per second
+# for fleets of increasing size, all vehicles armed and flying random sticks.
+# Optionally re-randomizes the sticks every step to include the cost of
+# applying control inputs.
+
+
+def run(count, seconds, dt, inputs):
+    fleet = FleetSimulator(count, seed=0)
+    fleet.fly_background(range(count))
+    everyone = slice(None)
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    steps = 0
+    while time.perf_counter() < deadline:
+        if inputs:
+            fleet.randomize_sticks(everyone, scale=3.0)
+        fleet.step(dt)
+        steps += 1
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet simulator benchmark")
+    parser.add_argument("--sizes", default="1,10,100,1000,10000,100000")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--dt", type=float, default=0.02)
+    parser.add_argument("--inputs", action="store_true", help="apply new sticks every step")
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>9} {'steps/s':>10} {'step us':>9} {'vehicle-steps/s':>16} {'armed':>7} {'max alt':>8}")
+    for count in (int(n) for n in args.sizes.split(",")):
+        rate, fleet = run(count, args.seconds, args.dt, args.inputs)
+        _, _, alt = fleet.positions()
+        print(f"{count:>9} {rate:>10.0f} {1e6 / rate:>9.1f} {rate * count:>16,.0f} "
+              f"{int(fleet.armed.sum()):>7} {alt.max():>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from flight_log import FlightLogWriter, open_table
+
+# Flight log benchmark: record() cost on the caller's thread, background
+# encode throughput and compression for a synthetic flight, then time-range
+# reads and windowed aggregates over the memory-mapped result.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flight log benchmark")
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--rate", type=float, default=10.0, help="telemetry samples per second")
+    parser.add_argument("--keep", help="write the flight here instead of a temporary directory")
+    args = parser.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="flightlog-")
+    samples = int(args.hours * 3600 * args.rate)
+    rng = np.random.default_rng(0)
+    t0 = time.time() - samples / args.rate
+    t = t0 + np.arange(samples) / args.rate + rng.normal(0, 0.002, samples)
+    lat = 51.5074 + np.cumsum(rng.normal(0, 2e-6, samples))
+    lon = -0.1278 + np.cumsum(rng.normal(0, 2e-6, samples))
+    alt = np.clip(50 + np.cumsum(rng.normal(0, 0.05, samples)), 0, None)
+    battery = np.linspace(100, 20, samples)
+    signal = np.clip(90 + rng.normal(0, 2, samples), 0, 100)
+
+    writer = FlightLogWriter(root, "bench")
+    start = time.perf_counter()
+    for i in range(samples):
+        writer.record("1", "telemetry", t[i], {"lat": lat[i], "lon": lon[i], "alt": alt[i],
+                                               "battery": battery[i], "signal": signal[i], "armed": 1})
+    record_s = time.perf_counter() - start
+    start = time.perf_counter()
+    writer.close()
+    close_s = time.perf_counter() - start
+    stats = writer.stats()
+    print(f"samples:              {samples:>10,}")
+    print(f"record():             {record_s / samples * 1e6:10.2f} us/sample on the caller")
+    print(f"final flush:          {close_s * 1000:10.1f} ms")
+    print(f"on disk:              {stats['bytes_written'] / 1e6:10.2f} MB "
+          f"({stats['bytes_written'] / samples:.1f} B/sample, {stats['compression_ratio']}x vs raw float64)")
+
+    table = open_table(root, "bench", "1")
+    print(f"blocks:               {len(table.index):>10,}")
+    for label, span in [("last 10 min", 600), ("last hour", 3600), ("whole flight", None)]:
+        t_from = t[-1] - span if span else None
+        table.decoded_blocks = 0
+        start = time.perf_counter()
+        result = table.read(t_from, None, ["alt"])
+        read_ms = (time.perf_counter() - start) * 1000
+        print(f"read alt {label:<12} {len(result['t']):>9,} samples in {read_ms:8.2f} ms")
+    for window in (10, 60, 600):
+        table.decoded_blocks = 0
+        start = time.perf_counter()
+        result = table.aggregate("alt", window)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"aggregate alt /{window:<4}s  {len(result['t']):>9,} windows in {ms:8.2f} ms "
+              f"({table.decoded_blocks} of {len(table.index)} blocks decoded)")
+
+    if not args.keep:
+        shutil.rmtree(root)
+    else:
+        print(f"flight kept in {os.path.join(root, 'bench')}")
+
+
+if __name__ == '__main__':
+    main()
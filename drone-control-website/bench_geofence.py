@@ -0,0 +1,101 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from geofence import Geofence
+
+# Geofence benchmark: thousands of random polygon and cylinder zones over a
+# square area around home, checked with the grid index (scalar, batch,
+# planned path, setpoint motion) and, for reference, naively against every
+# zone. The indexed results are verified against the naive ones.
+
+HOME = (51.5074, -0.1278)
+
+
+def random_fence(zones, area, cell_size, rng):
+    fence = Geofence(*HOME, cell_size=cell_size)
+    half = area / 2
+    for i in range(zones):
+        n, e = rng.uniform(-half, half, 2)
+        radius = rng.uniform(15, 150)
+        floor, ceiling = (0.0, rng.uniform(30, 120)) if rng.random() < 0.7 else (-math.inf, math.inf)
+        lat, lon = fence.frame.offset(HOME[0], HOME[1], n, e)
+        if rng.random() < 0.3:
+            fence.add_cylinder(lat, lon, radius, floor, ceiling)
+            continue
+        # Star-shaped polygon with 5-16 vertices
+        count = rng.integers(5, 17)
+        angles = np.sort(rng.uniform(0, 2 * math.pi, count))
+        radii = radius * rng.uniform(0.4, 1.0, count)
+        lats, lons = fence.frame.offset(lat, lon, radii * np.cos(angles), radii * np.sin(angles))
+        fence.add_polygon(list(zip(lats, lons)), floor, ceiling)
+    return fence
+
+
+def naive_check(fence, lat, lon, alt):
+    n, e = fence.frame.project(lat, lon)
+    for zone in fence.zones:
+        if zone.floor <= alt <= zone.ceiling and zone.contains(n, e):
+            return zone.zone_id
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geofence benchmark")
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--area", type=float, default=20000.0, help="side of the square area, meters")
+    parser.add_argument("--cell", type=float, default=250.0, help="grid cell size, meters")
+    parser.add_argument("--points", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    fence = random_fence(args.zones, args.area, args.cell, rng)
+    start = time.perf_counter()
+    fence.build()
+    print(f"build:           {(time.perf_counter() - start) * 1000:8.1f} ms  {fence.stats()}")
+
+    half = args.area / 2
+    lat, lon = fence.frame.offset(HOME[0], HOME[1], rng.uniform(-half, half, args.points),
+                                  rng.uniform(-half, half, args.points))
+    alt = rng.uniform(0, 100, args.points)
+    lat_list, lon_list, alt_list = lat.tolist(), lon.tolist(), alt.tolist()
+
+    start = time.perf_counter()
+    scalar = [fence.check(a, b, c) for a, b, c in zip(lat_list, lon_list, alt_list)]
+    print(f"check:           {(time.perf_counter() - start) / args.points * 1e6:8.2f} us/point  "
+          f"({sum(z is not None for z in scalar)} of {args.points} inside a zone)")
+
+    start = time.perf_counter()
+    batch = fence.check_many(lat, lon, alt)
+    print(f"check_many:      {(time.perf_counter() - start) / args.points * 1e6:8.2f} us/point")
+
+    naive_points = min(args.points, 1000)
+    start = time.perf_counter()
+    naive = [naive_check(fence, a, b, c) for a, b, c in zip(lat_list[:naive_points], lon_list, alt_list)]
+    print(f"naive:           {(time.perf_counter() - start) / naive_points * 1e6:8.2f} us/point")
+
+    # A point can sit in several overlapping zones; compare inside/outside
+    mismatches = sum((s is None) != (n is None) for s, n in zip(scalar, naive))
+    mismatches += sum((s is None) != (b < 0) for s, b in zip(scalar, batch.tolist()))
+    print(f"mismatches:      {mismatches}")
+
+    # 20 km survey path with 200 waypoints, densified to 5 m
+    way_n = np.linspace(-half, half, 200)
+    way_e = half * 0.5 * np.sin(np.linspace(0, 6 * math.pi, 200))
+    way_lat, way_lon = fence.frame.offset(HOME[0], HOME[1], way_n, way_e)
+    start = time.perf_counter()
+    result = fence.check_path(way_lat, way_lon, 60.0)
+    print(f"check_path:      {(time.perf_counter() - start) * 1000:8.2f} ms for a {args.area / 1000:.0f} km path  "
+          f"-> {result}")
+
+    runs = 20000
+    start = time.perf_counter()
+    for k in range(runs):
+        fence.check_motion(lat_list[k], lon_list[k], alt_list[k], 5.0, -3.0, -0.5, lookahead=2.0)
+    print(f"check_motion:    {(time.perf_counter() - start) / runs * 1e6:8.2f} us/setpoint (10 m lookahead)")
+
+
+if __name__ == '__main__':
+    main()
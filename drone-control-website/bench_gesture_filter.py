@@ -0,0 +1,151 @@
+import argparse
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from gestures import COMMANDS, FINGERS, command_for_fingers, fingers_raised
+from landmark_filter import GestureFilter
+
+# Reaction latency vs false-transition rate for the gesture smoothing options.
+#
+# Sequences are .npz files with:
+#   t          (T,)        timestamps in seconds
+#   landmarks  (T, 21, 3)  one hand per frame, NaN rows where no hand was seen
+#   labels     (T,)        optional ground-truth command per frame
+# Without --sequence a synthetic recording with known labels is generated.
+
+GESTURES = [fingers for fingers in COMMANDS if fingers]
+FINGER_X = {"Index": 0.44, "Middle": 0.50, "Ring": 0.56, "Pinky": 0.62}
+
+
+def synthetic_hand(extension):
+    points = np.zeros((21, 3), np.float32)
+    points[0, :2] = (0.5, 0.8)
+    points[9, :2] = (0.5, 0.6)
+    for name, (tip_id, base_id) in FINGERS.items():
+        e = extension[name]
+        if name == "Thumb":
+            points[base_id, :2] = (0.38, 0.68)
+            ab = points[0, :2] - points[base_id, :2]
+            ab /= np.linalg.norm(ab)
+            angle = math.radians(147.5 + 27.5 * e)
+            c, s = math.cos(angle), math.sin(angle)
+            direction = np.array([c * ab[0] - s * ab[1], s * ab[0] + c * ab[1]])
+            points[tip_id, :2] = points[base_id, :2] + 0.06 * direction
+        else:
+            points[base_id, :2] = (FINGER_X[name], 0.55)
+            points[tip_id, :2] = (FINGER_X[name], 0.55 - 0.08 * e)
+    return points
+
+
+def synthetic_sequence(seconds=120, fps=30, noise=0.006, glitch_rate=0.03, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * fps)
+    t = np.arange(frames) / fps
+    landmarks = np.empty((frames, 21, 3), np.float32)
+    labels = []
+    extension = {name: -1.0 for name in FINGERS}
+    target = GESTURES[0]
+    hold = 0
+    for i in range(frames):
+        if hold <= 0:
+            target = GESTURES[rng.integers(len(GESTURES))]
+            hold = int(rng.uniform(0.5, 2.0) * fps)
+        hold -= 1
+        # Fingers move to their new position over ~100 ms
+        for name in FINGERS:
+            goal = 1.0 if name in target else -1.0
+            extension[name] += np.clip(goal - extension[name], -0.7, 0.7)
+        points = synthetic_hand(extension)
+        sigma = noise * 8 if rng.random() < glitch_rate else noise
+        points[:, :2] += rng.normal(0, sigma, (21, 2))
+        landmarks[i] = points
+        labels.append(command_for_fingers([n for n, e in extension.items() if e > 0]) or "unknown")
+    return t, landmarks, np.array(labels)
+
+
+def run_raw(t, landmarks):
+    for points in landmarks:
+        yield [] if np.isnan(points).any() else fingers_raised(points)
+
+
+def run_majority(t, landmarks, window):
+    history = deque(maxlen=window)
+    for fingers in run_raw(t, landmarks):
+        history.append(tuple(sorted(fingers)))
+        counts = {}
+        for state in history:
+            counts[state] = counts.get(state, 0) + 1
+        yield list(max(counts, key=counts.get))
+
+
+def run_filter(t, landmarks):
+    gesture_filter = GestureFilter()
+    for ts, points in zip(t, landmarks):
+        yield gesture_filter.update([] if np.isnan(points).any() else [points], ts)
+
+
+def evaluate(t, labels, outputs):
+    commands = [command_for_fingers(fingers) or "unknown" for fingers in outputs]
+    latencies = []
+    missed = 0
+    false_transitions = 0
+    for i in range(1, len(t)):
+        if commands[i] != commands[i - 1] and commands[i] != labels[i]:
+            false_transitions += 1
+        if labels is not None and labels[i] != labels[i - 1]:
+            j = i
+            while j < len(t) and labels[j] == labels[i] and commands[j] != labels[i]:
+                j += 1
+            if j < len(t) and labels[j] == labels[i]:
+                latencies.append(t[j] - t[i])
+            else:
+                missed += 1
+    minutes = (t[-1] - t[0]) / 60
+    return {
+        "latency_p50_ms": np.percentile(latencies, 50) * 1000 if latencies else float("nan"),
+        "latency_p95_ms": np.percentile(latencies, 95) * 1000 if latencies else float("nan"),
+        "missed": missed,
+        "false_per_min": false_transitions / minutes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gesture smoothing benchmark")
+    parser.add_argument("--sequence", action="append", help=".npz recording (repeatable)")
+    parser.add_argument("--seconds", type=float, default=120)
+    args = parser.parse_args()
+
+    sequences = []
+    for path in args.sequence or []:
+        data = np.load(path)
+        labels = data["labels"] if "labels" in data else None
+        sequences.append((path, data["t"], data["landmarks"], labels))
+    if not sequences:
+        sequences.append(("synthetic",) + synthetic_sequence(args.seconds))
+
+    methods = {
+        "raw": run_raw,
+        "majority-2": lambda t, lm: run_majority(t, lm, 2),
+        "majority-10": lambda t, lm: run_majority(t, lm, 10),
+        "one-euro+hysteresis": run_filter,
+    }
+    print(f"{'sequence':<14} {'method':<20} {'p50 ms':>8} {'p95 ms':>8} {'missed':>7} "
+          f"{'false/min':>10} {'us/frame':>9}")
+    for name, t, landmarks, labels in sequences:
+        if labels is None:
+            # Without ground truth, measure against the raw detector
+            labels = np.array([command_for_fingers(f) or "unknown" for f in run_raw(t, landmarks)])
+        for method, run in methods.items():
+            start = time.perf_counter()
+            outputs = list(run(t, landmarks))
+            cost = (time.perf_counter() - start) / len(t) * 1e6
+            result = evaluate(t, labels, outputs)
+            print(f"{name:<14} {method:<20} {result['latency_p50_ms']:8.0f} {result['latency_p95_ms']:8.0f} "
+                  f"{result['missed']:7d} {result['false_per_min']:10.1f} {cost:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from telemetry_history import TelemetryHistory
+
+# Telemetry history benchmark: append cost, and the cost of answering a
+# /telemetry/history query (range selection, downsampling, JSON encoding)
+# over a full buffer, i.e. hours of flight at 10 Hz.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry history benchmark")
+    parser.add_argument("--samples", type=int, default=144000, help="4 h at 10 Hz by default")
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    history = TelemetryHistory(args.samples)
+    rng = np.random.default_rng(0)
+    alt = np.cumsum(rng.normal(0, 0.1, args.samples)) + 50
+    t0 = time.time() - args.samples / 10.0
+
+    start = time.perf_counter()
+    for i in range(args.samples):
+        history.append(t0 + i / 10.0, {"lat": 51.5 + i * 1e-7, "lon": -0.12, "alt": alt[i],
+                                       "battery": 80.0, "signal": 90.0, "armed": True})
+    elapsed = time.perf_counter() - start
+    print(f"append:               {elapsed / args.samples * 1e6:8.2f} us/sample")
+    print(f"memory:               {sum(c.nbytes for c in history.columns.values()) / 1e6:8.2f} MB")
+
+    spans = [("full buffer", None), ("last hour", 3600), ("last 10 min", 600)]
+    for method in ("lttb", "minmax"):
+        for label, span in spans:
+            t_from = time.time() - span if span else None
+            runs = 20
+            start = time.perf_counter()
+            for _ in range(runs):
+                count, series = history.query(t_from, None, args.points, method)
+            query_ms = (time.perf_counter() - start) / runs * 1000
+            start = time.perf_counter()
+            body = json.dumps({name: column.tolist() for name, column in series.items()})
+            encode_ms = (time.perf_counter() - start) * 1000
+            print(f"{method:<6} {label:<12} {count:>7} -> {len(series['t']):>5} points  "
+                  f"query {query_ms:6.2f} ms  json {encode_ms:5.2f} ms  {len(body) / 1024:6.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
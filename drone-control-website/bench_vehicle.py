@@ -0,0 +1,73 @@
+import argparse
+import time
+from collections import Counter
+
+from sitl import MavlinkSimulator
+from vehicle import MavlinkVehicle
+
+# Control stack benchmark against the bundled MAVLink simulator:
+# connect time, per-message telemetry rates, state read cost and the time from
+# arm/takeoff commands to the state reflecting them. No vehicle or network
+# needed, everything runs over localhost UDP.
+
+
+def wait_for(predicate, timeout):
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MAVLink backend benchmark")
+    parser.add_argument("--port", type=int, default=14560)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--position-hz", type=float, default=20)
+    args = parser.parse_args()
+
+    simulator = MavlinkSimulator(f"udpout:127.0.0.1:{args.port}")
+    simulator.start()
+
+    start = time.perf_counter()
+    vehicle = MavlinkVehicle(f"udpin:127.0.0.1:{args.port}", stream_rates={
+        "HEARTBEAT": 2, "GLOBAL_POSITION_INT": args.position_hz, "ATTITUDE": args.position_hz,
+        "SYS_STATUS": 1, "RADIO_STATUS": 1,
+    })
+    if not vehicle.wait_ready(10):
+        raise SystemExit("No heartbeat and position from the simulator")
+    print(f"connect + stream setup:   {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    counts = Counter()
+    for name in ("HEARTBEAT", "GLOBAL_POSITION_INT", "ATTITUDE", "SYS_STATUS"):
+        vehicle.on(name, lambda msg, name=name: counts.update([name]))
+    time.sleep(1.0)  # let the new intervals take effect
+    counts.clear()
+    time.sleep(args.seconds)
+    for name, count in sorted(counts.items()):
+        print(f"{name:<24} {count / args.seconds:8.1f} Hz")
+
+    reads = 200000
+    start = time.perf_counter()
+    for _ in range(reads):
+        state = vehicle.state
+        _ = state.lat + state.lon + state.alt
+    print(f"state read:               {(time.perf_counter() - start) / reads * 1e9:8.0f} ns")
+
+    vehicle.set_mode("GUIDED")
+    print(f"mode -> GUIDED:           {wait_for(lambda: vehicle.state.mode == 'GUIDED', 5) * 1000:8.1f} ms")
+    vehicle.arm()
+    print(f"arm -> armed:             {wait_for(lambda: vehicle.state.armed, 5) * 1000:8.1f} ms")
+    vehicle.takeoff(5)
+    print(f"takeoff -> climbing:      {wait_for(lambda: vehicle.state.alt > 0.05, 5) * 1000:8.1f} ms")
+    print(f"takeoff -> 5 m:           {wait_for(lambda: vehicle.state.alt >= 4.75, 10):8.2f} s")
+    vehicle.land()
+    print(f"land -> disarmed:         {wait_for(lambda: not vehicle.state.armed, 15):8.2f} s")
+
+    vehicle.close()
+    simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DELAY = metrics.histogram("aerosense_command_queue_delay_seconds",
+                                "Command creation to execution time", ["queue"])
+EXECUTED = metrics.counter("aerosense_commands_executed_total", "Commands executed", ["queue", "priority"])
+DROPPED = metrics.counter("aerosense_commands_dropped_total", "Commands dropped before execution",
+                          ["queue", "reason"])
+
+# Priority queue with deadlines between a command source (gesture engine, AI
+# worker) and the vehicle.
+#
+# Every command carries its creation time (the sender's clock, in unix
+# seconds), the time this server received it and a deadline. A single
+# consumer (run()) executes them in priority order:
+#   - safety commands (land, stop) go first, and a safety command drops the
+#     movement commands queued before it, including ones received before it
+#     that reach put() after it. Ordering uses receive times only: the
+#     sender's clock can be skewed, and a movement command must not be
+#     dropped because its sender's clock is behind the last safety sender's
+#   - a new movement command replaces a queued one (latest wins), the
+#     gesture engine resends held gestures every frame anyway; "stable"
+#     (neutral sticks) is a movement command too, so it does not preempt
+#   - commands past their deadline are dropped instead of executed, so a
+#     command delayed by a slow link never moves the vehicle seconds later
+# Queue delay (creation to execution) and drops by reason are exported as
+# metrics and in stats(). The consumer sleeps on an event that put() sets,
+# so an idle queue costs no wakeups; under eventlet it is given a green
+# event so waiting does not block the hub.
+
+SAFETY, SETUP, MOVEMENT = 0, 1, 2
+PRIORITY_NAMES = ("safety", "setup", "movement")
+
+SAFETY_COMMANDS = frozenset({"land", "stop", "disarm"})
+SETUP_COMMANDS = frozenset({"arm", "takeoff"})
+
+# Default time to live per priority, seconds
+TTL = {SAFETY: 5.0, SETUP: 2.0, MOVEMENT: 0.5}
+
+# Creation times further ahead of the local clock than this are clamped (clock skew)
+MAX_FUTURE = 1.0
+
+
+def priority_of(name):
+    if name in SAFETY_COMMANDS:
+        return SAFETY
+    if name in SETUP_COMMANDS:
+        return SETUP
+    return MOVEMENT
+
+
+class Command:
+    def __init__(self, name, created=None, ttl=None, payload=None, priority=None):
+        now = time.time()
+        self.name = name
+        self.priority = priority if priority is not None else priority_of(name)
+        self.created = min(created, now + MAX_FUTURE) if created is not None else now
+        self.received = now
+        self.deadline = self.created + (ttl if ttl is not None else TTL[self.priority])
+        self.payload = payload
+
+    def __repr__(self):
+        return f"Command({self.name!r}, {PRIORITY_NAMES[self.priority]}, created={self.created:.3f})"
+
+
+class CommandQueue:
+    def __init__(self, execute, name="commands"):
+        self.execute = execute  # callable(Command)
+        self.name = name
+        self.heap = []
+        self.order = itertools.count()
+        self.last_safety = 0.0  # receive time of the newest safety command
+        self.running = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()  # run() may swap in the caller's event type
+        self.counts = {"executed": 0, "stale": 0, "preempted": 0, "replaced": 0, "failed": 0}
+        self.delay = QUEUE_DELAY.labels(name)
+        self.last_delay = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def put(self, command):
+        with self.lock:
+            if command.priority == SAFETY:
+                self.last_safety = max(self.last_safety, command.received)
+                kept = [item for item in self.heap if item[2].priority != MOVEMENT]
+                self._drop("preempted", len(self.heap) - len(kept))
+                self.heap = kept
+                heapq.heapify(self.heap)
+            elif command.priority == MOVEMENT:
+                if command.received < self.last_safety:
+                    self._drop("preempted")
+                    return False
+                kept = [item for item in self.heap if item[2].priority != MOVEMENT]
+                self._drop("replaced", len(self.heap) - len(kept))
+                if len(kept) != len(self.heap):
+                    self.heap = kept
+                    heapq.heapify(self.heap)
+            heapq.heappush(self.heap, (command.priority, next(self.order), command))
+        self.wake.set()
+        return True
+
+    def _drop(self, reason, count=1):
+        if count:
+            self.counts[reason] += count
+            DROPPED.labels(self.name, reason).inc(count)
+
+    # Next command that is still within its deadline, or None
+    def pop(self):
+        with self.lock:
+            now = time.time()
+            while self.heap:
+                _, _, command = heapq.heappop(self.heap)
+                if now <= command.deadline:
+                    return command
+                logger.debug(f"Dropping stale {command} ({(now - command.created) * 1000:.0f} ms old)")
+                self._drop("stale")
+            return None
+
+    # Execute every due command; returns how many ran
+    def drain(self):
+        executed = 0
+        while True:
+            command = self.pop()
+            if command is None:
+                return executed
+            delay = time.time() - command.created
+            self.delay.observe(max(0.0, delay))
+            self.last_delay = delay
+            try:
+                self.execute(command)
+            except Exception as e:
+                logger.error(f"Command {command} failed: {e}")
+                self.counts["failed"] += 1
+                continue
+            self.counts["executed"] += 1
+            EXECUTED.labels(self.name, PRIORITY_NAMES[command.priority]).inc()
+            executed += 1
+
+    # Seconds until the nearest queued deadline, None when the queue is empty
+    def _timeout(self):
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, min(item[2].deadline for item in self.heap) - time.time())
+
+    # Run the consumer once, e.g. start(socketio.start_background_task, create_event)
+    def start(self, spawn, create_event=None):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        spawn(self.run, create_event() if create_event else None)
+
+    # Consumer loop. wake: an Event to block on (threading.Event by default,
+    # a green Event when this runs as an eventlet greenthread)
+    def run(self, wake=None):
+        if wake is not None:
+            self.wake = wake
+        self.running = True
+        logger.info(f"Command queue '{self.name}' running")
+        while self.running:
+            # Cleared before draining, so a put() during drain() is not missed
+            self.wake.clear()
+            self.drain()
+            self.wake.wait(self._timeout())
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def stats(self):
+        return dict(self.counts, queued=len(self.heap),
+                    last_delay_ms=round(self.last_delay * 1000, 1) if self.last_delay is not None else None)
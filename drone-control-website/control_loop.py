@@ -0,0 +1,227 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INPUTS = metrics.counter("aerosense_control_inputs_total", "Axis inputs submitted to control loops")
+COALESCED = metrics.counter("aerosense_control_coalesced_total", "Axis inputs replaced before being applied")
+TICKS = metrics.counter("aerosense_control_ticks_total", "Control loop ticks")
+LATE_TICKS = metrics.counter("aerosense_control_late_ticks_total", "Control loop ticks that started late")
+EXPIRED = metrics.counter("aerosense_control_expired_total", "Held axes zeroed because their source went quiet")
+INPUT_TO_APPLY = metrics.histogram("aerosense_control_input_to_apply_seconds",
+                                   "Server receive to vehicle apply time of axis inputs")
+
+# Fixed-rate control loop with latest-wins input coalescing.
+#
+# Joystick and keyboard axis inputs only update the latest value per axis;
+# nothing is applied from the Socket.IO handler itself. Once per tick the loop
+# merges the axes into one setpoint and hands it to the vehicle. Each input
+# carries the client send time ('t', ms, already corrected by the client's
+# clock offset) and is stamped with server receive and apply times, so input
+# to apply latency can be reported.
+#
+# Every axis remembers the source that set it (a client sid, 'ai') and
+# expires: an axis nobody refreshes within INPUT_TIMEOUT (the browser
+# resends held sticks, the keyboard auto-repeats) is zeroed on the next tick,
+# so a dropped client or a stalled AI worker never leaves the vehicle moving.
+# release(source) zeroes a source's axes at once, e.g. when its client
+# disconnects.
+
+INPUT_TIMEOUT = float(os.environ.get("AEROSENSE_INPUT_TIMEOUT", 1.0))
+
+AXES = ("roll", "pitch", "yaw", "throttle")
+
+# Joystick events set two axes at once: (x axis, y axis)
+JOYSTICK_AXES = {
+    "left-joystick": ("yaw", "throttle"),
+    "right-joystick": ("roll", "pitch"),
+}
+
+# Keyboard codes that drive an axis while the key is held
+KEYBOARD_AXES = {
+    "throttle_up": ("throttle", 10.0),
+    "throttle_down": ("throttle", -10.0),
+    "yaw_left": ("yaw", -10.0),
+    "yaw_right": ("yaw", 10.0),
+    "pitch_forward": ("pitch", 10.0),
+    "pitch_backward": ("pitch", -10.0),
+    "roll_left": ("roll", -10.0),
+    "roll_right": ("roll", 10.0),
+}
+
+
+def is_axis_input(data):
+    if not isinstance(data, dict):
+        return False
+    if data.get('type') in JOYSTICK_AXES:
+        return True
+    code = data.get('code')
+    return (data.get('type') == 'keyboard' and isinstance(code, str)
+            and code.replace('stop_', '', 1) in KEYBOARD_AXES)
+
+
+# A joystick axis value as a finite float, or None
+def axis_value(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class ControlLoop:
+    def __init__(self, socketio, apply, rate_hz=50.0, input_timeout=INPUT_TIMEOUT):
+        self.socketio = socketio
+        self.apply = apply  # callable(setpoint dict)
+        self.rate_hz = rate_hz
+        self.input_timeout = input_timeout
+        self.setpoint = {axis: 0.0 for axis in AXES}
+        self.pending = {}  # axis -> (client_ts, recv_ts) of the latest unapplied input
+        self.holders = {}  # axis -> (source, monotonic deadline) of a non-zero axis
+        self.lock = threading.Lock()
+        self.task = None
+        self.running = False
+        self.inputs = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.ticks = 0
+        self.late_ticks = 0
+        self.server_latencies = deque(maxlen=2000)  # receive -> apply, seconds
+        self.client_latencies = deque(maxlen=2000)  # client send -> apply, seconds
+
+    def start(self):
+        with self.lock:
+            if self.task is None:
+                self.running = True
+                self.task = self.socketio.start_background_task(self._run)
+
+    # End the loop thread; the setpoint is no longer applied
+    def close(self):
+        self.running = False
+
+    # Record an axis input (one is_axis_input() accepted) from `source`, held
+    # for `timeout` seconds (input_timeout by default) unless refreshed.
+    # Returns immediately, False if the input was dropped as malformed.
+    def submit(self, data, source=None, timeout=None):
+        recv_ts = time.time()
+        client_ts = data.get('t')
+        client_ts = client_ts / 1000.0 if isinstance(client_ts, (int, float)) else None
+        updates = {}
+        if data.get('type') in JOYSTICK_AXES:
+            x_axis, y_axis = JOYSTICK_AXES[data['type']]
+            x, y = axis_value(data.get('x', 0)), axis_value(data.get('y', 0))
+            if x is None or y is None:
+                logger.warning(f"Dropping {data['type']} input with invalid axes: "
+                               f"x={data.get('x')!r} y={data.get('y')!r}")
+                return False
+            updates[x_axis] = x
+            updates[y_axis] = y
+        else:
+            code = data['code']
+            stop = code.startswith('stop_')
+            axis, value = KEYBOARD_AXES[code.replace('stop_', '', 1)]
+            updates[axis] = 0.0 if stop else value
+        deadline = time.monotonic() + (timeout if timeout is not None else self.input_timeout)
+        INPUTS.inc()
+        with self.lock:
+            self.inputs += 1
+            for axis, value in updates.items():
+                if axis in self.pending:
+                    self.coalesced += 1
+                    COALESCED.inc()
+                self.setpoint[axis] = value
+                self.pending[axis] = (client_ts, recv_ts)
+                if value:
+                    self.holders[axis] = (source, deadline)
+                else:
+                    self.holders.pop(axis, None)
+        return True
+
+    def reset(self):
+        with self.lock:
+            for axis in AXES:
+                self.setpoint[axis] = 0.0
+            self.holders.clear()
+
+    # Zero the axes `source` is holding
+    def release(self, source):
+        with self.lock:
+            for axis, (holder, _) in list(self.holders.items()):
+                if holder == source:
+                    self.setpoint[axis] = 0.0
+                    del self.holders[axis]
+
+    # Zero held axes past their deadline; called with the lock held
+    def _expire(self):
+        now = time.monotonic()
+        for axis, (source, deadline) in list(self.holders.items()):
+            if now >= deadline:
+                logger.info(f"Axis {axis} from {source} was not refreshed in time, zeroed")
+                self.setpoint[axis] = 0.0
+                del self.holders[axis]
+                self.expired += 1
+                EXPIRED.inc()
+
+    def _tick(self):
+        with self.lock:
+            if self.holders:
+                self._expire()
+            setpoint = dict(self.setpoint)
+            pending = list(self.pending.values())
+            self.pending.clear()
+        self.apply(setpoint)
+        apply_ts = time.time()
+        for client_ts, recv_ts in pending:
+            self.server_latencies.append(apply_ts - recv_ts)
+            INPUT_TO_APPLY.observe(apply_ts - recv_ts)
+            if client_ts is not None:
+                self.client_latencies.append(apply_ts - client_ts)
+        self.ticks += 1
+        TICKS.inc()
+
+    def _run(self):
+        logger.info(f"Control loop started at {self.rate_hz} Hz")
+        next_tick = time.monotonic()
+        while self.running:
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Control loop tick failed: {e}")
+            next_tick += 1.0 / self.rate_hz
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                self.late_ticks += 1
+                LATE_TICKS.inc()
+                next_tick = time.monotonic()
+                delay = 0
+            self.socketio.sleep(delay)
+        logger.info("Control loop stopped")
+
+    def stats(self):
+        def summary(samples):
+            values = sorted(samples)
+            if not values:
+                return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+            def pick(p):
+                return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+            return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)}
+
+        return {
+            "rate_hz": self.rate_hz,
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "inputs": self.inputs,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "setpoint": dict(self.setpoint),
+            "input_to_apply": summary(self.server_latencies),
+            "client_to_apply": summary(self.client_latencies),
+        }
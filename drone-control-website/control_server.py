@@ -0,0 +1,334 @@
+import logging
+import os
+import time
+
+import metrics
+from ai_worker import AIWorkerSupervisor
+from command_queue import MOVEMENT, TTL, Command, CommandQueue
+from control_loop import is_axis_input
+from fleet import Fleet, UnknownVehicle
+from flight_log import FlightLogWriter
+from geofence import load_geofence
+from telemetry import DEFAULT_TIER, TelemetryPublisher
+from vehicle import create_vehicles
+
+logger = logging.getLogger(__name__)
+
+# Control state and Socket.IO event handlers, shared by the two deployments:
+# app.py (Flask-SocketIO under eventlet, with streaming.py as a second
+# process) and asgi_app.py (python-socketio ASGI, one process). Handlers take
+# the client's sid explicitly; `socketio` only needs emit(),
+# start_background_task(), sleep() and server.enter_room()/leave_room()/eio,
+# plus create_event() where background tasks are not eventlet greenthreads.
+
+# Prometheus metrics, served on /metrics
+CLIENTS = metrics.gauge("aerosense_socketio_clients", "Connected Socket.IO clients")
+CONTROL_EVENT_SECONDS = metrics.histogram("aerosense_control_event_seconds",
+                                          "Processing time of 'control' events", ["kind"])
+AI_WORKER_STATES = ("stopped", "starting", "warming", "paused", "active", "stopping", "restarting", "failed")
+AI_WORKER_STATE = metrics.gauge("aerosense_ai_worker_state", "1 for the AI worker's current state", ["state"])
+AI_WORKER_RESTARTS = metrics.gauge("aerosense_ai_worker_restarts", "AI worker restarts")
+AI_WORKER_FPS = metrics.gauge("aerosense_ai_worker_fps", "Frames processed by the AI worker per second")
+AI_WORKER_INFERENCE = metrics.gauge("aerosense_ai_worker_inference_seconds", "AI worker inference time (EWMA)")
+
+TAKEOFF_ALTITUDE = 10
+
+# Gesture commands from the AI worker, as the held-key axis each one drives
+AI_COMMAND_KEYS = {
+    "up": "throttle_up",
+    "down": "throttle_down",
+    "left": "roll_left",
+    "right": "roll_right",
+    "yaw_x": "yaw_right",
+    "yaw_y": "yaw_left",
+}
+
+# AI worker video output, relayed to the room of the vehicle it flies:
+# 'ai_landmarks' binary landmark packets (landmark_codec.py), 'ai_frame' JPEG
+# attachments at the worker's capped rate, 'processed_frame' legacy base64 frames
+AI_STREAM_EVENTS = ('ai_landmarks', 'ai_frame', 'processed_frame')
+MAX_AI_PAYLOAD = 512 * 1024
+
+
+class ControlServer:
+    def __init__(self, socketio):
+        self.socketio = socketio
+
+        # Persistent AI worker (drone.py --worker), kept warm and paused/resumed on mode switches
+        self.ai_worker = AIWorkerSupervisor()
+        metrics.on_collect(self.collect_ai_worker_metrics)
+
+        # Flight log of every telemetry sample and control input, off unless
+        # AEROSENSE_FLIGHT_LOG names a directory; one subdirectory per server run
+        flight_log_root = os.environ.get("AEROSENSE_FLIGHT_LOG")
+        self.flight_log = FlightLogWriter(flight_log_root) if flight_log_root else None
+
+        # Keep-out zones from a GeoJSON file, checked on every outgoing setpoint and take-off
+        geofence_path = os.environ.get("AEROSENSE_GEOFENCE")
+        self.geofence = load_geofence(geofence_path) if geofence_path else None
+
+        # Vehicles, as comma-separated "[id=]backend" entries: "sim" (random walk),
+        # "fleet:<count>" (vectorized fleet simulator) or a MAVLink connection string,
+        # e.g. AEROSENSE_VEHICLE=udpin:0.0.0.0:14550 with sitl.py or a real autopilot.
+        # Telemetry history keeps AEROSENSE_HISTORY_SAMPLES per vehicle (default 1 h at 10 Hz)
+        self.fleet = Fleet(socketio, create_vehicles(os.environ.get("AEROSENSE_VEHICLE", "sim")),
+                           control_rate_hz=float(os.environ.get("AEROSENSE_CONTROL_HZ", 50)),
+                           history_capacity=int(os.environ.get("AEROSENSE_HISTORY_SAMPLES", 36000)),
+                           flight_log=self.flight_log, geofence=self.geofence)
+        self.history_hz = float(os.environ.get("AEROSENSE_HISTORY_HZ", 10))
+
+        # One shared telemetry publisher for all clients and vehicles
+        self.telemetry = TelemetryPublisher(socketio, self.fleet.sample,
+                                            rate_hz=float(os.environ.get("AEROSENSE_TELEMETRY_HZ", 10)),
+                                            default_vehicle=self.fleet.default_id)
+
+        # Stale or preempted AI commands are dropped here instead of reaching the vehicle
+        self.ai_commands = CommandQueue(self.execute_ai_command, name="ai")
+
+    # Server startup: warm AI worker, history recording, AI command consumer
+    def start(self):
+        # Start the AI worker now so it is warm by the time AI mode is selected
+        self.ai_worker.start()
+        # Record telemetry history from startup, not just once someone connects
+        self.fleet.start_recording(self.history_hz)
+        self.ai_commands.start(self.socketio.start_background_task, self.create_event)
+
+    # An event background tasks can block on: green under eventlet (engineio's
+    # async driver), a threading.Event from asgi_app.ThreadedSocketIO
+    def create_event(self):
+        create = getattr(self.socketio, 'create_event', None) or self.socketio.server.eio.create_event
+        return create()
+
+    def close(self):
+        self.ai_commands.stop()
+        self.ai_worker.stop()
+        self.fleet.close()
+        if self.flight_log:
+            self.flight_log.close()
+
+    def collect_ai_worker_metrics(self):
+        status = self.ai_worker.status()
+        for state in AI_WORKER_STATES:
+            AI_WORKER_STATE.labels(state).set(1 if status["state"] == state else 0)
+        AI_WORKER_RESTARTS.set(status["restarts"])
+        AI_WORKER_FPS.set(status["stats"].get("fps", 0.0))
+        AI_WORKER_INFERENCE.set(status["stats"].get("inference_ms", 0.0) / 1000)
+
+    # Event name -> handler(sid, *args), for everything but connect/disconnect
+    def events(self):
+        handlers = {
+            'select_vehicle': self.select_vehicle,
+            'telemetry_subscribe': self.telemetry_subscribe,
+            'telemetry_unsubscribe': self.telemetry_unsubscribe,
+            'clock_sync': self.clock_sync,
+            'control': self.control,
+            'ai_control': self.ai_control,
+            'mode': self.mode,
+        }
+        for event in AI_STREAM_EVENTS:
+            handlers[event] = lambda sid, payload, event=event: self.relay_ai_stream(sid, event, payload)
+        return handlers
+
+    # ---- HTTP ----
+
+    def control_stats(self):
+        return {vehicle_id: entry.control_loop.stats() for vehicle_id, entry in self.fleet.vehicles.items()}
+
+    def ai_status(self):
+        return dict(self.ai_worker.status(), commands=self.ai_commands.stats())
+
+    # Raises ValueError for bad parameters; `get(name, default, type)` reads a query argument
+    def telemetry_history(self, get):
+        # ?vehicle_id=&from=&to=&points=&method=lttb|minmax&field=alt
+        # from/to are unix seconds; negative values are relative to now (from=-600: last 10 min)
+        now = time.time()
+        entry = self.fleet.get(get('vehicle_id', self.fleet.default_id, str))
+        t_from = get('from', None, float)
+        t_to = get('to', None, float)
+        if t_from is not None and t_from < 0:
+            t_from += now
+        if t_to is not None and t_to < 0:
+            t_to += now
+        points = max(3, min(get('points', 1000, int), 10000))
+        method = get('method', 'lttb', str)
+        field = get('field', 'alt', str)
+        count, series = entry.history.query(t_from, t_to, points, method, field)
+        result = {'vehicle_id': entry.vehicle_id, 'method': method, 'field': field,
+                  'samples': count, 'points': len(series['t'])}
+        result.update({name: column.tolist() for name, column in series.items()})
+        return result
+
+    # ---- Socket.IO ----
+
+    def connect(self, sid):
+        print("Client connected")
+        CLIENTS.inc()
+        self.fleet.start_recording(self.history_hz)
+        entry = self.fleet.select(sid, self.fleet.default_id)
+        self.telemetry.subscribe(sid, vehicle_id=entry.vehicle_id)
+        self.socketio.emit('vehicles', {'vehicles': self.fleet.describe(), 'selected': entry.vehicle_id}, to=sid)
+        self.socketio.emit('arm', entry.backend.state.armed, to=sid)
+
+    def disconnect(self, sid):
+        print("Client disconnected")
+        CLIENTS.dec()
+        self.telemetry.unsubscribe(sid)
+        self.fleet.release(sid)
+        # Sticks and keys the client was holding, on whichever vehicle, go neutral
+        for entry in self.fleet.vehicles.values():
+            entry.control_loop.release(sid)
+
+    def select_vehicle(self, sid, data):
+        # Switch the vehicle this client flies and watches, keeping its telemetry tier
+        vehicle_id = data.get('vehicle_id') if isinstance(data, dict) else data
+        previous = self.fleet.selected.get(sid, self.fleet.default_id)
+        try:
+            entry = self.fleet.select(sid, str(vehicle_id))
+        except UnknownVehicle as e:
+            return {'ok': False, 'error': str(e)}
+        if previous != entry.vehicle_id:
+            tier = self.telemetry.client_tier(sid, previous)
+            self.telemetry.unsubscribe(sid, previous)
+            self.telemetry.subscribe(sid, tier or DEFAULT_TIER, vehicle_id=entry.vehicle_id)
+        return {'ok': True, 'vehicle_id': entry.vehicle_id, 'armed': entry.backend.state.armed}
+
+    def telemetry_subscribe(self, sid, data):
+        # Pick a telemetry tier, e.g. {'tier': 'pilot'} (20 Hz) or {'tier': 'dashboard'} (2 Hz),
+        # for the selected vehicle or another one with {'vehicle_id': ...}
+        tier = data.get('tier') if isinstance(data, dict) else data
+        try:
+            entry = self.fleet.resolve(sid, data)
+            self.telemetry.subscribe(sid, tier, vehicle_id=entry.vehicle_id)
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, 'tier': tier, 'vehicle_id': entry.vehicle_id}
+
+    def telemetry_unsubscribe(self, sid, data):
+        try:
+            entry = self.fleet.resolve(sid, data)
+        except UnknownVehicle as e:
+            return {'ok': False, 'error': str(e)}
+        self.telemetry.unsubscribe(sid, entry.vehicle_id)
+        return {'ok': True, 'vehicle_id': entry.vehicle_id}
+
+    def clock_sync(self, sid, client_ms):
+        # Lets clients estimate their clock offset so 't' stamps are comparable
+        return time.time() * 1000
+
+    def control(self, sid, data):
+        start = time.perf_counter()
+        kind = 'axis' if is_axis_input(data) else 'command'
+        try:
+            self.apply_control(sid, data)
+        finally:
+            CONTROL_EVENT_SECONDS.labels(kind).observe(time.perf_counter() - start)
+
+    def apply_control(self, sid, data):
+        # Goes to data['vehicle_id'] if given, else the client's selected vehicle
+        try:
+            entry = self.fleet.resolve(sid, data)
+        except UnknownVehicle as e:
+            logger.warning(f"Dropping control input: {e}")
+            return
+
+        # Stick and held-key axes are coalesced and applied by the vehicle's control loop
+        if is_axis_input(data):
+            entry.control_loop.start()
+            if entry.control_loop.submit(data, source=sid):
+                self.fleet.log_control(entry)
+            return
+
+        logger.debug(f"Received control for vehicle {entry.vehicle_id}: {data}")
+
+        if isinstance(data, dict) and data.get('type') == 'keyboard':
+            self.handle_command(entry, data.get('code'))
+        elif isinstance(data, str):
+            self.handle_command(entry, data)
+
+    # Discrete commands from buttons and keys, reported to the vehicle's room
+    def handle_command(self, entry, code):
+        fleet = self.fleet
+        vehicle = entry.backend
+        if code in ('arm', 'disarm', 'takeoff', 'land'):
+            fleet.log_control(entry, code)
+        if code == 'arm':
+            vehicle.arm()
+            fleet.emit(entry, 'arm', True)
+        elif code == 'disarm':
+            vehicle.disarm()
+            entry.control_loop.reset()
+            fleet.emit(entry, 'arm', False)
+        elif code == 'takeoff' and vehicle.state.armed:
+            print("Takeoff command received")
+            zone = entry.fence_climb(TAKEOFF_ALTITUDE)
+            if zone is not None:
+                fleet.emit(entry, 'status', f"Takeoff blocked by geofence zone {zone}")
+                return
+            vehicle.takeoff(TAKEOFF_ALTITUDE)
+            fleet.emit(entry, 'status', "Taking off...")
+        elif code == 'land' and vehicle.state.armed:
+            print("Land command received")
+            vehicle.land()
+            fleet.emit(entry, 'status', "Landing...")
+
+    def ai_control(self, sid, data):
+        # {'command': ..., 't': client send time in ms (clock-sync corrected), 'ttl': ms (optional)}
+        if self.fleet.ai_vehicle is None or not isinstance(data, dict):
+            return
+        self.ai_commands.start(self.socketio.start_background_task, self.create_event)
+        created, ttl = data.get('t'), data.get('ttl')
+        self.ai_commands.put(Command(str(data.get('command')),
+                                     created=created / 1000.0 if isinstance(created, (int, float)) else None,
+                                     ttl=ttl / 1000.0 if isinstance(ttl, (int, float)) else None,
+                                     payload=self.fleet.ai_vehicle))
+
+    # Runs on the AI command queue; stale commands never get here
+    def execute_ai_command(self, command):
+        entry = self.fleet.get(command.payload)
+        if command.name == 'land':
+            self.handle_command(entry, 'land')
+        elif command.name in ('stable', 'stop'):
+            entry.control_loop.reset()
+        elif command.name in AI_COMMAND_KEYS:
+            # One gesture drives one axis: clear the others, then hold this one.
+            # The worker repeats a held gesture every frame; if it stalls or
+            # dies the axis is zeroed after the movement TTL.
+            entry.control_loop.start()
+            entry.control_loop.reset()
+            entry.control_loop.submit({'type': 'keyboard', 'code': AI_COMMAND_KEYS[command.name],
+                                       't': command.created * 1000},
+                                      source='ai', timeout=TTL[MOVEMENT])
+            self.fleet.log_control(entry)
+        else:
+            logger.warning(f"Unknown AI command: {command.name}")
+
+    def relay_ai_stream(self, sid, event, payload):
+        if self.fleet.ai_vehicle is None:
+            return
+        size = len(payload) if isinstance(payload, (bytes, bytearray)) else len(str(payload))
+        if size > MAX_AI_PAYLOAD:
+            logger.warning(f"Dropping {size} byte '{event}' from the AI worker")
+            return
+        self.fleet.emit(self.fleet.get(self.fleet.ai_vehicle), event, payload, skip_sid=sid)
+
+    def mode(self, sid, data):
+        # 'ai' / 'manual', or {'mode': ..., 'vehicle_id': ...}; the single AI worker
+        # flies one vehicle at a time
+        fleet = self.fleet
+        mode = data.get('mode') if isinstance(data, dict) else data
+        try:
+            entry = fleet.resolve(sid, data)
+        except UnknownVehicle as e:
+            return {'ok': False, 'error': str(e)}
+        if mode == "ai":
+            print(f"Resuming AI Control of vehicle {entry.vehicle_id}...")
+            if fleet.ai_vehicle not in (None, entry.vehicle_id):
+                fleet.emit(fleet.get(fleet.ai_vehicle), 'mode', "manual")
+            fleet.ai_vehicle = entry.vehicle_id
+            self.ai_worker.resume()
+        elif fleet.ai_vehicle == entry.vehicle_id:
+            print("Pausing AI Control...")
+            fleet.ai_vehicle = None
+            self.ai_worker.pause()
+        fleet.emit(entry, 'mode', mode)
+        return {'ok': True, 'vehicle_id': entry.vehicle_id, 'mode': mode}
@@ -1,128 +1,335 @@
-import base64
 import time
-import cv2
-import mediapipe as mp
-import numpy as np
-import socketio
-from collections import deque
-
-# Initialize SocketIO client
-sio = socketio.Client()
-sio.connect('https://192.168.7.57:5000', transports=['websocket'])  # Use wss://
-
-# Initialize MediaPipe Hands module
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_draw = mp.solutions.drawing_utils
-
-# Track last state of raised fingers
-finger_state_history = deque(maxlen=2)
-
-# Function to calculate angle between three points
-def calculate_angle(a, b, c):
-    ab = np.array([a[0] - b[0], a[1] - b[1]])
-    bc = np.array([c[0] - b[0], c[1] - b[1]])
-    dot_product = np.dot(ab, bc)
-    mag_ab = np.linalg.norm(ab)
-    mag_bc = np.linalg.norm(bc)
-    angle = np.arccos(dot_product / (mag_ab * mag_bc))
-    return np.degrees(angle)
-
-# Function to check drone mode based on raised fingers
-def check_drone_mode(fingers_raised):
-    command = None
-    if not fingers_raised:
-        command = "stable"
-    elif set(fingers_raised) == {"Thumb", "Index", "Middle", "Ring", "Pinky"}:
-        command = "land"
-    elif set(fingers_raised) == {"Index", "Middle"}:
-        command = "down"
-    elif set(fingers_raised) == {"Index"}:
-        command = "up"
-    elif set(fingers_raised) == {"Index", "Middle", "Ring"}:
-        command = "yaw_x"
-    elif set(fingers_raised) == {"Index", "Middle", "Ring", "Pinky"}:
-        command = "yaw_y"
-    elif set(fingers_raised) == {"Thumb"}:    
-        command = "right"
-    elif set(fingers_raised) == {"Pinky"}:    
-        command = "left"
-    
-    if command:
-        sio.emit('ai_control', {'command': command})  # Send command to Raspberry Pi
-        print(f"Detected Fingers: {fingers_raised}, Command: {command}")
 
+_process_start = time.perf_counter()
 
-# Capture from client's camera
-cap = cv2.VideoCapture(0)
+import logging
+import os
+import sys
+import threading
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
+from gestures import command_for_fingers, hand_labels, landmarks_to_array
+from governor import create_governor
+from hand_model import load_hands
+from landmark_codec import LandmarkEncoder
+from landmark_filter import GestureFilter
+from profiling import SamplingProfiler, StageTimers, install_signal_handler
+from socket_sender import SocketSender
+from startup_profile import StartupProfile
 
-    frame = cv2.flip(frame, 1)
-    results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    current_fingers_raised = []
+# Heavy modules (mediapipe, OpenCV, socketio) are imported lazily below so the
+# model warms up and the socket connects in the background while the camera
+# opens. Set AEROSENSE_PROFILE_STARTUP=1 or pass --profile-startup to log the
+# time spent in each startup phase. AEROSENSE_PROFILE_STAGES=1 or
+# --profile-stages logs per-stage loop timings every 10 s, and SIGUSR1 writes
+# a 10 s sampling profile of all threads (see profiling.py). The inference
+# rate is capped by a thermal/load governor (governor.py, AEROSENSE_GOVERNOR).
+#
+# With --worker the script runs as the warm standby worker managed by
+# ai_worker.py: it starts paused and is resumed/paused over the control
+# channel instead of being restarted on every mode switch.
+#
+# What goes to the web client is set by AEROSENSE_AI_STREAM:
+#   landmarks (default)  binary 'ai_landmarks' packets, the hand landmarks and
+#                        recognized command in ~180 bytes (landmark_codec.py);
+#                        JPEG frames go as binary 'ai_frame' attachments at
+#                        most AEROSENSE_AI_FRAME_FPS per second (0 = never)
+#   base64               the old base64 JPEG 'processed_frame' on every frame
+# All of it goes through socket_sender.py: the loop only queues payloads
+# (latest-only for frames and landmarks, repeated commands coalesced) and a
+# background thread sends them and reconnects with backoff, so a bad link
+# lowers the send rate instead of the inference rate.
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SERVER_URL = 'https://192.168.7.57:5000'
+AI_STREAM = os.environ.get("AEROSENSE_AI_STREAM", "landmarks")
+FRAME_FPS = float(os.environ.get("AEROSENSE_AI_FRAME_FPS", 0))
+
+profile = StartupProfile(
+    enabled=os.environ.get("AEROSENSE_PROFILE_STARTUP") == "1" or "--profile-startup" in sys.argv,
+    start=_process_start,
+)
+stages = StageTimers(
+    "gesture loop",
+    enabled=os.environ.get("AEROSENSE_PROFILE_STAGES") == "1" or "--profile-stages" in sys.argv,
+)
+profiler = SamplingProfiler("drone")
+
+hands = None
+mp_hands = None
+mp_draw = None
+inference_client = None
+model_ready = threading.Event()
+model_error = None  # why load_model() failed, if it did
+stop_requested = threading.Event()
+
+worker_mode = "--worker" in sys.argv
+paused = threading.Event()  # Set while the worker is on standby
+if worker_mode:
+    paused.set()
+control_lock = threading.Lock()
+stats = {"frames": 0, "commands": 0, "inference_ms": 0.0, "fps": 0.0}
+clock_offset_ms = 0.0  # server clock minus ours, from 'clock_sync'
+
+# Smooth landmarks and finger states (replaces the 2-frame majority vote)
+gesture_filter = GestureFilter()
+# Frames are mirrored before detection, so the landmarks are too
+landmark_encoder = LandmarkEncoder(mirrored=True)
+
+# Hand inference rate, stepped down by the governor when the Pi runs hot
+INFERENCE_LADDER = [{"inference_hz": hz} for hz in (30, 20, 15, 10, 5)]
+governor = create_governor("inference", INFERENCE_LADDER, target_latency=0.060)
+
+link = SocketSender(SERVER_URL, transports=['websocket'])  # Use wss://
+link.channel('ai_control', maxlen=8, window=4, coalesce=lambda data: data['command'])
+link.channel('ai_landmarks', maxlen=1, window=2)
+link.channel('ai_frame', maxlen=1, window=1)
+link.channel('processed_frame', maxlen=1, window=1)
+
+
+# Import MediaPipe, build the Hands graph and run a dummy frame through it.
+# On failure the worker reports a 'failed' state (the supervisor restarts
+# it) and a standalone run stops and exits non-zero.
+def load_model():
+    global model_error
+    try:
+        _load_model()
+    except Exception as e:
+        logger.exception("Loading the hand model failed")
+        model_error = f"{type(e).__name__}: {e}"
+        if not worker_mode:
+            stop_requested.set()
+        return
+    model_ready.set()
 
-    if results.multi_hand_landmarks:
-        for landmarks in results.multi_hand_landmarks:
-            mp_draw.draw_landmarks(frame, landmarks, mp_hands.HAND_CONNECTIONS)
-            fingers = {
-                "Thumb": (4, 3), "Index": (8, 6), "Middle": (12, 10),
-                "Ring": (16, 14), "Pinky": (20, 18)
-            }
-            for finger_name, (tip_id, base_id) in fingers.items():
-                tip_y = landmarks.landmark[tip_id].y
-                base_y = landmarks.landmark[base_id].y
-                if finger_name == "Thumb":
-                    point1 = (landmarks.landmark[0].x, landmarks.landmark[0].y)
-                    point3 = (landmarks.landmark[base_id].x, landmarks.landmark[base_id].y)
-                    point4 = (landmarks.landmark[tip_id].x, landmarks.landmark[tip_id].y)
-                    angle = calculate_angle(point1, point3, point4)
-                    if angle > 150:
-                        current_fingers_raised.append("Thumb")
-                else:
-                    if tip_y < base_y:
-                        current_fingers_raised.append(finger_name)
-    
-    finger_state_history.append(current_fingers_raised)
-    check_drone_mode(current_fingers_raised)
-    
-
-        # Encode frame to Base64 for streaming
-    _, buffer = cv2.imencode('.jpg', frame)
-    encoded_frame = base64.b64encode(buffer).decode('utf-8')
-    
-
-    
-    # Send processed frame to the web client
-    sio.emit('processed_frame', {'image': encoded_frame})
-    # cv2.imshow('Hand Detection', frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
+def _load_model():
+    global hands, mp_hands, mp_draw, inference_client
+    # Optional shared inference service (host:port of inference_service.py)
+    if os.environ.get("AEROSENSE_INFERENCE_SERVER"):
+        with profile.phase("connect inference"):
+            from inference_service import InferenceClient
+            host, port = os.environ["AEROSENSE_INFERENCE_SERVER"].rsplit(":", 1)
+            inference_client = InferenceClient(host, int(port))
+        return
+
+    mp_hands, hands, mp_draw = load_hands(profile)
+
+
+# Start the sender; it keeps (re)connecting to the control server in the background
 def connect_socket():
-    while True:
+    link.on('stop_ai', stop_ai)
+    link.on_connect(sync_clock)
+    link.on_connect(lambda: profile.mark("socket connected"))
+    with profile.phase("import socketio"):
+        link.start()
+
+
+# Estimate the server clock offset so command timestamps ('t') are in server time
+def sync_clock(rounds=5):
+    global clock_offset_ms
+    samples = []
+    for _ in range(rounds):
         try:
-            sio.connect('https://192.168.7.57:5000', transports=['websocket'])
-            print("Reconnected to WebSocket")
-            break
+            sent = time.time() * 1000
+            server_ms = link.call('clock_sync', sent, timeout=2)
+            received = time.time() * 1000
         except Exception as e:
-            print("WebSocket Reconnect Failed:", e)
-            time.sleep(5)  # Retry after 5 seconds
-
-sio.on('disconnect', connect_socket)  # Reconnect when disconnected
+            logger.warning(f"Clock sync failed: {e}")
+            continue
+        samples.append((received - sent, server_ms - (sent + received) / 2))
+    if samples:
+        # The fastest round trip gives the tightest bound on the offset
+        rtt, clock_offset_ms = min(samples)
+        logger.info(f"Server clock offset {clock_offset_ms:.1f} ms (round trip {rtt:.1f} ms)")
 
 
-@sio.on('stop_ai')
 def stop_ai():
-    print("Received stop signal. Exiting AI Control...")
-    sio.disconnect()
-    exit(0)  # Exit the script immediately
+    if worker_mode:
+        print("Received stop signal. Pausing AI Control...")
+        paused.set()
+    else:
+        print("Received stop signal. Exiting AI Control...")
+        stop_requested.set()
+
+
+def worker_state():
+    if model_error is not None:
+        return "failed"
+    if stop_requested.is_set():
+        return "stopping"
+    if not model_ready.is_set():
+        return "warming"
+    return "paused" if paused.is_set() else "active"
+
+
+def send_control(conn, message):
+    with control_lock:
+        conn.send(message)
+
+
+# Push state and inference stats to the supervisor once a second
+def send_heartbeats(conn):
+    last_frames = 0
+    while not stop_requested.is_set():
+        time.sleep(1)
+        stats["fps"] = round(stats["frames"] - last_frames, 1)
+        last_frames = stats["frames"]
+        try:
+            send_control(conn, {"type": "heartbeat", "state": worker_state(), "error": model_error,
+                                "stats": dict(stats, link=link.stats(), governor=governor.state())})
+        except (OSError, EOFError):
+            break
+
+
+# Control channel to ai_worker.AIWorkerSupervisor in app.py
+def worker_channel():
+    from multiprocessing.connection import Client
+    host, port = os.environ["AEROSENSE_WORKER_ADDRESS"].rsplit(":", 1)
+    conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ["AEROSENSE_WORKER_AUTHKEY"]))
+    threading.Thread(target=send_heartbeats, args=(conn,), name="heartbeat", daemon=True).start()
+    while not stop_requested.is_set():
+        try:
+            message = conn.recv()
+        except (OSError, EOFError):
+            # Supervisor went away, there is nobody left to resume us
+            stop_requested.set()
+            break
+        cmd = message.get("cmd")
+        if cmd == "pause":
+            paused.set()
+        elif cmd == "resume":
+            paused.clear()
+        elif cmd == "shutdown":
+            stop_requested.set()
+        send_control(conn, {"type": "ack", "cmd": cmd, "state": worker_state()})
+
+
+# Send the command for the raised fingers, if any; returns it
+def check_drone_mode(fingers_raised):
+    command = command_for_fingers(fingers_raised)
+    if command and link.connected.is_set():
+        # Stamped so the server can drop it if the link delays it past its deadline
+        link.send('ai_control', {'command': command, 't': time.time() * 1000 + clock_offset_ms})
+        stats["commands"] += 1
+        profile.mark("first command sent")
+        profile.report()
+        print(f"Detected Fingers: {fingers_raised}, Command: {command}")
+    return command
+
+
+# Detect hand landmarks in a frame, drawing them onto it if the frame is going to be sent.
+# Returns the landmark arrays and their handedness labels (None from the inference service)
+def detect_hands(frame, cv2, draw=True):
+    with stages.stage("convert"):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if inference_client is not None:
+        with stages.stage("remote inference"):
+            hand_points, _, _ = inference_client.infer(rgb)
+        if draw:
+            with stages.stage("draw"):
+                h, w = frame.shape[:2]
+                for points in hand_points:
+                    for x, y, _ in points:
+                        cv2.circle(frame, (int(x * w), int(y * h)), 4, (0, 255, 0), -1)
+        return list(hand_points), None
+
+    hand_points = []
+    with stages.stage("hands.process"):
+        results = hands.process(rgb)
+    if results.multi_hand_landmarks:
+        for landmarks in results.multi_hand_landmarks:
+            if draw:
+                with stages.stage("draw"):
+                    mp_draw.draw_landmarks(frame, landmarks, mp_hands.HAND_CONNECTIONS)
+            hand_points.append(landmarks_to_array(landmarks))
+    return hand_points, hand_labels(results)
+
+
+def main():
+    install_signal_handler(profiler)
+    governor.start()
+    if worker_mode:
+        threading.Thread(target=worker_channel, name="control", daemon=True).start()
+
+    # Model and socket come up in the background while the camera opens
+    threading.Thread(target=load_model, name="model", daemon=True).start()
+    threading.Thread(target=connect_socket, name="socket", daemon=True).start()
+
+    with profile.phase("import cv2"):
+        import base64
+        import cv2
+
+    # Capture from client's camera
+    with profile.phase("open camera"):
+        cap = cv2.VideoCapture(0)
+    profile.mark("camera open")
+
+    last_frame_sent = 0.0
+    last_inference = 0.0
+    while cap.isOpened() and not stop_requested.is_set():
+        with stages.stage("capture"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        profile.mark("first frame")
+
+        # Keep reading while paused so the camera buffer stays fresh
+        if paused.is_set() or not model_ready.is_set():
+            continue
+        # Frames between the governor's inference slots are read and dropped
+        if time.monotonic() - last_inference < 1.0 / governor.settings["inference_hz"]:
+            continue
+        last_inference = time.monotonic()
+
+        stages.tick()
+        with stages.stage("flip"):
+            frame = cv2.flip(frame, 1)
+        now = time.monotonic()
+        frame_due = AI_STREAM == "base64" or (FRAME_FPS > 0 and now - last_frame_sent >= 1.0 / FRAME_FPS)
+        inference_start = time.perf_counter()
+        hand_points, labels = detect_hands(frame, cv2, draw=frame_due)
+        inference_ms = (time.perf_counter() - inference_start) * 1000
+        governor.observe(inference_ms / 1000)
+        stats["frames"] += 1
+        stats["inference_ms"] = round(0.9 * stats["inference_ms"] + 0.1 * inference_ms, 2)
+        profile.mark("first inference")
+        with stages.stage("gesture filter"):
+            command = check_drone_mode(gesture_filter.update(hand_points, time.time(), labels))
+
+        if link.connected.is_set() and AI_STREAM == "base64":
+            # Encode frame to Base64 for streaming
+            with stages.stage("encode"):
+                _, buffer = cv2.imencode('.jpg', frame)
+                encoded_frame = base64.b64encode(buffer).decode('utf-8')
+
+            # Send processed frame to the web client
+            with stages.stage("emit"):
+                link.send('processed_frame', {'image': encoded_frame})
+        elif link.connected.is_set():
+            # Landmarks every frame, the browser overlays them on its own video
+            with stages.stage("encode"):
+                packet = landmark_encoder.encode(hand_points, command, time.time() * 1000 + clock_offset_ms)
+            with stages.stage("emit"):
+                link.send('ai_landmarks', packet)
+            if frame_due:
+                last_frame_sent = now
+                with stages.stage("encode"):
+                    _, buffer = cv2.imencode('.jpg', frame)
+                with stages.stage("emit"):
+                    link.send('ai_frame', buffer.tobytes())
+        # cv2.imshow('Hand Detection', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
 
+    cap.release()
+    cv2.destroyAllWindows()
+    link.stop()
+    governor.stop()
+    if model_error is not None:
+        sys.exit(1)
 
 
-cap.release()
-cv2.destroyAllWindows()
-sio.disconnect()
+if __name__ == '__main__':
+    main()
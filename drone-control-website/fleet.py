@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+
+from control_loop import AXES, ControlLoop
+from flight_log import COMMANDS
+import metrics
+from telemetry_history import TelemetryHistory
+from vehicle import telemetry_dict
+
+logger = logging.getLogger(__name__)
+
+EMITS = metrics.counter("aerosense_socketio_emits_total", "Socket.IO emits by event", ["event"])
+FENCE_BLOCKED = metrics.counter("aerosense_geofence_blocked_total", "Setpoints and commands stopped by the geofence")
+
+# Stick setpoints are checked against the geofence along the path the vehicle
+# covers at its current velocity over this many seconds
+FENCE_LOOKAHEAD = 2.0
+NEUTRAL_SETPOINT = {axis: 0.0 for axis in AXES}
+
+# Vehicles registered by id, for running several drones from one server.
+#
+# Each vehicle has its own backend, its own fixed-rate control loop (started
+# on first stick input) and its own Socket.IO room, f"vehicle:{id}", that
+# carries its events ('arm', 'status', 'mode'). Every client has a selected
+# vehicle, the one its control and mode events go to unless the event names
+# another 'vehicle_id'. Telemetry rooms are handled by TelemetryPublisher.
+#
+# The fleet keeps its own simulation clock: advance() steps every backend by
+# the time since the previous call, so the telemetry publisher and the
+# history recorder can both sample it without double-stepping simulators.
+#
+# With a geofence (geofence.py), every outgoing stick setpoint is checked
+# before it is sent: if the vehicle's current motion would take it into a
+# keep-out zone within FENCE_LOOKAHEAD, neutral sticks are sent instead so
+# it brakes. A vehicle that is already inside a zone is not held there.
+
+
+class UnknownVehicle(ValueError):
+    pass
+
+
+class FleetEntry:
+    def __init__(self, socketio, vehicle_id, backend, control_rate_hz, history_capacity, geofence=None):
+        self.vehicle_id = vehicle_id
+        self.backend = backend
+        self.geofence = geofence
+        self.fence_zone = None  # zone the last setpoint was stopped for
+        self.fence_blocked = 0
+        self.room = f"vehicle:{vehicle_id}"
+        self.control_loop = ControlLoop(socketio, self.apply_setpoint, rate_hz=control_rate_hz)
+        self.history = TelemetryHistory(history_capacity)
+
+    # Send one merged stick setpoint to the vehicle per control tick
+    def apply_setpoint(self, setpoint):
+        state = self.backend.state
+        if not state.armed:
+            return
+        if self.geofence is not None:
+            setpoint = self.fence_setpoint(state, setpoint)
+        self.backend.send_setpoint(setpoint)
+
+    def fence_setpoint(self, state, setpoint):
+        zone = self.geofence.check_motion(state.lat, state.lon, state.alt, state.vx, state.vy, state.vz,
+                                          FENCE_LOOKAHEAD)
+        if zone is None or self.geofence.check(state.lat, state.lon, state.alt) is not None:
+            self.fence_zone = None
+            return setpoint
+        if zone != self.fence_zone:
+            logger.warning(f"Vehicle {self.vehicle_id} heading into geofence zone {zone}, braking")
+        self.fence_zone = zone
+        self.fence_blocked += 1
+        FENCE_BLOCKED.inc()
+        return NEUTRAL_SETPOINT
+
+    # Keep-out zone between the vehicle and `altitude` straight above it, or None
+    def fence_climb(self, altitude):
+        if self.geofence is None:
+            return None
+        state = self.backend.state
+        hit = self.geofence.check_path([state.lat, state.lat], [state.lon, state.lon], [state.alt, altitude])
+        if hit is None:
+            return None
+        self.fence_blocked += 1
+        FENCE_BLOCKED.inc()
+        return hit[1]
+
+
+class Fleet:
+    def __init__(self, socketio, backends, control_rate_hz=50.0, namespace='/', history_capacity=36000,
+                 flight_log=None, geofence=None):
+        if not backends:
+            raise ValueError("A fleet needs at least one vehicle")
+        self.socketio = socketio
+        self.namespace = namespace
+        self.geofence = geofence  # Geofence, or None
+        self.vehicles = {vehicle_id: FleetEntry(socketio, vehicle_id, backend, control_rate_hz, history_capacity,
+                                                geofence)
+                         for vehicle_id, backend in backends.items()}
+        self.last_update = None
+        self.recorder = None
+        self.flight_log = flight_log  # FlightLogWriter, or None
+        self.default_id = next(iter(self.vehicles))
+        self.selected = {}  # sid -> vehicle_id
+        self.ai_vehicle = None  # vehicle flown by the AI worker, if any
+        self.lock = threading.Lock()
+
+    def get(self, vehicle_id):
+        entry = self.vehicles.get(vehicle_id)
+        if entry is None:
+            raise UnknownVehicle(f"Unknown vehicle: {vehicle_id}")
+        return entry
+
+    # Vehicle an event applies to: explicit 'vehicle_id', else the client's selection
+    def resolve(self, sid, data=None):
+        if isinstance(data, dict) and data.get('vehicle_id') is not None:
+            return self.get(str(data['vehicle_id']))
+        return self.get(self.selected.get(sid, self.default_id))
+
+    # Make vehicle_id the client's current vehicle and move it to that room
+    def select(self, sid, vehicle_id):
+        entry = self.get(vehicle_id)
+        with self.lock:
+            previous = self.selected.get(sid)
+            self.selected[sid] = vehicle_id
+        if previous is not None and previous != vehicle_id:
+            self.socketio.server.leave_room(sid, self.vehicles[previous].room, namespace=self.namespace)
+        self.socketio.server.enter_room(sid, entry.room, namespace=self.namespace)
+        return entry
+
+    def release(self, sid):
+        with self.lock:
+            self.selected.pop(sid, None)
+
+    def emit(self, entry, event, payload, skip_sid=None):
+        self.socketio.emit(event, payload, to=entry.room, namespace=self.namespace, skip_sid=skip_sid)
+        EMITS.labels(event).inc()
+
+    # Step every backend to now (shared simulators step once per call)
+    def advance(self):
+        with self.lock:
+            now = time.monotonic()
+            dt = now - self.last_update if self.last_update is not None else 0.0
+            self.last_update = now
+            for entry in self.vehicles.values():
+                entry.backend.update(dt)
+
+    # Telemetry publisher callback; dt is unused since the fleet keeps its own clock
+    def sample(self, dt, vehicle_ids):
+        self.advance()
+        return {vehicle_id: telemetry_dict(self.vehicles[vehicle_id].backend.state)
+                for vehicle_id in vehicle_ids if vehicle_id in self.vehicles}
+
+    # Append every vehicle's current state to its history and the flight log
+    def record(self):
+        self.advance()
+        now = time.time()
+        for entry in self.vehicles.values():
+            sample = telemetry_dict(entry.backend.state)
+            entry.history.append(now, sample)
+            if self.flight_log is not None:
+                self.flight_log.record(entry.vehicle_id, 'telemetry', now, sample)
+
+    # Log a control input with the setpoint it produced, or a discrete command
+    def log_control(self, entry, command=''):
+        if self.flight_log is not None:
+            self.flight_log.record(entry.vehicle_id, 'control', time.time(),
+                                   dict(entry.control_loop.setpoint, command=COMMANDS.index(command)))
+
+    # Record history at a fixed rate, whether or not anyone is watching
+    def start_recording(self, rate_hz=10.0):
+        with self.lock:
+            if self.recorder is not None:
+                return
+            self.recorder = self.socketio.start_background_task(self._record_loop, rate_hz)
+
+    def _record_loop(self, rate_hz):
+        logger.info(f"Telemetry history recording at {rate_hz} Hz")
+        next_tick = time.monotonic()
+        while True:
+            try:
+                self.record()
+            except Exception as e:
+                logger.error(f"Telemetry history recording failed: {e}")
+            next_tick = max(next_tick + 1.0 / rate_hz, time.monotonic())
+            self.socketio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def describe(self):
+        return [{"id": vehicle_id, "armed": entry.backend.state.armed, "mode": entry.backend.state.mode}
+                for vehicle_id, entry in self.vehicles.items()]
+
+    def stats(self):
+        watchers = {}
+        for vehicle_id in list(self.selected.values()):
+            watchers[vehicle_id] = watchers.get(vehicle_id, 0) + 1
+        return {
+            "default": self.default_id,
+            "ai_vehicle": self.ai_vehicle,
+            "vehicles": {
+                vehicle_id: dict(entry.backend.stats(), selected_by=watchers.get(vehicle_id, 0),
+                                 control=entry.control_loop.stats(), history_samples=len(entry.history),
+                                 fence_blocked=entry.fence_blocked, fence_zone=entry.fence_zone)
+                for vehicle_id, entry in self.vehicles.items()
+            },
+        }
+
+    def close(self):
+        for entry in self.vehicles.values():
+            entry.control_loop.close()
+            try:
+                entry.backend.close()
+            except Exception as e:
+                logger.error(f"Closing vehicle {entry.vehicle_id} failed: {e}")
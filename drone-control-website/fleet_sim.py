@@ -0,0 +1,228 @@
+import time
+
+import numpy as np
+
+from control_loop import AXES
+from vehicle import VehicleBackend, VehicleState
+
+# Vectorized multi-vehicle physics simulator.
+#
+# Every vehicle is a row in a set of NumPy arrays (NED position, velocity,
+# attitude, sticks, battery, ...), and step(dt) advances the whole fleet with a
+# handful of array operations, so thousands of aircraft cost about as much as
+# a few Python objects would. The model is a simple multicopter:
+#   - sticks (the control loop's roll/pitch/yaw/throttle in [-10, 10]) set
+#     target tilt, yaw rate and climb rate; attitude and climb rate follow
+#     with first-order lags
+#   - tilt accelerates the vehicle in the direction of its heading, against
+#     linear drag
+#   - GUIDED holds a target altitude (takeoff), LAND descends and disarms on
+#     touchdown
+#   - battery drains with thrust, signal fades with distance from home
+#
+# FleetVehicle exposes one row as a VehicleBackend so app.py can register
+# every aircraft of the fleet like any other vehicle
+# (AEROSENSE_VEHICLE=fleet:<count>).
+
+EARTH_RADIUS = 6378137.0
+GRAVITY = 9.81
+
+MODE_NAMES = ("STABILIZE", "GUIDED", "LAND")
+STABILIZE, GUIDED, LAND = range(len(MODE_NAMES))
+
+MAX_TILT = np.radians(30.0)   # rad at full roll/pitch stick
+MAX_YAW_RATE = np.radians(90.0)  # rad/s at full yaw stick
+MAX_CLIMB = 3.0               # m/s at full throttle stick
+LAND_RATE = 1.0               # m/s
+ATTITUDE_TAU = 0.15           # s
+CLIMB_TAU = 0.4               # s
+ALTITUDE_GAIN = 1.0           # climb m/s per m of altitude error in GUIDED
+DRAG = 0.3                    # 1/s
+IDLE_DRAIN = 0.01             # %/s while armed
+THRUST_DRAIN = 0.08           # %/s per unit of thrust (1.0 = hover)
+SIGNAL_RANGE = 5000.0         # m at which signal reaches 0
+
+STICK_INDEX = {axis: i for i, axis in enumerate(AXES)}
+
+
+class FleetSimulator:
+    def __init__(self, count, home=(51.5074, -0.1278), spread=200.0, seed=None):
+        self.count = count
+        self.home = home
+        self.rng = np.random.default_rng(seed)
+        self.lat_scale = np.degrees(1.0 / EARTH_RADIUS)
+        self.lon_scale = np.degrees(1.0 / (EARTH_RADIUS * np.cos(np.radians(home[0]))))
+
+        self.position = np.zeros((count, 3))     # north, east, down (m) from home
+        self.position[:, :2] = self.rng.uniform(-spread, spread, (count, 2))
+        self.velocity = np.zeros((count, 3))     # m/s NED
+        self.attitude = np.zeros((count, 3))     # roll, pitch, yaw (rad)
+        self.attitude[:, 2] = self.rng.uniform(-np.pi, np.pi, count)
+        self.sticks = np.zeros((count, len(AXES)))
+        self.armed = np.zeros(count, dtype=bool)
+        self.mode = np.full(count, STABILIZE, dtype=np.int8)
+        self.target_alt = np.zeros(count)
+        self.battery = np.full(count, 100.0)
+        self.signal = np.full(count, 100.0)
+        self.thrust = np.zeros(count)
+
+        self.steps = 0
+        self.step_time = 0.0
+        self.sim_time = 0.0
+
+    # Stick setpoint for a subset of vehicles, as produced by ControlLoop
+    def apply_setpoint(self, ids, setpoint):
+        for axis, value in setpoint.items():
+            self.sticks[ids, STICK_INDEX[axis]] = np.clip(value, -10.0, 10.0)
+
+    # Discrete keyboard/button commands from handle_control
+    def apply_command(self, ids, code, altitude=10.0):
+        ids = np.atleast_1d(ids)
+        if code == 'arm':
+            self.armed[ids] = self.battery[ids] > 0
+            self.mode[ids] = STABILIZE
+        elif code == 'disarm':
+            self.armed[ids] = False
+            self.sticks[ids] = 0.0
+        elif code == 'takeoff':
+            ids = ids[self.armed[ids]]
+            self.mode[ids] = GUIDED
+            self.target_alt[ids] = altitude
+        elif code == 'land':
+            ids = ids[self.armed[ids]]
+            self.mode[ids] = LAND
+
+    # Random stick inputs for vehicles nobody is flying, for load tests
+    def randomize_sticks(self, ids=slice(None), scale=10.0):
+        shape = self.sticks[ids].shape
+        self.sticks[ids] = self.rng.uniform(-scale, scale, shape)
+
+    # Arm, take off and wander: background traffic around the piloted vehicles
+    def fly_background(self, ids, altitude=20.0, scale=3.0):
+        ids = np.asarray(ids, dtype=np.intp)
+        self.apply_command(ids, 'arm')
+        self.apply_command(ids, 'takeoff', altitude)
+        self.randomize_sticks(ids, scale)
+
+    def step(self, dt):
+        start = time.perf_counter()
+        roll, pitch, yaw = self.attitude.T
+        sticks = self.sticks * self.armed[:, None] / 10.0
+        alt = -self.position[:, 2]
+
+        # Attitude follows the sticks with a first-order lag
+        k_att = 1.0 - np.exp(-dt / ATTITUDE_TAU)
+        self.attitude[:, 0] += (sticks[:, 0] * MAX_TILT - roll) * k_att
+        self.attitude[:, 1] += (sticks[:, 1] * MAX_TILT - pitch) * k_att
+        self.attitude[:, 2] = np.mod(yaw + sticks[:, 2] * MAX_YAW_RATE * dt + np.pi, 2 * np.pi) - np.pi
+
+        # Climb rate: throttle stick, altitude hold in GUIDED, fixed descent in LAND
+        climb = sticks[:, 3] * MAX_CLIMB
+        guided = self.mode == GUIDED
+        self.target_alt[guided] += climb[guided] * dt
+        climb = np.where(guided, np.clip((self.target_alt - alt) * ALTITUDE_GAIN, -MAX_CLIMB, MAX_CLIMB), climb)
+        climb = np.where(self.mode == LAND, -LAND_RATE, climb)
+        climb *= self.armed
+        k_climb = 1.0 - np.exp(-dt / CLIMB_TAU)
+        self.velocity[:, 2] += (-climb - self.velocity[:, 2]) * k_climb
+
+        # Tilt accelerates along the heading: pitch forward, roll right
+        roll, pitch, yaw = self.attitude.T
+        forward = GRAVITY * np.tan(pitch)
+        right = GRAVITY * np.tan(roll)
+        cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+        self.velocity[:, 0] += (forward * cos_yaw - right * sin_yaw - DRAG * self.velocity[:, 0]) * dt
+        self.velocity[:, 1] += (forward * sin_yaw + right * cos_yaw - DRAG * self.velocity[:, 1]) * dt
+
+        self.position += self.velocity * dt
+
+        # Ground contact: stop, level out, and finish landings
+        grounded = self.position[:, 2] >= 0.0
+        if grounded.any():
+            self.position[grounded, 2] = 0.0
+            self.velocity[grounded] = np.where(self.velocity[grounded, 2:3] > 0, 0.0, self.velocity[grounded])
+            landed = grounded & (self.mode == LAND)
+            self.armed[landed] = False
+            self.mode[landed] = STABILIZE
+            idle = grounded & ~self.armed
+            self.attitude[idle, :2] = 0.0
+            self.velocity[idle] = 0.0
+
+        # Thrust relative to hover drains the battery
+        vertical_accel = (-climb - self.velocity[:, 2]) / CLIMB_TAU
+        self.thrust = self.armed * np.maximum(0.0, (GRAVITY - vertical_accel) / GRAVITY) \
+            / (np.cos(self.attitude[:, 0]) * np.cos(self.attitude[:, 1]))
+        self.battery -= self.armed * (IDLE_DRAIN + THRUST_DRAIN * self.thrust) * dt
+        np.maximum(self.battery, 0.0, out=self.battery)
+        self.armed &= self.battery > 0
+
+        distance = np.hypot(self.position[:, 0], self.position[:, 1])
+        self.signal = np.clip(100.0 * (1.0 - distance / SIGNAL_RANGE), 0.0, 100.0)
+
+        self.sim_time += dt
+        self.steps += 1
+        self.step_time += time.perf_counter() - start
+
+    # Positions of every vehicle as (lat, lon, alt) arrays
+    def positions(self):
+        lat = self.home[0] + self.position[:, 0] * self.lat_scale
+        lon = self.home[1] + self.position[:, 1] * self.lon_scale
+        return lat, lon, -self.position[:, 2]
+
+    def state(self, i):
+        north, east, down = self.position[i]
+        roll, pitch, yaw = self.attitude[i]
+        vn, ve, vd = self.velocity[i]
+        return VehicleState(
+            lat=float(self.home[0] + north * self.lat_scale),
+            lon=float(self.home[1] + east * self.lon_scale),
+            alt=float(-down) + 0.0, armed=bool(self.armed[i]), mode=MODE_NAMES[self.mode[i]],
+            battery=float(self.battery[i]), signal=float(self.signal[i]),
+            roll=float(roll), pitch=float(pitch), yaw=float(yaw),
+            vx=float(vn), vy=float(ve), vz=float(vd), timestamp=time.time())
+
+    def stats(self):
+        steps_per_second = self.steps / self.step_time if self.step_time else 0.0
+        return {
+            "vehicles": self.count,
+            "armed": int(self.armed.sum()),
+            "steps": self.steps,
+            "sim_time_s": round(self.sim_time, 3),
+            "step_us": round(self.step_time / self.steps * 1e6, 2) if self.steps else 0.0,
+            "steps_per_second": round(steps_per_second, 1),
+            "vehicle_steps_per_second": round(steps_per_second * self.count),
+        }
+
+
+# One fleet row as a VehicleBackend; the fleet is stepped by whoever owns it
+class FleetVehicle(VehicleBackend):
+    def __init__(self, fleet, index, owner=True):
+        self.fleet = fleet
+        self.index = index
+        self.owner = owner
+
+    @property
+    def state(self):
+        return self.fleet.state(self.index)
+
+    def update(self, dt):
+        if self.owner:
+            self.fleet.step(dt)
+
+    def arm(self):
+        self.fleet.apply_command(self.index, 'arm')
+
+    def disarm(self):
+        self.fleet.apply_command(self.index, 'disarm')
+
+    def takeoff(self, altitude):
+        self.fleet.apply_command(self.index, 'takeoff', altitude)
+
+    def land(self):
+        self.fleet.apply_command(self.index, 'land')
+
+    def send_setpoint(self, setpoint):
+        self.fleet.apply_setpoint(self.index, setpoint)
+
+    def stats(self):
+        return dict(self.fleet.stats(), index=self.index)
@@ -0,0 +1,438 @@
+import argparse
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Append-only columnar flight log.
+#
+# Layout: <root>/<flight_id>/<vehicle_id>/<table>.dat and <table>.idx
+#
+#   .dat  compressed blocks of up to block_size samples, appended. A block is
+#         u32 sample count, one u32 byte length per column, then the column
+#         chunks (time first), so any column decodes without the others:
+#           time    int64 microseconds: first value, first delta, then
+#                   zigzagged delta-of-deltas bit-packed at the block's width
+#           float   first value's bits, then each value XOR the previous one,
+#                   shifted right by the block's common trailing zeros and
+#                   bit-packed at the block's width
+#           int     first value, then zigzagged deltas bit-packed
+#   .idx  one fixed-width record per block (INDEX_FIELDS plus min/max/sum per
+#         column), appended after the block is written. Readers memory-map it,
+#         binary-search the time range, and answer whole-block aggregates from
+#         it without touching the data file.
+#
+# FlightLogWriter buffers samples in memory and a background thread encodes
+# and appends them every flush_interval (or as soon as a block fills), so
+# record() is only a list append on the caller's thread.
+#
+# Usage: python flight_log.py list
+#        python flight_log.py query <flight_id> <vehicle_id> --column alt --window 10
+
+TABLES = {
+    "telemetry": (("lat", "float"), ("lon", "float"), ("alt", "float"),
+                  ("battery", "float"), ("signal", "float"), ("armed", "int")),
+    "control": (("roll", "float"), ("pitch", "float"), ("yaw", "float"),
+                ("throttle", "float"), ("command", "int")),
+}
+
+# Discrete commands in the control table, stored as their index
+COMMANDS = ("", "arm", "disarm", "takeoff", "land")
+
+INDEX_FIELDS = [("t_first", "<i8"), ("t_last", "<i8"), ("offset", "<u8"), ("length", "<u4"), ("count", "<u4")]
+
+BLOCK_HEADER = struct.Struct("<I")
+TIME_HEADER = struct.Struct("<qqB")
+INT_HEADER = struct.Struct("<qB")
+FLOAT_HEADER = struct.Struct("<QBB")
+
+ONE = np.uint64(1)
+
+
+def index_dtype(table):
+    fields = list(INDEX_FIELDS)
+    for name, _ in TABLES[table]:
+        fields += [(f"{name}_min", "<f8"), (f"{name}_max", "<f8"), (f"{name}_sum", "<f8")]
+    return np.dtype(fields)
+
+
+def zigzag(values):
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    return (values >> ONE).view(np.int64) ^ -(values & ONE).view(np.int64)
+
+
+def bit_width(values):
+    return int(values.max()).bit_length() if len(values) else 0
+
+
+def pack_bits(values, width):
+    if width == 0 or len(values) == 0:
+        return b""
+    bits = (values[:, None] >> np.arange(width, dtype=np.uint64)) & ONE
+    return np.packbits(bits.astype(np.uint8), bitorder="little").tobytes()
+
+
+def unpack_bits(data, count, width):
+    if width == 0 or count == 0:
+        return np.zeros(count, dtype=np.uint64)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count * width, bitorder="little")
+    bits = bits.reshape(count, width).astype(np.uint64)
+    return (bits << np.arange(width, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+
+
+def encode_times(t):
+    delta = int(t[1] - t[0]) if len(t) > 1 else 0
+    dod = zigzag(np.diff(t, 2))
+    width = bit_width(dod)
+    return TIME_HEADER.pack(int(t[0]), delta, width) + pack_bits(dod, width)
+
+
+def decode_times(data, count):
+    first, delta, width = TIME_HEADER.unpack_from(data)
+    dod = unzigzag(unpack_bits(data[TIME_HEADER.size:], max(count - 2, 0), width))
+    deltas = np.concatenate(([delta], delta + np.cumsum(dod)))[:count - 1]
+    return first + np.concatenate(([0], np.cumsum(deltas))).astype(np.int64)
+
+
+def encode_ints(values):
+    deltas = zigzag(np.diff(values))
+    width = bit_width(deltas)
+    return INT_HEADER.pack(int(values[0]), width) + pack_bits(deltas, width)
+
+
+def decode_ints(data, count):
+    first, width = INT_HEADER.unpack_from(data)
+    deltas = unzigzag(unpack_bits(data[INT_HEADER.size:], count - 1, width))
+    return first + np.concatenate(([0], np.cumsum(deltas))).astype(np.int64)
+
+
+def encode_floats(values):
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    xor = bits[1:] ^ bits[:-1]
+    nonzero = xor[xor != 0]
+    shift = 0
+    if len(nonzero):
+        # Trailing zeros shared by every XOR in the block
+        lowest = nonzero & (~nonzero + ONE)
+        shift = int(np.log2(float(lowest.min())))
+    xor >>= np.uint64(shift)
+    width = bit_width(xor)
+    return FLOAT_HEADER.pack(int(bits[0]), shift, width) + pack_bits(xor, width)
+
+
+def decode_floats(data, count):
+    first, shift, width = FLOAT_HEADER.unpack_from(data)
+    xor = unpack_bits(data[FLOAT_HEADER.size:], count - 1, width) << np.uint64(shift)
+    bits = np.bitwise_xor.accumulate(np.concatenate((np.array([first], dtype=np.uint64), xor)))
+    return bits.view(np.float64)
+
+
+ENCODERS = {"float": encode_floats, "int": encode_ints}
+DECODERS = {"float": decode_floats, "int": decode_ints}
+
+
+def safe_name(name):
+    return str(name).replace(os.sep, "_").replace("..", "_")
+
+
+class FlightLogWriter:
+    def __init__(self, root, flight_id=None, block_size=1024, flush_interval=1.0):
+        self.flight_id = flight_id or time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(root, self.flight_id)
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"flight_id": self.flight_id, "started": time.time(),
+                       "tables": {name: dict(columns) for name, columns in TABLES.items()},
+                       "commands": COMMANDS}, f, indent=2)
+
+        self.pending = {}  # (vehicle_id, table) -> [(t_us, values)]
+        self.files = {}    # (vehicle_id, table) -> [data file, index file]
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = True
+        self.samples = 0
+        self.blocks = 0
+        self.bytes_written = 0
+        self.flush_ms = 0.0
+        self.thread = threading.Thread(target=self._run, name="flight-log-writer", daemon=True)
+        self.thread.start()
+        logger.info(f"Flight log writing to {self.path}")
+
+    # Queue one sample; values holds every column of the table
+    def record(self, vehicle_id, table, t, values):
+        row = (int(t * 1e6), tuple(float(values[name]) for name, _ in TABLES[table]))
+        key = (safe_name(vehicle_id), table)
+        with self.lock:
+            rows = self.pending.setdefault(key, [])
+            rows.append(row)
+            self.samples += 1
+            full = len(rows) >= self.block_size
+        if full:
+            self.wake.set()
+
+    def _run(self):
+        while self.running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Flight log flush failed: {e}")
+
+    def flush(self):
+        with self.flush_lock:
+            start = time.perf_counter()
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            for key, rows in pending.items():
+                for i in range(0, len(rows), self.block_size):
+                    self._write_block(key, rows[i:i + self.block_size])
+            for data, index in self.files.values():
+                data.flush()
+                index.flush()
+            if pending:
+                self.flush_ms = (time.perf_counter() - start) * 1000
+
+    def _open(self, key):
+        files = self.files.get(key)
+        if files is None:
+            vehicle_id, table = key
+            directory = os.path.join(self.path, vehicle_id)
+            os.makedirs(directory, exist_ok=True)
+            files = self.files[key] = [open(os.path.join(directory, f"{table}.dat"), "ab"),
+                                       open(os.path.join(directory, f"{table}.idx"), "ab")]
+        return files
+
+    def _write_block(self, key, rows):
+        table = key[1]
+        columns = TABLES[table]
+        t = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        values = np.array([row[1] for row in rows], dtype=np.float64).reshape(len(rows), len(columns))
+
+        chunks = [encode_times(t)]
+        for i, (_, kind) in enumerate(columns):
+            column = values[:, i] if kind == "float" else values[:, i].astype(np.int64)
+            chunks.append(ENCODERS[kind](column))
+        block = BLOCK_HEADER.pack(len(rows)) + struct.pack(f"<{len(chunks)}I", *map(len, chunks)) + b"".join(chunks)
+
+        data, index = self._open(key)
+        record = np.zeros(1, dtype=index_dtype(table))
+        record["t_first"], record["t_last"] = t.min(), t.max()
+        record["offset"], record["length"], record["count"] = data.tell(), len(block), len(rows)
+        for i, (name, _) in enumerate(columns):
+            record[f"{name}_min"] = values[:, i].min()
+            record[f"{name}_max"] = values[:, i].max()
+            record[f"{name}_sum"] = values[:, i].sum()
+        # Data before index: a reader never sees an index entry for a block that isn't there
+        data.write(block)
+        data.flush()
+        index.write(record.tobytes())
+        self.blocks += 1
+        self.bytes_written += len(block) + record.nbytes
+
+    def stats(self):
+        with self.lock:
+            pending = sum(len(rows) for rows in self.pending.values())
+        raw = self.samples * 8 * 7  # t + six float64 columns, uncompressed
+        return {
+            "path": self.path,
+            "samples": self.samples,
+            "pending": pending,
+            "blocks": self.blocks,
+            "bytes_written": self.bytes_written,
+            "compression_ratio": round(raw / self.bytes_written, 2) if self.bytes_written else None,
+            "last_flush_ms": round(self.flush_ms, 2),
+        }
+
+    def close(self):
+        self.running = False
+        self.wake.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        for data, index in self.files.values():
+            data.close()
+            index.close()
+        self.files = {}
+
+
+# One table of one vehicle in a flight, memory-mapped read-only. The maps are
+# a snapshot: reopen to see blocks appended since.
+class FlightTable:
+    def __init__(self, path, table):
+        self.table = table
+        self.columns = dict(TABLES[table])
+        dtype = index_dtype(table)
+        index_path, data_path = path + ".idx", path + ".dat"
+        blocks = os.path.getsize(index_path) // dtype.itemsize if os.path.exists(index_path) else 0
+        self.index = np.memmap(index_path, dtype=dtype, mode="r", shape=(blocks,)) if blocks \
+            else np.zeros(0, dtype=dtype)
+        self.data = np.memmap(data_path, dtype=np.uint8, mode="r") if blocks else np.zeros(0, dtype=np.uint8)
+        self.decoded_blocks = 0
+
+    def __len__(self):
+        return int(self.index["count"].sum())
+
+    # Blocks that may overlap [t_from, t_to] (microseconds)
+    def _block_range(self, t_from, t_to):
+        lo = np.searchsorted(self.index["t_last"], t_from, "left") if t_from is not None else 0
+        hi = np.searchsorted(self.index["t_first"], t_to, "right") if t_to is not None else len(self.index)
+        return range(lo, hi)
+
+    def _decode(self, b, columns):
+        record = self.index[b]
+        offset, count = int(record["offset"]), int(record["count"])
+        block = self.data[offset:offset + int(record["length"])]
+        names = ["t"] + list(self.columns)
+        lengths = struct.unpack_from(f"<{len(names)}I", block, BLOCK_HEADER.size)
+        position = BLOCK_HEADER.size + 4 * len(names)
+        out = {}
+        for name, length in zip(names, lengths):
+            if name == "t":
+                out["t"] = decode_times(block[position:position + length], count)
+            elif name in columns:
+                out[name] = DECODERS[self.columns[name]](block[position:position + length], count)
+            position += length
+        self.decoded_blocks += 1
+        return out
+
+    # Samples in [t_from, t_to] (unix seconds); t is returned in seconds
+    def read(self, t_from=None, t_to=None, columns=None):
+        columns = list(columns or self.columns)
+        lo = int(t_from * 1e6) if t_from is not None else None
+        hi = int(t_to * 1e6) if t_to is not None else None
+        parts = [self._decode(b, columns) for b in self._block_range(lo, hi)]
+        if not parts:
+            return {name: np.zeros(0) for name in ["t"] + columns}
+        t = np.concatenate([part["t"] for part in parts])
+        mask = np.ones(len(t), dtype=bool)
+        if lo is not None:
+            mask &= t >= lo
+        if hi is not None:
+            mask &= t <= hi
+        result = {"t": t[mask] / 1e6}
+        for name in columns:
+            result[name] = np.concatenate([part[name] for part in parts])[mask]
+        return result
+
+    # min/max/mean/count of a column per window of `window` seconds. Blocks
+    # inside the range and inside one window are answered from the index alone.
+    def aggregate(self, column, window, t_from=None, t_to=None):
+        if column not in self.columns:
+            raise ValueError(f"Unknown column: {column}")
+        window_us = int(window * 1e6)
+        lo = int(t_from * 1e6) if t_from is not None else None
+        hi = int(t_to * 1e6) if t_to is not None else None
+        windows = {}  # window number -> [min, max, sum, count]
+
+        def merge(w, minimum, maximum, total, count):
+            acc = windows.get(w)
+            if acc is None:
+                windows[w] = [minimum, maximum, total, count]
+            else:
+                acc[0], acc[1] = min(acc[0], minimum), max(acc[1], maximum)
+                acc[2] += total
+                acc[3] += count
+
+        for b in self._block_range(lo, hi):
+            record = self.index[b]
+            first, last = int(record["t_first"]), int(record["t_last"])
+            inside = (lo is None or first >= lo) and (hi is None or last <= hi)
+            if inside and first // window_us == last // window_us:
+                merge(first // window_us, float(record[f"{column}_min"]), float(record[f"{column}_max"]),
+                      float(record[f"{column}_sum"]), int(record["count"]))
+                continue
+            part = self._decode(b, [column])
+            t, values = part["t"], part[column].astype(np.float64)
+            mask = np.ones(len(t), dtype=bool)
+            if lo is not None:
+                mask &= t >= lo
+            if hi is not None:
+                mask &= t <= hi
+            t, values = t[mask], values[mask]
+            if not len(t):
+                continue
+            numbers = t // window_us
+            order = np.argsort(numbers, kind="stable")
+            numbers, values = numbers[order], values[order]
+            starts = np.flatnonzero(np.r_[True, numbers[1:] != numbers[:-1]])
+            for w, minimum, maximum, total, count in zip(
+                    numbers[starts], np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts),
+                    np.add.reduceat(values, starts), np.diff(np.r_[starts, len(values)])):
+                merge(int(w), float(minimum), float(maximum), float(total), int(count))
+
+        keys = sorted(windows)
+        acc = np.array([windows[k] for k in keys], dtype=np.float64).reshape(len(keys), 4)
+        return {
+            "t": np.array(keys, dtype=np.float64) * window,
+            "min": acc[:, 0],
+            "max": acc[:, 1],
+            "mean": acc[:, 2] / np.maximum(acc[:, 3], 1),
+            "count": acc[:, 3].astype(np.int64),
+        }
+
+
+def list_flights(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "meta.json")))
+
+
+def list_vehicles(root, flight_id):
+    path = os.path.join(root, flight_id)
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def open_table(root, flight_id, vehicle_id, table="telemetry"):
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    return FlightTable(os.path.join(root, flight_id, safe_name(vehicle_id), table), table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flight log browser")
+    parser.add_argument("--root", default=os.environ.get("AEROSENSE_FLIGHT_LOG") or "flightlogs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    query = commands.add_parser("query")
+    query.add_argument("flight_id")
+    query.add_argument("vehicle_id")
+    query.add_argument("--table", default="telemetry", choices=sorted(TABLES))
+    query.add_argument("--column", default="alt")
+    query.add_argument("--window", type=float, default=10.0, help="seconds")
+    query.add_argument("--from", dest="t_from", type=float)
+    query.add_argument("--to", dest="t_to", type=float)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for flight_id in list_flights(args.root):
+            vehicles = list_vehicles(args.root, flight_id)
+            samples = sum(len(open_table(args.root, flight_id, v, t)) for v in vehicles for t in TABLES)
+            print(f"{flight_id}  vehicles: {', '.join(vehicles)}  samples: {samples}")
+        return
+
+    table = open_table(args.root, args.flight_id, args.vehicle_id, args.table)
+    start = time.perf_counter()
+    result = table.aggregate(args.column, args.window, args.t_from, args.t_to)
+    elapsed = (time.perf_counter() - start) * 1000
+    for t, minimum, maximum, mean, count in zip(result["t"], result["min"], result["max"],
+                                                result["mean"], result["count"]):
+        stamp = time.strftime("%H:%M:%S", time.localtime(t))
+        print(f"{stamp}  min {minimum:12.6f}  max {maximum:12.6f}  mean {mean:12.6f}  n {count}")
+    print(f"{len(result['t'])} windows in {elapsed:.1f} ms, {table.decoded_blocks} of {len(table.index)} blocks decoded")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import queue
+
+import cv2
+import numpy as np
+
+# Reusable frame buffers and pre-encoded MJPEG parts for the capture loop in
+# streaming.py (and bench_capture_alloc.py).
+#
+# At 30 fps every per-frame array is a fresh allocation: the 900 KB capture,
+# the 700 KB BGR conversion, the JPEG and its copies, tens of MB/s of churn
+# through the allocator and fresh pages on a Pi. FramePool hands out
+# a fixed set of arrays that cvtColor writes into (dst=) and the encoder
+# gives back when it is done, so the steady-state loop allocates only the
+# JPEG itself.
+
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+PART_TRAILER = b'\r\n'
+
+
+class FramePool:
+    # count: buffers that can be in use at once (the capture thread's plus one per encoder)
+    def __init__(self, count):
+        self.count = count
+        self.free = queue.SimpleQueue()
+        for _ in range(count):
+            self.free.put(None)  # allocated on first use, at the camera's size
+        self.allocated = 0
+
+    # A buffer of this shape; never blocks, allocates if every buffer is out
+    def acquire(self, shape, dtype=np.uint8):
+        try:
+            buffer = self.free.get_nowait()
+        except queue.Empty:
+            buffer = None
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            # First use, or the governor changed the camera size
+            buffer = np.empty(shape, dtype)
+            self.allocated += 1
+        return buffer
+
+    def release(self, buffer):
+        self.free.put(buffer)
+
+
+# One multipart/x-mixed-replace part around a JPEG (bytes or the imencode
+# array), built once per frame and sent as is to every viewer
+def mjpeg_part(jpeg):
+    return b''.join((PART_HEADER, jpeg, PART_TRAILER))
+
+
+# The JPEG inside a part, without copying it
+def part_jpeg(part):
+    return memoryview(part)[len(PART_HEADER):-len(PART_TRAILER)]
+
+
+# A text-on-flat-colour frame as an MJPEG part, for the error and no-signal
+# placeholders; encode these once, not per frame and viewer
+def placeholder_part(text, origin, background, color, scale=1, size=(640, 360), quality=70):
+    image = np.full((size[1], size[0], 3), background, dtype=np.uint8)
+    cv2.putText(image, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+    ok, jpeg = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise RuntimeError(f"Cannot encode placeholder {text!r}")
+    return mjpeg_part(jpeg)
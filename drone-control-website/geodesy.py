@@ -0,0 +1,93 @@
+import numpy as np
+
+# WGS84 geodesy for the local North-East-Down frame around a home position.
+#
+# LocalNED precomputes everything that depends only on home (its ECEF
+# position, the ECEF->NED rotation and the local meters-per-degree scales),
+# so converting a point, or a whole array of points, is a handful of NumPy
+# operations:
+#   to_ned / to_geodetic    exact, through ECEF (sub-millimeter at any range)
+#   offset                  flat-earth shortcut with WGS84 radii of curvature
+#                           at home, for targets a few hundred meters away
+# Angles are degrees, altitudes meters above the WGS84 ellipsoid (or any
+# consistent datum, e.g. relative to home, for short distances).
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_EP2 = WGS84_E2 / (1 - WGS84_E2)
+
+
+def geodetic_to_ecef(lat, lon, alt):
+    lat, lon = np.radians(lat), np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+    return ((n + alt) * cos_lat * np.cos(lon),
+            (n + alt) * cos_lat * np.sin(lon),
+            (n * (1 - WGS84_E2) + alt) * sin_lat)
+
+
+# Bowring's method; one iteration is exact to well below a millimeter near the surface
+def ecef_to_geodetic(x, y, z):
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    lat = np.arctan2(z + WGS84_EP2 * WGS84_B * np.sin(theta) ** 3,
+                     p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+    # Altitude from whichever of cos/sin is better conditioned
+    cos_lat = np.cos(lat)
+    alt = np.where(np.abs(cos_lat) > 1e-3,
+                   p / np.where(cos_lat == 0, 1, cos_lat) - n,
+                   z / np.where(sin_lat == 0, 1, sin_lat) - n * (1 - WGS84_E2))
+    return np.degrees(lat), np.degrees(np.arctan2(y, x)), alt
+
+
+# Body-frame (forward, right) to NED (north, east) for a heading in degrees
+def body_to_ned(forward, right, heading):
+    yaw = np.radians(heading)
+    cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+    return forward * cos_yaw - right * sin_yaw, forward * sin_yaw + right * cos_yaw
+
+
+class LocalNED:
+    def __init__(self, lat, lon, alt=0.0):
+        self.home = (float(lat), float(lon), float(alt))
+        self.origin = np.array(geodetic_to_ecef(lat, lon, alt))
+        phi, lam = np.radians(lat), np.radians(lon)
+        sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        # Rows are the north, east and down unit vectors in ECEF
+        self.rotation = np.array([
+            [-sin_phi * cos_lam, -sin_phi * sin_lam, cos_phi],
+            [-sin_lam, cos_lam, 0.0],
+            [-cos_phi * cos_lam, -cos_phi * sin_lam, -sin_phi],
+        ])
+        # Meridian and prime-vertical radii of curvature at home
+        w = 1 - WGS84_E2 * sin_phi * sin_phi
+        meridian = WGS84_A * (1 - WGS84_E2) / w ** 1.5
+        prime = WGS84_A / np.sqrt(w)
+        self.meters_per_deg_lat = float(np.radians(1.0) * (meridian + alt))
+        self.meters_per_deg_lon = float(np.radians(1.0) * (prime + alt) * cos_phi)
+
+    # Geodetic point(s) to (north, east, down) meters from home
+    def to_ned(self, lat, lon, alt):
+        ecef = np.stack(np.broadcast_arrays(*geodetic_to_ecef(lat, lon, alt)), axis=-1) - self.origin
+        ned = ecef @ self.rotation.T
+        return ned[..., 0], ned[..., 1], ned[..., 2]
+
+    # (north, east, down) meters from home to geodetic (lat, lon, alt)
+    def to_geodetic(self, north, east, down):
+        ned = np.stack(np.broadcast_arrays(north, east, down), axis=-1)
+        ecef = ned @ self.rotation + self.origin
+        return ecef_to_geodetic(ecef[..., 0], ecef[..., 1], ecef[..., 2])
+
+    # Point `north`/`east` meters from (lat, lon), using the scales at home
+    def offset(self, lat, lon, north, east):
+        return lat + north / self.meters_per_deg_lat, lon + east / self.meters_per_deg_lon
+
+    # Inverse of offset from home: (north, east) in meters, for floats or arrays
+    def project(self, lat, lon):
+        return (lat - self.home[0]) * self.meters_per_deg_lat, (lon - self.home[1]) * self.meters_per_deg_lon
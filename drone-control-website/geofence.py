@@ -0,0 +1,402 @@
+import itertools
+import json
+import logging
+import math
+
+import numpy as np
+
+from geodesy import LocalNED
+
+logger = logging.getLogger(__name__)
+
+# Keep-out zones with a uniform-grid spatial index.
+#
+# Zones are polygons (lat/lon rings) and cylinders (center + radius), each
+# with a floor and ceiling in meters above home (the frame of the vehicles'
+# relative altitude). build() projects every zone into the local north/east
+# plane around the fence origin (LocalNED.project, so points and vertices
+# share one projection) and classifies each grid cell of the zone's bounding
+# box once:
+#   boundary  a zone edge (or the circle) crosses the cell: the zone is
+#             registered in `grid` and points there get the exact test
+#   covered   the cell lies wholly inside the zone: registered in `covered`,
+#             points there only need the altitude test
+#   outside   not registered at all
+# A check then costs one dict lookup per table for the cell, an altitude
+# test for the zones covering it, and an altitude, bounding-box and exact
+# containment test for the few zones whose boundary crosses it, independent
+# of how many zones are loaded.
+#
+#   check(lat, lon, alt)            scalar, a few microseconds, pure Python
+#   check_many(lat, lon, alt)       NumPy batch, for planned paths and fleets
+#   check_path(lat, lon, alt)       waypoints, densified to `spacing` meters
+#   check_motion(lat, lon, alt, vn, ve, vd, lookahead)
+#                                   the straight line the vehicle covers at its
+#                                   current velocity, for outgoing setpoints
+#
+# Zones load from GeoJSON (load_geofence): Polygon / MultiPolygon features,
+# and Point features with a "radius" property for cylinders. Optional
+# properties: "id", "floor", "ceiling". Polygon holes are ignored (the outer
+# ring is the keep-out area). bench_geofence.py measures it with thousands of
+# zones.
+
+POLYGON = "polygon"
+CYLINDER = "cylinder"
+
+# Largest intermediate array, in elements, when build() classifies cells
+CLASSIFY_BLOCK = 1 << 18
+
+
+class Zone:
+    def __init__(self, zone_id, kind, floor, ceiling, geometry):
+        self.zone_id = zone_id
+        self.kind = kind
+        self.floor = floor
+        self.ceiling = ceiling
+        self.geometry = geometry  # [(lat, lon), ...] or (lat, lon, radius)
+        self.bbox = None          # (min_n, min_e, max_n, max_e) after build()
+        self.edges = None         # polygon edges as (n1, e1, n2, e2), after build()
+        self.center = None        # cylinder (n, e, radius squared), after build()
+
+    # Exact containment of a projected point; altitude and bbox are checked by the caller
+    def contains(self, n, e):
+        if self.kind == CYLINDER:
+            cn, ce, r2 = self.center
+            return (n - cn) * (n - cn) + (e - ce) * (e - ce) <= r2
+        inside = False
+        for n1, e1, n2, e2 in self.edges:
+            if (n1 > n) != (n2 > n) and e < (e2 - e1) * (n - n1) / (n2 - n1) + e1:
+                inside = not inside
+        return inside
+
+
+class Geofence:
+    def __init__(self, origin_lat, origin_lon, cell_size=250.0):
+        self.frame = LocalNED(origin_lat, origin_lon)
+        self.cell_size = cell_size
+        self.zones = []
+        self.grid = {}     # cell -> zone indices whose boundary crosses it
+        self.covered = {}  # cell -> zone indices that contain the whole cell
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.zones)
+
+    def add_polygon(self, points, floor=-math.inf, ceiling=math.inf, zone_id=None):
+        points = [(float(lat), float(lon)) for lat, lon in points]
+        if points[0] == points[-1]:
+            points = points[:-1]
+        if len(points) < 3:
+            raise ValueError("A polygon zone needs at least 3 points")
+        self._add(Zone(zone_id if zone_id is not None else f"zone-{len(self.zones)}", POLYGON,
+                       floor, ceiling, points))
+
+    def add_cylinder(self, lat, lon, radius, floor=-math.inf, ceiling=math.inf, zone_id=None):
+        if radius <= 0:
+            raise ValueError("A cylinder zone needs a positive radius")
+        self._add(Zone(zone_id if zone_id is not None else f"zone-{len(self.zones)}", CYLINDER,
+                       floor, ceiling, (float(lat), float(lon), float(radius))))
+
+    def _add(self, zone):
+        self.zones.append(zone)
+        self.dirty = True
+
+    def _cell(self, n, e):
+        return math.floor(n / self.cell_size), math.floor(e / self.cell_size)
+
+    # Project zones into the local frame and rebuild the grid
+    def build(self):
+        grid = {}
+        covered = {}
+        for index, zone in enumerate(self.zones):
+            if zone.kind == CYLINDER:
+                lat, lon, radius = zone.geometry
+                n, e = self.frame.project(lat, lon)
+                zone.center = (n, e, radius * radius)
+                zone.bbox = (n - radius, e - radius, n + radius, e + radius)
+            else:
+                lats, lons = np.array(zone.geometry).T
+                ns, es = self.frame.project(lats, lons)
+                ring = list(zip(ns.tolist(), es.tolist()))
+                zone.edges = [(n1, e1, n2, e2) for (n1, e1), (n2, e2) in zip(ring, ring[1:] + ring[:1])]
+                zone.bbox = (float(ns.min()), float(es.min()), float(ns.max()), float(es.max()))
+            boundary, inside = self._classify(zone)
+            for cell in boundary:
+                grid.setdefault(cell, []).append(index)
+            for cell in inside:
+                covered.setdefault(cell, []).append(index)
+        self.grid = {cell: tuple(indices) for cell, indices in grid.items()}
+        self.covered = {cell: tuple(indices) for cell, indices in covered.items()}
+        self._build_arrays()
+        self.dirty = False
+        logger.info(f"Geofence built: {len(self.zones)} zones, {len(self.grid)} boundary and "
+                    f"{len(self.covered)} covered cells of {self.cell_size:.0f} m")
+
+    # Cells of the zone's bounding box that its boundary crosses, and cells it
+    # contains entirely, as two lists of (i, j)
+    def _classify(self, zone):
+        (i0, j0), (i1, j1) = self._cell(*zone.bbox[:2]), self._cell(*zone.bbox[2:])
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= 9:
+            # Within 3x3 cells at most the middle one can be covered; not worth classifying
+            return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)], []
+        # Cell corner coordinates: row i spans ns[i - i0] to ns[i - i0 + 1]
+        ns = np.arange(i0, i1 + 2) * self.cell_size
+        es = np.arange(j0, j1 + 2) * self.cell_size
+        if zone.kind == CYLINDER:
+            cn, ce, r2 = zone.center
+            # Squared distance from the center to the nearest and farthest point of each cell
+            near_n, near_e = np.clip(cn, ns[:-1], ns[1:]) - cn, np.clip(ce, es[:-1], es[1:]) - ce
+            far_n = np.maximum(np.abs(ns[:-1] - cn), np.abs(ns[1:] - cn))
+            far_e = np.maximum(np.abs(es[:-1] - ce), np.abs(es[1:] - ce))
+            inside = far_n[:, None] ** 2 + far_e[None, :] ** 2 <= r2
+            boundary = (near_n[:, None] ** 2 + near_e[None, :] ** 2 <= r2) & ~inside
+        else:
+            boundary, inside = self._classify_polygon(np.array(zone.edges), ns, es)
+        return [list(zip((a + i0).tolist(), (b + j0).tolist())) for a, b in (np.nonzero(boundary), np.nonzero(inside))]
+
+    # Boundary and covered cells of a polygon over the corner grid ns x es
+    @staticmethod
+    def _classify_polygon(edges, ns, es):
+        rows, cols = len(ns) - 1, len(es) - 1
+        # A cell in an edge's bounding box is crossed unless all four corners
+        # lie strictly on one side of the edge's line; edges in chunks that
+        # keep the (edges, corners) arrays under CLASSIFY_BLOCK elements
+        boundary = np.zeros((rows, cols), dtype=bool)
+        step = max(1, CLASSIFY_BLOCK // (len(ns) * len(es)))
+        for start in range(0, len(edges), step):
+            n1, e1, n2, e2 = (column[:, None, None] for column in edges[start:start + step].T)
+            side = (n2 - n1) * (es[None, None, :] - e1) - (e2 - e1) * (ns[None, :, None] - n1)
+            corners = np.stack([side[:, :-1, :-1], side[:, 1:, :-1], side[:, :-1, 1:], side[:, 1:, 1:]])
+            crossed = (corners.min(axis=0) <= 0) & (corners.max(axis=0) >= 0)
+            crossed &= (ns[None, 1:, None] >= np.minimum(n1, n2)) & (ns[None, :-1, None] <= np.maximum(n1, n2))
+            crossed &= (es[None, None, 1:] >= np.minimum(e1, e2)) & (es[None, None, :-1] <= np.maximum(e1, e2))
+            boundary |= crossed.any(axis=0)
+
+        # No edge crosses the other cells, so each is wholly inside or outside
+        # and the crossing number of its center (as in Zone.contains) decides
+        n1, e1, n2, e2 = edges.T
+        centers_n, centers_e = (ns[:-1] + ns[1:]) / 2, (es[:-1] + es[1:]) / 2
+        inside = np.zeros((rows, cols), dtype=bool)
+        step = max(1, CLASSIFY_BLOCK // (len(edges) * cols))
+        for start in range(0, rows, step):
+            nc = centers_n[start:start + step, None]
+            crossing = (n1 > nc) != (n2 > nc)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                xs = (e2 - e1) * (nc - n1) / (n2 - n1) + e1
+            hits = crossing[:, None, :] & (centers_e[None, :, None] < xs[:, None, :])
+            inside[start:start + step] = hits.sum(axis=2) % 2 == 1
+        return boundary, inside & ~boundary
+
+    # Flat NumPy copies of the zones and the grid for check_many
+    def _build_arrays(self):
+        count = len(self.zones)
+        self.floors = np.array([zone.floor for zone in self.zones], dtype=np.float64)
+        self.ceilings = np.array([zone.ceiling for zone in self.zones], dtype=np.float64)
+        self.bboxes = np.array([zone.bbox for zone in self.zones], dtype=np.float64).reshape(count, 4)
+        # Cylinder rows hold (n, e, r^2); polygons keep r^2 = 0
+        self.centers = np.zeros((count, 3))
+        self.edge_counts = np.zeros(count, dtype=np.int64)
+        edges = []
+        for index, zone in enumerate(self.zones):
+            if zone.kind == CYLINDER:
+                self.centers[index] = zone.center
+            else:
+                self.edge_counts[index] = len(zone.edges)
+                edges.extend(zone.edges)
+        self.edge_starts = np.cumsum(self.edge_counts) - self.edge_counts
+        self.edge_array = np.array(edges, dtype=np.float64).reshape(-1, 4)
+
+        self.cell_keys, self.cell_table = self._cell_table(self.grid)
+        self.cover_keys, self.cover_table = self._cell_table(self.covered)
+
+    # Cells sorted by integer key, each row padded with -1 to the fullest cell
+    def _cell_table(self, grid):
+        if not grid:
+            return np.array([np.iinfo(np.int64).min], dtype=np.int64), np.full((1, 1), -1, dtype=np.int64)
+        ij = np.array(list(grid), dtype=np.int64)
+        keys = self._cell_key(ij[:, 0], ij[:, 1])
+        order = np.argsort(keys)
+        counts = np.fromiter(map(len, grid.values()), dtype=np.int64, count=len(grid))
+        flat = np.fromiter(itertools.chain.from_iterable(grid.values()), dtype=np.int64, count=int(counts.sum()))
+        # Row of each cell once sorted, and each zone's slot within its cell
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        slots = np.arange(len(flat)) - np.repeat(np.cumsum(counts) - counts, counts)
+        table = np.full((len(keys), int(counts.max())), -1, dtype=np.int64)
+        table[np.repeat(rank, counts), slots] = flat
+        return keys[order], table
+
+    # (point, zone index) pairs for each point's cell in a table from _cell_table
+    @staticmethod
+    def _candidates(keys, cell_keys, cell_table):
+        rows = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+        rows[cell_keys[rows] != keys] = -1
+        candidates = np.where(rows[:, None] >= 0, cell_table[rows], -1)
+        point, slot = np.nonzero(candidates >= 0)
+        return point, candidates[point, slot]
+
+    # One int64 per cell; cells are within +/-2^31 of the origin
+    @staticmethod
+    def _cell_key(i, j):
+        if isinstance(i, np.ndarray):
+            return (i.astype(np.int64) << 32) + (j.astype(np.int64) + (1 << 31))
+        return (int(i) << 32) + (int(j) + (1 << 31))
+
+    # Zone id containing the point, or None
+    def check(self, lat, lon, alt):
+        n, e = self.frame.project(lat, lon)
+        return self.check_ned(n, e, alt)
+
+    # Same, for a point already in the fence's local frame (alt is up)
+    def check_ned(self, n, e, alt):
+        if self.dirty:
+            self.build()
+        cell = self._cell(n, e)
+        zones = self.zones
+        for index in self.covered.get(cell, ()):
+            zone = zones[index]
+            if zone.floor <= alt <= zone.ceiling:
+                return zone.zone_id
+        candidates = self.grid.get(cell)
+        if candidates is None:
+            return None
+        for index in candidates:
+            zone = zones[index]
+            min_n, min_e, max_n, max_e = zone.bbox
+            if (zone.floor <= alt <= zone.ceiling and min_n <= n <= max_n and min_e <= e <= max_e
+                    and zone.contains(n, e)):
+                return zone.zone_id
+        return None
+
+    # Index into self.zones of a zone containing each point, -1 where clear.
+    # Zones covering the point's cell only need the altitude test. Every
+    # (point, boundary zone) pair is tested at once: altitude and bbox, then
+    # circle or crossing-number tests with all polygon edges of all pairs
+    # flattened into one array.
+    def check_many(self, lat, lon, alt):
+        if self.dirty:
+            self.build()
+        n, e = self.frame.project(np.asarray(lat, np.float64), np.asarray(lon, np.float64))
+        n, e = np.atleast_1d(n), np.atleast_1d(e)
+        alt = np.broadcast_to(np.asarray(alt, np.float64), n.shape)
+        result = np.full(n.shape, -1, dtype=np.int64)
+        if not self.zones:
+            return result
+
+        keys = self._cell_key(np.floor(n / self.cell_size), np.floor(e / self.cell_size))
+        point, zone = self._candidates(keys, self.cover_keys, self.cover_table)
+        covering = (alt[point] >= self.floors[zone]) & (alt[point] <= self.ceilings[zone])
+        result[point[covering]] = zone[covering]
+
+        point, zone = self._candidates(keys, self.cell_keys, self.cell_table)
+        pn, pe, pa = n[point], e[point], alt[point]
+        bbox = self.bboxes[zone]
+        near = ((pa >= self.floors[zone]) & (pa <= self.ceilings[zone]) & (pn >= bbox[:, 0])
+                & (pe >= bbox[:, 1]) & (pn <= bbox[:, 2]) & (pe <= bbox[:, 3]))
+        point, zone, pn, pe = point[near], zone[near], pn[near], pe[near]
+
+        inside = np.zeros(len(point), dtype=bool)
+        cylinder = self.centers[zone, 2] > 0
+        center = self.centers[zone[cylinder]]
+        inside[cylinder] = (pn[cylinder] - center[:, 0]) ** 2 + (pe[cylinder] - center[:, 1]) ** 2 <= center[:, 2]
+
+        polygon = np.flatnonzero(~cylinder)
+        if len(polygon):
+            counts = self.edge_counts[zone[polygon]]
+            pair = np.repeat(np.arange(len(polygon)), counts)
+            starts = np.cumsum(counts) - counts
+            edge = self.edge_starts[zone[polygon]][pair] + np.arange(len(pair)) - starts[pair]
+            n1, e1, n2, e2 = self.edge_array[edge].T
+            qn, qe = pn[polygon][pair], pe[polygon][pair]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                hit = ((n1 > qn) != (n2 > qn)) & (qe < (e2 - e1) * (qn - n1) / (n2 - n1) + e1)
+            inside[polygon] = np.add.reduceat(hit.astype(np.int64), starts) % 2 == 1
+
+        result[point[inside]] = zone[inside]
+        return result
+
+    # Waypoints joined by straight legs, sampled every `spacing` meters.
+    # Returns (waypoint index the violating leg starts at, zone id), or None when clear.
+    def check_path(self, lat, lon, alt, spacing=5.0):
+        lat, lon, alt = (np.atleast_1d(np.asarray(a, np.float64)) for a in np.broadcast_arrays(lat, lon, alt))
+        if len(lat) == 1:
+            hits = self.check_many(lat, lon, alt)
+            return (0, self.zones[hits[0]].zone_id) if hits[0] >= 0 else None
+        n, e = self.frame.project(lat, lon)
+        legs = np.hypot(np.diff(n), np.diff(e))
+        steps = np.maximum(1, np.ceil(legs / spacing).astype(np.int64))
+        leg = np.repeat(np.arange(len(legs)), steps)
+        first = np.concatenate([[0], np.cumsum(steps)[:-1]])
+        fraction = (np.arange(len(leg)) - first[leg]) / steps[leg]
+        sample_lat = np.append(lat[leg] + (lat[leg + 1] - lat[leg]) * fraction, lat[-1])
+        sample_lon = np.append(lon[leg] + (lon[leg + 1] - lon[leg]) * fraction, lon[-1])
+        sample_alt = np.append(alt[leg] + (alt[leg + 1] - alt[leg]) * fraction, alt[-1])
+        hits = self.check_many(sample_lat, sample_lon, sample_alt)
+        violating = np.flatnonzero(hits >= 0)
+        if not len(violating):
+            return None
+        sample = violating[0]
+        return int(leg[sample]) if sample < len(leg) else len(legs), self.zones[hits[sample]].zone_id
+
+    # Zone the vehicle would enter within `lookahead` s at its current NED velocity, or None
+    def check_motion(self, lat, lon, alt, vn, ve, vd, lookahead=2.0, spacing=5.0):
+        n, e = self.frame.project(lat, lon)
+        dn, de, du = vn * lookahead, ve * lookahead, -vd * lookahead
+        steps = max(1, math.ceil(math.sqrt(dn * dn + de * de + du * du) / spacing))
+        for k in range(steps + 1):
+            zone_id = self.check_ned(n + dn * k / steps, e + de * k / steps, alt + du * k / steps)
+            if zone_id is not None:
+                return zone_id
+        return None
+
+    def stats(self):
+        sizes = [len(indices) for indices in self.grid.values()]
+        return {
+            "zones": len(self.zones),
+            "cells": len(self.grid),
+            "covered_cells": len(self.covered),
+            "cell_size_m": self.cell_size,
+            "max_zones_per_cell": max(sizes, default=0),
+            "mean_zones_per_cell": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+        }
+
+
+# Build a geofence from a GeoJSON FeatureCollection; the origin defaults to the first zone
+def load_geofence(path, origin=None, cell_size=250.0):
+    with open(path) as f:
+        collection = json.load(f)
+    features = collection.get("features", [])
+    shapes = []
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        options = {"floor": float(properties.get("floor", -math.inf)),
+                   "ceiling": float(properties.get("ceiling", math.inf)),
+                   "zone_id": properties.get("id", properties.get("name"))}
+        kind = geometry.get("type")
+        # GeoJSON positions are [lon, lat]
+        if kind == "Polygon":
+            shapes.append((POLYGON, [(lat, lon) for lon, lat, *_ in geometry["coordinates"][0]], options))
+        elif kind == "MultiPolygon":
+            for i, polygon in enumerate(geometry["coordinates"]):
+                part = dict(options, zone_id=f"{options['zone_id']}/{i}" if options["zone_id"] else None)
+                shapes.append((POLYGON, [(lat, lon) for lon, lat, *_ in polygon[0]], part))
+        elif kind == "Point" and "radius" in properties:
+            lon, lat = geometry["coordinates"][:2]
+            shapes.append((CYLINDER, (lat, lon, float(properties["radius"])), options))
+        else:
+            logger.warning(f"Skipping unsupported geofence feature: {kind}")
+
+    if origin is None:
+        if not shapes:
+            raise ValueError(f"No geofence zones in {path}")
+        kind, geometry, _ = shapes[0]
+        origin = geometry[:2] if kind == CYLINDER else geometry[0]
+    fence = Geofence(origin[0], origin[1], cell_size)
+    for kind, geometry, options in shapes:
+        if kind == CYLINDER:
+            fence.add_cylinder(*geometry, **options)
+        else:
+            fence.add_polygon(geometry, **options)
+    fence.build()
+    return fence
@@ -0,0 +1,62 @@
+import numpy as np
+
+# Finger tip and base landmark indices (MediaPipe hand model)
+FINGERS = {
+    "Thumb": (4, 3),
+    "Index": (8, 6),
+    "Middle": (12, 10),
+    "Ring": (16, 14),
+    "Pinky": (20, 18),
+}
+
+# Finger combinations mapped to drone commands
+COMMANDS = {
+    frozenset(): "stable",
+    frozenset({"Thumb", "Index", "Middle", "Ring", "Pinky"}): "land",
+    frozenset({"Index", "Middle"}): "down",
+    frozenset({"Index"}): "up",
+    frozenset({"Index", "Middle", "Ring"}): "yaw_x",
+    frozenset({"Index", "Middle", "Ring", "Pinky"}): "yaw_y",
+    frozenset({"Thumb"}): "right",
+    frozenset({"Pinky"}): "left",
+}
+
+
+# Convert a MediaPipe NormalizedLandmarkList to a (21, 3) float32 array
+def landmarks_to_array(landmarks):
+    return np.array([(p.x, p.y, p.z) for p in landmarks.landmark], dtype=np.float32)
+
+
+# MediaPipe handedness label ("Left"/"Right") of each detected hand, in the
+# order of multi_hand_landmarks
+def hand_labels(results):
+    return [hand.classification[0].label for hand in results.multi_handedness or ()]
+
+
+# Function to calculate angle between three points (in degrees)
+def calculate_angle(a, b, c):
+    ab = np.array([a[0] - b[0], a[1] - b[1]])
+    bc = np.array([c[0] - b[0], c[1] - b[1]])
+    dot_product = np.dot(ab, bc)
+    mag_ab = np.linalg.norm(ab)
+    mag_bc = np.linalg.norm(bc)
+    angle = np.arccos(dot_product / (mag_ab * mag_bc))
+    return np.degrees(angle)
+
+
+# Raised fingers for one hand given a (21, 3) landmark array
+def fingers_raised(points):
+    raised = []
+    for finger_name, (tip_id, base_id) in FINGERS.items():
+        if finger_name == "Thumb":
+            angle = calculate_angle(points[0], points[base_id], points[tip_id])
+            if angle > 150:
+                raised.append("Thumb")
+        elif points[tip_id][1] < points[base_id][1]:
+            raised.append(finger_name)
+    return raised
+
+
+# Drone command for a set of raised fingers, or None if the gesture is unknown
+def command_for_fingers(fingers):
+    return COMMANDS.get(frozenset(fingers))
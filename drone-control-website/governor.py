@@ -0,0 +1,262 @@
+import collections
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Thermal- and load-aware performance governor.
+#
+# Each process that drives the Pi hard (streaming.py's camera pipeline,
+# drone.py's and hand_gesture_drone.py's hand inference, camera_feed.py)
+# owns a Governor with a policy ladder: a list of settings dicts from full
+# quality (level 0) down to the cheapest, e.g.
+#   [{"fps": 30, "size": (640, 360), "jpeg_quality": 70}, ...,
+#    {"fps": 10, "size": (320, 180), "jpeg_quality": 50}]
+# Once a second it reads the sensors and the latency the process reported
+# with observe(), then
+#   - steps one level down when the SoC is near the temperature limit, the
+#     firmware reports throttling or under-voltage, latency is over target
+#     or the CPUs are saturated (at most every DOWN_DWELL seconds)
+#   - steps one level back up only when everything is well clear of those
+#     limits (RECOVER_* margins) and has stayed so for UP_DWELL seconds
+# so it settles at the cheapest level that holds the target instead of
+# oscillating. Consumers read governor.settings in their loop (or get
+# on_change() callbacks on the governor thread) and apply what they can.
+#
+# Sensors are pluggable, anything with read() returning a Reading:
+#   AEROSENSE_GOVERNOR=pi (default)   sysfs temperature, firmware throttle
+#                                     flags, /proc/stat CPU load
+#   AEROSENSE_GOVERNOR=file:<path>    a JSON file such as
+#                                     {"temp_c": 78.5, "throttled": 0, "load": 0.6},
+#                                     re-read every tick, for tests and drills
+#   AEROSENSE_GOVERNOR=off            fixed at level 0
+# AEROSENSE_GOVERNOR_TEMP_LIMIT sets the temperature limit (default 80 C,
+# where the Pi firmware starts soft throttling).
+
+TEMP_LIMIT = float(os.environ.get("AEROSENSE_GOVERNOR_TEMP_LIMIT", 80.0))
+HOT_MARGIN = 5.0       # step down above TEMP_LIMIT - HOT_MARGIN
+RECOVER_MARGIN = 10.0  # step up only below TEMP_LIMIT - RECOVER_MARGIN
+HIGH_LOAD = 0.9
+RECOVER_LOAD = 0.7
+RECOVER_LATENCY = 0.7  # fraction of the target latency
+DOWN_DWELL = 2.0
+UP_DWELL = 15.0
+# get_throttled bits: under-voltage, ARM frequency capped, throttled, soft temperature limit (now)
+THROTTLED_NOW = 0xF
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+THROTTLED_SYSFS = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+
+LEVEL = metrics.gauge("aerosense_governor_level", "Current governor ladder level (0 = full quality)", ["governor"])
+STEPS = metrics.counter("aerosense_governor_steps_total", "Governor level changes", ["governor", "direction"])
+TEMPERATURE = metrics.gauge("aerosense_cpu_temperature_celsius", "SoC temperature")
+THROTTLED = metrics.gauge("aerosense_cpu_throttled_flags", "Firmware get_throttled flags")
+CPU_LOAD = metrics.gauge("aerosense_cpu_load_ratio", "Busy fraction of all CPUs")
+
+
+class Reading:
+    def __init__(self, temp_c=None, throttled=None, load=None):
+        self.temp_c = temp_c
+        self.throttled = throttled
+        self.load = load
+
+    def as_dict(self):
+        return {"temp_c": self.temp_c, "throttled": self.throttled, "load": self.load}
+
+
+# Raspberry Pi sensors; every value is None where it is not available
+class PiSensors:
+    def __init__(self):
+        self.last_cpu = None
+        self.vcgencmd = True
+
+    def read(self):
+        return Reading(self._temperature(), self._throttled(), self._load())
+
+    def _temperature(self):
+        try:
+            with open(THERMAL_ZONE) as f:
+                return int(f.read()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    def _throttled(self):
+        try:
+            with open(THROTTLED_SYSFS) as f:
+                return int(f.read().strip(), 16)
+        except (OSError, ValueError):
+            pass
+        if not self.vcgencmd:
+            return None
+        try:
+            output = subprocess.run(["vcgencmd", "get_throttled"], capture_output=True,
+                                    text=True, timeout=1).stdout
+            return int(output.strip().split("=")[1], 16)
+        except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+            self.vcgencmd = False  # not a Pi, or no firmware interface; stop trying
+            return None
+
+    # Busy fraction of all CPUs since the previous read
+    def _load(self):
+        try:
+            with open("/proc/stat") as f:
+                fields = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields)
+        previous, self.last_cpu = self.last_cpu, (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return 1.0 - (idle - previous[0]) / (total - previous[1])
+
+
+class FileSensors:
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                values = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read sensor file {self.path}: {e}")
+            return Reading()
+        return Reading(values.get("temp_c"), values.get("throttled"), values.get("load"))
+
+
+# Sensors from AEROSENSE_GOVERNOR, or None when the governor is off
+def sensors_from_env():
+    spec = os.environ.get("AEROSENSE_GOVERNOR", "pi")
+    if spec == "off":
+        return None
+    if spec.startswith("file:"):
+        return FileSensors(spec[len("file:"):])
+    if spec == "pi":
+        return PiSensors()
+    raise ValueError(f"Unknown AEROSENSE_GOVERNOR: {spec}")
+
+
+class Governor:
+    def __init__(self, name, ladder, sensors, target_latency, interval=1.0):
+        self.name = name
+        self.ladder = ladder
+        self.sensors = sensors
+        self.target_latency = target_latency  # seconds
+        self.interval = interval
+        self.level = 0
+        self.settings = ladder[0]
+        self.latencies = collections.deque(maxlen=256)
+        self.changed_at = float("-inf")
+        self.calm_since = None  # start of the current run of ticks with every signal clear
+        self.reading = Reading()
+        self.reason = None
+        self.listeners = []
+        self.running = False
+        LEVEL.labels(name).set(0)
+
+    def on_change(self, listener):
+        self.listeners.append(listener)
+
+    # Latency of one unit of work (frame, inference), in seconds
+    def observe(self, seconds):
+        self.latencies.append(seconds)
+
+    def start(self):
+        if self.running or self.sensors is None:
+            return
+        self.running = True
+        threading.Thread(target=self._run, name=f"governor {self.name}", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Governor {self.name} tick failed: {e}")
+            time.sleep(self.interval)
+
+    def latency_p95(self):
+        samples = sorted(self.latencies)
+        return samples[int(len(samples) * 0.95)] if samples else None
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        reading = self.sensors.read()
+        self.reading = reading
+        if reading.temp_c is not None:
+            TEMPERATURE.set(reading.temp_c)
+        if reading.throttled is not None:
+            THROTTLED.set(reading.throttled)
+        if reading.load is not None:
+            CPU_LOAD.set(reading.load)
+
+        latency = self.latency_p95()
+        pressure = self._pressure(reading, latency)
+        if pressure is not None:
+            self.calm_since = None
+            if self.level < len(self.ladder) - 1 and now - self.changed_at >= DOWN_DWELL:
+                self._step(1, pressure, now)
+        elif self._calm(reading, latency):
+            if self.calm_since is None:
+                self.calm_since = now
+            if self.level > 0 and now - max(self.calm_since, self.changed_at) >= UP_DWELL:
+                self._step(-1, "recovered", now)
+        else:
+            # Between the step-down and recovery thresholds: hold
+            self.calm_since = None
+
+    # Why the current level is too expensive, or None
+    def _pressure(self, reading, latency):
+        if reading.temp_c is not None and reading.temp_c >= TEMP_LIMIT - HOT_MARGIN:
+            return f"temperature {reading.temp_c:.1f} C"
+        if reading.throttled and reading.throttled & THROTTLED_NOW:
+            return f"throttled 0x{reading.throttled:x}"
+        if latency is not None and latency > self.target_latency:
+            return f"latency p95 {latency * 1000:.0f} ms"
+        if reading.load is not None and reading.load >= HIGH_LOAD:
+            return f"load {reading.load * 100:.0f}%"
+        return None
+
+    def _calm(self, reading, latency):
+        return ((reading.temp_c is None or reading.temp_c < TEMP_LIMIT - RECOVER_MARGIN)
+                and (latency is None or latency < self.target_latency * RECOVER_LATENCY)
+                and (reading.load is None or reading.load < RECOVER_LOAD))
+
+    def _step(self, direction, reason, now):
+        self.level += direction
+        self.settings = self.ladder[self.level]
+        self.changed_at = now
+        self.reason = reason
+        # Samples taken at the old level say nothing about the new one
+        self.latencies.clear()
+        LEVEL.labels(self.name).set(self.level)
+        STEPS.labels(self.name, "down" if direction > 0 else "up").inc()
+        logger.info(f"Governor {self.name}: level {self.level} {self.settings} ({reason})")
+        for listener in self.listeners:
+            listener(self.settings)
+
+    def state(self):
+        latency = self.latency_p95()
+        return {
+            "level": self.level,
+            "settings": self.settings,
+            "reason": self.reason,
+            "latency_p95_ms": round(latency * 1000, 1) if latency is not None else None,
+            "target_latency_ms": round(self.target_latency * 1000, 1),
+            "sensors": self.reading.as_dict(),
+        }
+
+
+# Governor for a consumer, with sensors from the environment (never started when off)
+def create_governor(name, ladder, target_latency):
+    return Governor(name, ladder, sensors_from_env(), target_latency)
@@ -0,0 +1,23 @@
+# MediaPipe Hands startup shared by the gesture entry points: the AI worker
+# (drone.py here) and the standalone drone.py and website/drone.py at the top
+# of the repository.
+#
+# mediapipe is imported here rather than at the top of the callers, so they
+# can run load_hands() on a thread while the camera opens. Importing it and
+# building the graph take seconds on a Pi, and the first process() call
+# initialises the graph, so a blank frame is run through it before the
+# first real one. Each step is timed as a startup_profile.py phase.
+
+
+# Returns (mp_hands, hands, mp_draw); frame_size is (height, width) of the warm-up frame
+def load_hands(profile, frame_size=(480, 640)):
+    with profile.phase("import mediapipe"):
+        import mediapipe as mp
+        import numpy as np
+    with profile.phase("build Hands graph"):
+        mp_hands = mp.solutions.hands
+        hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        mp_draw = mp.solutions.drawing_utils
+    with profile.phase("model warm-up"):
+        hands.process(np.zeros(frame_size + (3,), dtype=np.uint8))
+    return mp_hands, hands, mp_draw
@@ -0,0 +1,406 @@
+import argparse
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from gestures import COMMANDS, command_for_fingers, fingers_raised
+
+# Local hand-landmark inference service.
+#
+# AI clients send camera frames over TCP, the service micro-batches frames
+# from all clients within a small deadline and runs MediaPipe Hands on a pool
+# of worker processes, then sends each client its landmarks and gesture.
+#
+# Request:  FRAME_HEADER + payload (raw RGB bytes or a JPEG)
+# Response: RESULT_HEADER + n_hands * 21 * 3 float32 landmarks
+# Every request gets a response: frames whose inference failed are answered
+# with no hands and NO_COMMAND, and a crashed worker pool is rebuilt.
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# client_id, seq, height, width, encoding, client send time, payload length
+FRAME_HEADER = struct.Struct("!IIHHBdI")
+# seq, client send time (echoed), server time in ms, command code, hand count
+RESULT_HEADER = struct.Struct("!IdfBB")
+
+ENCODING_RGB = 0
+ENCODING_JPEG = 1
+
+COMMAND_NAMES = sorted(set(COMMANDS.values()))
+NO_COMMAND = 255
+LANDMARK_FLOATS = 21 * 3
+NO_HANDS = np.zeros((0, 21, 3), np.float32)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("socket closed")
+        received += n
+    return buf
+
+
+# --------------------------------------------------------------------------
+# Worker process side
+# --------------------------------------------------------------------------
+_hands = None
+
+
+def _init_worker():
+    global _hands
+    import mediapipe as mp
+    # Frames from different clients are interleaved on every worker, so the
+    # tracker cannot carry state between calls: run full detection per frame.
+    _hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=2,
+                                      min_detection_confidence=0.5)
+
+
+def _decode(encoding, height, width, payload):
+    if encoding == ENCODING_JPEG:
+        import cv2
+        bgr = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    return np.frombuffer(payload, np.uint8).reshape(height, width, 3)
+
+
+# Run inference for one micro-batch; returns (landmarks, command) per frame
+def _infer_batch(batch):
+    results = []
+    for encoding, height, width, payload in batch:
+        rgb = _decode(encoding, height, width, payload)
+        output = _hands.process(rgb)
+        hands = []
+        fingers = []
+        if output.multi_hand_landmarks:
+            for landmarks in output.multi_hand_landmarks:
+                points = np.array([(p.x, p.y, p.z) for p in landmarks.landmark], dtype=np.float32)
+                hands.append(points)
+                fingers.extend(fingers_raised(points))
+        landmarks = np.stack(hands) if hands else np.zeros((0, 21, 3), np.float32)
+        results.append((landmarks.tobytes(), len(hands), command_for_fingers(fingers)))
+    return results
+
+
+# --------------------------------------------------------------------------
+# Service side
+# --------------------------------------------------------------------------
+class _Client:
+    def __init__(self, conn, address):
+        self.conn = conn
+        self.address = address
+        self.client_id = None
+        self.send_lock = threading.Lock()
+        self.frames = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=500)
+
+    def send(self, data):
+        with self.send_lock:
+            self.conn.sendall(data)
+
+
+class InferenceService:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None,
+                 max_batch=8, max_wait_ms=5.0):
+        self.address = (host, port)
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = queue.Queue()
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+        self.pool = None
+        self.server = None
+        self.running = False
+        self.batches = 0
+        self.batched_frames = 0
+        self.failed_frames = 0
+        self.pool_restarts = 0
+        self.pool_lock = threading.Lock()
+        self.completed = deque(maxlen=2000)  # completion timestamps for throughput
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def start(self):
+        self.pool = self._new_pool()
+        # Load the model in every worker before accepting clients
+        warmup = np.zeros((64, 64, 3), np.uint8).tobytes()
+        list(self.pool.map(_infer_batch, [[(ENCODING_RGB, 64, 64, warmup)]] * self.workers))
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        logger.info(f"Inference service listening on {self.address[0]}:{self.address[1]} "
+                    f"with {self.workers} workers")
+
+    def stop(self):
+        self.running = False
+        if self.server:
+            self.server.close()
+        with self.clients_lock:
+            for client in list(self.clients.values()):
+                client.conn.close()
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, address = self.server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(conn, address)
+            with self.clients_lock:
+                self.clients[address] = client
+            threading.Thread(target=self._read_loop, args=(client,), daemon=True).start()
+
+    def _read_loop(self, client):
+        logger.info(f"Inference client connected: {client.address}")
+        try:
+            while self.running:
+                header = _recv_exact(client.conn, FRAME_HEADER.size)
+                client_id, seq, height, width, encoding, sent_ts, length = FRAME_HEADER.unpack(header)
+                payload = bytes(_recv_exact(client.conn, length))
+                client.client_id = client_id
+                self.pending.put((client, seq, encoding, height, width, payload, sent_ts, time.time()))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.clients_lock:
+                self.clients.pop(client.address, None)
+            client.conn.close()
+            logger.info(f"Inference client disconnected: {client.address}")
+
+    # Collect frames until the batch is full or the deadline of the oldest frame expires
+    def _collect_batch(self):
+        first = self.pending.get()
+        batch = {first[0]: first}
+        deadline = first[7] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # Keep only the newest frame per client
+            if item[0] in batch:
+                item[0].dropped += 1
+            batch[item[0]] = item
+        return list(batch.values())
+
+    def _batch_loop(self):
+        while self.running:
+            items = self._collect_batch()
+            self.batches += 1
+            self.batched_frames += len(items)
+            # Spread the batch across workers so every core gets a share
+            chunks = [items[i::self.workers] for i in range(min(self.workers, len(items)))]
+            for chunk in chunks:
+                pool = self.pool
+                try:
+                    future = pool.submit(_infer_batch, [item[2:6] for item in chunk])
+                except Exception as e:
+                    if not self.running:
+                        return
+                    # A worker died (BrokenProcessPool): answer the chunk and start a fresh pool
+                    logger.error(f"Inference submit failed: {e}")
+                    self._fail(chunk)
+                    self._restart_pool(pool)
+                    continue
+                future.add_done_callback(lambda f, chunk=chunk, pool=pool: self._reply(chunk, f, pool))
+
+    # Replace a broken pool, once however many chunks saw it fail
+    def _restart_pool(self, broken):
+        with self.pool_lock:
+            if self.pool is not broken or not self.running:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+            self.pool_restarts += 1
+        logger.warning(f"Inference worker pool restarted ({self.pool_restarts} so far)")
+
+    def _reply(self, chunk, future, pool):
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.error(f"Inference batch failed: {e}")
+            self._fail(chunk)
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(pool)
+            return
+        now = time.time()
+        for (client, seq, _, _, _, _, sent_ts, recv_ts), (landmarks, n_hands, command) in zip(chunk, results):
+            code = COMMAND_NAMES.index(command) if command else NO_COMMAND
+            server_ms = (now - recv_ts) * 1000
+            client.frames += 1
+            client.latencies.append(server_ms)
+            self.completed.append(now)
+            try:
+                client.send(RESULT_HEADER.pack(seq, sent_ts, server_ms, code, n_hands) + landmarks)
+            except OSError:
+                pass
+
+    # Answer every frame of a chunk with no hands, so no client waits for a result that never comes
+    def _fail(self, chunk):
+        now = time.time()
+        self.failed_frames += len(chunk)
+        for client, seq, _, _, _, _, sent_ts, recv_ts in chunk:
+            try:
+                client.send(RESULT_HEADER.pack(seq, sent_ts, (now - recv_ts) * 1000, NO_COMMAND, 0))
+            except OSError:
+                pass
+
+    def stats(self):
+        now = time.time()
+        recent = [t for t in self.completed if now - t <= 5.0]
+        with self.clients_lock:
+            clients = list(self.clients.values())
+        per_client = {}
+        for client in clients:
+            latencies = sorted(client.latencies)
+            if latencies:
+                p50 = latencies[len(latencies) // 2]
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            else:
+                p50 = p95 = 0.0
+            per_client[client.client_id] = {
+                "frames": client.frames,
+                "dropped": client.dropped,
+                "latency_p50_ms": round(p50, 2),
+                "latency_p95_ms": round(p95, 2),
+            }
+        return {
+            "throughput_fps": round(len(recent) / 5.0, 2),
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_frames / self.batches, 2) if self.batches else 0.0,
+            "failed_frames": self.failed_frames,
+            "pool_restarts": self.pool_restarts,
+            "clients": per_client,
+        }
+
+
+# --------------------------------------------------------------------------
+# Client side
+# --------------------------------------------------------------------------
+class InferenceClient:
+    # timeout: seconds to wait for a result before giving up on the frame
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, client_id=None, jpeg_quality=None,
+                 timeout=1.0, reconnect_interval=1.0):
+        self.address = (host, port)
+        self.client_id = client_id if client_id is not None else os.getpid()
+        self.jpeg_quality = jpeg_quality
+        self.timeout = timeout
+        self.reconnect_interval = reconnect_interval
+        self.seq = 0
+        self.sock = None
+        self.retry_at = 0.0
+        self._connect()
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.retry_at = time.monotonic() + self.reconnect_interval
+
+    # Send an RGB frame and wait for its result.
+    # Returns (landmarks array of shape (n_hands, 21, 3), command or None, round trip ms).
+    # A timeout or a lost service counts as no hands; the connection is
+    # re-established at most every reconnect_interval seconds.
+    def infer(self, rgb):
+        self.seq += 1
+        sent_ts = time.time()
+        if self.sock is None:
+            if time.monotonic() < self.retry_at:
+                return NO_HANDS, None, 0.0
+            try:
+                self._connect()
+                logger.info(f"Reconnected to inference service {self.address[0]}:{self.address[1]}")
+            except OSError as e:
+                logger.warning(f"Inference service unavailable: {e}")
+                self._disconnect()
+                return NO_HANDS, None, 0.0
+        try:
+            return self._request(rgb)
+        except OSError as e:  # socket.timeout included
+            # The stream may be cut mid-result: drop it and start over on a new connection
+            logger.warning(f"Inference request {self.seq} failed: {e!r}")
+            self._disconnect()
+            return NO_HANDS, None, (time.time() - sent_ts) * 1000
+
+    def _request(self, rgb):
+        height, width = rgb.shape[:2]
+        if self.jpeg_quality:
+            import cv2
+            _, buffer = cv2.imencode('.jpg', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                                     [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            encoding, payload = ENCODING_JPEG, buffer.tobytes()
+        else:
+            encoding, payload = ENCODING_RGB, np.ascontiguousarray(rgb).tobytes()
+        sent_ts = time.time()
+        self.sock.sendall(FRAME_HEADER.pack(self.client_id, self.seq, height, width, encoding,
+                                            sent_ts, len(payload)) + payload)
+        # Older frames may have been dropped by the batcher, skip their results
+        while True:
+            seq, _, _, code, n_hands = RESULT_HEADER.unpack(_recv_exact(self.sock, RESULT_HEADER.size))
+            data = _recv_exact(self.sock, n_hands * LANDMARK_FLOATS * 4)
+            if seq == self.seq:
+                break
+        landmarks = np.frombuffer(data, np.float32).reshape(n_hands, 21, 3)
+        command = None if code == NO_COMMAND else COMMAND_NAMES[code]
+        return landmarks, command, (time.time() - sent_ts) * 1000
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batched hand inference service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    service = InferenceService(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms)
+    service.start()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            logger.info(f"Inference stats: {service.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
@@ -0,0 +1,59 @@
+import struct
+
+import numpy as np
+
+from gestures import COMMANDS
+
+# Compact binary hand-landmark packets from the AI worker (drone.py), sent as
+# Socket.IO binary attachments instead of base64 JPEG frames. The browser
+# draws them on a canvas over its own video (decodeLandmarks in
+# static/scripts.js).
+#
+# Header (10 bytes, little-endian):
+#   u8  version
+#   u8  flags        bit0 frame mirrored horizontally
+#   u16 seq
+#   u32 t_ms         capture time in server ms (wraps)
+#   u8  command      index in COMMAND_NAMES, 255 for none
+#   u8  hands
+# then per hand 21 x (u16 x, u16 y): normalized image coordinates * 65535.
+# Depth is dropped, the overlay is 2D. Two hands make 178 bytes.
+
+VERSION = 1
+FLAG_MIRRORED = 0x01
+NO_COMMAND = 255
+LANDMARKS = 21
+MAX_HANDS = 4
+
+HEADER = struct.Struct("<BBHIBB")
+COMMAND_NAMES = sorted(set(COMMANDS.values()))
+
+
+class LandmarkEncoder:
+    def __init__(self, mirrored=False):
+        self.flags = FLAG_MIRRORED if mirrored else 0
+        self.seq = 0
+
+    # hands: sequence of (21, 2+) arrays in normalized image coordinates
+    def encode(self, hands, command, t_ms):
+        self.seq = (self.seq + 1) & 0xFFFF
+        hands = list(hands)[:MAX_HANDS]
+        code = COMMAND_NAMES.index(command) if command in COMMAND_NAMES else NO_COMMAND
+        header = HEADER.pack(VERSION, self.flags, self.seq, int(t_ms) & 0xFFFFFFFF, code, len(hands))
+        if not hands:
+            return header
+        points = np.stack([np.asarray(hand, np.float32)[:, :2] for hand in hands])
+        quantized = np.clip(np.rint(points * 65535), 0, 65535).astype('<u2')
+        return header + quantized.tobytes()
+
+
+def decode(payload):
+    version, flags, seq, t_ms, code, count = HEADER.unpack_from(payload)
+    points = np.frombuffer(payload, '<u2', count=count * LANDMARKS * 2, offset=HEADER.size)
+    return {
+        "seq": seq,
+        "t_ms": t_ms,
+        "mirrored": bool(flags & FLAG_MIRRORED),
+        "command": COMMAND_NAMES[code] if code != NO_COMMAND else None,
+        "hands": points.reshape(count, LANDMARKS, 2).astype(np.float32) / 65535,
+    }
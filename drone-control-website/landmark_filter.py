@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+from gestures import FINGERS
+
+# Low-latency gesture smoothing.
+#
+# Replaces the majority-vote windows (deque(maxlen=10) / deque(maxlen=2)) with
+# two stages that work on whole landmark arrays at once:
+#   1. a One-Euro filter on every landmark coordinate, which smooths jitter
+#      when the hand is still and follows quickly when it moves
+#   2. hysteresis on the finger-extension tests, so a finger near the
+#      threshold does not flap between raised and lowered
+# A new finger combination is only reported once it has been held for a short
+# dwell time (60 ms), which hides the in-between combinations seen while the
+# hand changes from one gesture to the next.
+#
+# Filter state is kept per hand, keyed by MediaPipe's handedness label, so
+# it follows a hand when the detector reorders the hands between frames. A
+# hand that drops out of the frame starts with fresh state when it returns.
+# Without labels, hands are told apart by their position in the list.
+#
+# bench_gesture_filter.py compares this against the majority-vote windows.
+
+FINGER_NAMES = list(FINGERS)
+TIP_IDS = np.array([tip for tip, _ in FINGERS.values()])
+BASE_IDS = np.array([base for _, base in FINGERS.values()])
+
+# Thumb uses the wrist/base/tip angle in degrees (raised above 150 before);
+# the other fingers use tip height above base in units of palm length.
+THUMB_ON, THUMB_OFF = 155.0, 145.0
+FINGER_ON, FINGER_OFF = 0.05, -0.05
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=4.0, beta=5.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def reset(self):
+        self.x_prev = None
+
+    # Filter an array of any shape sampled at time t (seconds)
+    def __call__(self, x, t):
+        x = np.asarray(x, dtype=np.float32)
+        if self.x_prev is None or self.x_prev.shape != x.shape:
+            self.x_prev = x.copy()
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = t
+            return x
+        dt = max(t - self.t_prev, 1e-3)
+        dx = (x - self.x_prev) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        x_hat = a * x + (1 - a) * self.x_prev
+        self.x_prev = x_hat
+        self.dx_prev = dx_hat
+        self.t_prev = t
+        return x_hat
+
+
+# Finger extension scores for a stack of hands, shape (n, 21, 3) -> (n, 5)
+def extension_scores(points):
+    points = np.asarray(points, dtype=np.float32)
+    palm = np.linalg.norm(points[:, 9, :2] - points[:, 0, :2], axis=1)
+    palm = np.maximum(palm, 1e-6)[:, None]
+    scores = (points[:, BASE_IDS, 1] - points[:, TIP_IDS, 1]) / palm
+
+    ab = points[:, 0, :2] - points[:, BASE_IDS[0], :2]
+    bc = points[:, TIP_IDS[0], :2] - points[:, BASE_IDS[0], :2]
+    cos = np.sum(ab * bc, axis=1) / np.maximum(
+        np.linalg.norm(ab, axis=1) * np.linalg.norm(bc, axis=1), 1e-9)
+    scores[:, 0] = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+    return scores
+
+
+class FingerHysteresis:
+    def __init__(self, on=None, off=None):
+        self.on = np.array(on if on is not None else [THUMB_ON] + [FINGER_ON] * 4, dtype=np.float32)
+        self.off = np.array(off if off is not None else [THUMB_OFF] + [FINGER_OFF] * 4, dtype=np.float32)
+        self.state = None
+
+    def reset(self):
+        self.state = None
+
+    def __call__(self, scores):
+        if self.state is None or self.state.shape != scores.shape:
+            # First sample decides on the midpoint between both thresholds
+            self.state = scores > (self.on + self.off) / 2
+        else:
+            self.state = np.where(scores > self.on, True,
+                                  np.where(scores < self.off, False, self.state))
+        return self.state
+
+
+# Per-hand keys: the label plus a count, in case the detector gives two
+# hands the same label
+def hand_keys(labels):
+    seen = {}
+    keys = []
+    for label in labels:
+        keys.append((label, seen.get(label, 0)))
+        seen[label] = seen.get(label, 0) + 1
+    return keys
+
+
+# Full smoothing stage: landmarks in, raised fingers out
+class GestureFilter:
+    def __init__(self, min_cutoff=4.0, beta=5.0, d_cutoff=1.0, dwell=0.06):
+        self.params = (min_cutoff, beta, d_cutoff)
+        self.hands = {}  # hand key -> (OneEuroFilter, FingerHysteresis)
+        self.dwell = dwell
+        self.candidate = None
+        self.candidate_since = 0.0
+        self.fingers = []
+
+    def reset(self):
+        self.hands = {}
+
+    # hands: (n, 21, 3) array or list of (21, 3) arrays, t: timestamp in seconds,
+    # labels: handedness of each hand (gestures.hand_labels), None to key by position
+    def update(self, hands, t, labels=None):
+        tracks = {}
+        raised = np.zeros(len(FINGER_NAMES), dtype=bool)
+        for key, points in zip(hand_keys(labels if labels is not None else [None] * len(hands)), hands):
+            track = self.hands.get(key) or (OneEuroFilter(*self.params), FingerHysteresis())
+            tracks[key] = track
+            landmarks, hysteresis = track
+            raised |= hysteresis(extension_scores(landmarks(points, t)[None]))[0]
+        self.hands = tracks
+        fingers = [name for name, up in zip(FINGER_NAMES, raised) if up]
+
+        if fingers != self.candidate:
+            self.candidate = fingers
+            self.candidate_since = t
+        if t - self.candidate_since >= self.dwell - 1e-6:
+            self.fingers = fingers
+        return self.fingers
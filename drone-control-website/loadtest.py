@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psutil
+import socketio
+from socketio.exceptions import TimeoutError as AckTimeout
+
+# Socket.IO load test for the control server.
+#
+# Spawns hundreds of synthetic clients in one asyncio process against a local
+# app.py (started here with a simulated fleet) or an already running server
+# (--url, e.g. the eventlet TLS server). Clients replay the browser's traffic:
+#   pilot      20 Hz pilot telemetry; joystick moves at 50 Hz like
+#              flushJoysticks, held keys with keyboard press/release pairs,
+#              arm/takeoff at start and occasional AI/manual mode switches
+#   spectator  2 Hz dashboard telemetry only
+# and it measures:
+#   - control round trip: every control/mode emit asks for an ack
+#   - telemetry inter-arrival per tier, and jitter against the nominal period
+#   - server CPU and memory (psutil, sampled every 0.5 s), plus the harness'
+#     own CPU so a saturated load generator is visible
+# Each run writes a JSON report; --compare prints the deltas against an
+# earlier report.
+#
+# Usage: python loadtest.py --pilots 50 --spectators 200 --seconds 30
+#        python loadtest.py --url https://127.0.0.1:5000 --server-pid 1234 --insecure
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TIER_HZ = {"pilot": 20.0, "dashboard": 2.0, "json": 10.0}
+JOYSTICK_HZ = 50.0
+KEYBOARD_AXES = ["throttle_up", "throttle_down", "yaw_left", "yaw_right",
+                 "pitch_forward", "pitch_backward", "roll_left", "roll_right"]
+
+
+def summarize(values, scale=1000.0):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(p):
+        return round(values[min(len(values) - 1, int(len(values) * p))] * scale, 3)
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values) * scale, 3),
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": pick(1.0),
+    }
+
+
+def get_json(url, insecure=False):
+    import ssl
+    context = ssl._create_unverified_context() if insecure else None
+    with urllib.request.urlopen(url, timeout=5, context=context) as response:
+        return json.loads(response.read())
+
+
+def start_server(vehicles, port):
+    env = dict(os.environ, AEROSENSE_VEHICLE=f"fleet:{vehicles}")
+    code = f"import app; app.socketio.run(app.app, host='127.0.0.1', port={port}, log_output=False)"
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            get_json(f"http://127.0.0.1:{port}/vehicles")
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start")
+
+
+class SyntheticClient:
+    def __init__(self, role, tier, vehicle_id, rng, insecure):
+        self.role = role
+        self.tier = tier
+        self.vehicle_id = vehicle_id
+        self.rng = rng
+        self.sio = socketio.AsyncClient(reconnection=False, ssl_verify=not insecure)
+        self.sio.on('telemetry_bin', self.on_telemetry)
+        self.sio.on('telemetry', self.on_telemetry)
+        self.recording = False
+        self.last_packet = None
+        self.gaps = []
+        self.rtts = {}  # event kind -> [seconds]
+        self.sent = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def on_telemetry(self, *args):
+        now = time.perf_counter()
+        if self.recording and self.last_packet is not None:
+            self.gaps.append(now - self.last_packet)
+        self.last_packet = now
+
+    async def connect(self, url):
+        await self.sio.connect(url, transports=['websocket'], wait_timeout=20)
+        await self.sio.call('select_vehicle', {'vehicle_id': self.vehicle_id}, timeout=20)
+        await self.sio.call('telemetry_subscribe', {'tier': self.tier}, timeout=20)
+
+    # Emit with an ack and record the round trip under kind
+    async def send(self, kind, event, data):
+        start = time.perf_counter()
+        self.sent += 1
+        try:
+            await self.sio.call(event, data, timeout=5)
+        except AckTimeout:
+            self.timeouts += 1
+            return
+        except Exception:
+            self.errors += 1
+            return
+        if self.recording:
+            self.rtts.setdefault(kind, []).append(time.perf_counter() - start)
+
+    # Acks are awaited in the background so a slow server cannot throttle the replay rate
+    def fire(self, kind, event, data):
+        asyncio.ensure_future(self.send(kind, event, data))
+
+    async def fly(self, stop_at, mode_switch_s):
+        self.fire('command', 'control', 'arm')
+        self.fire('command', 'control', 'takeoff')
+        period = 1.0 / JOYSTICK_HZ
+        phase = self.rng.uniform(0, 2 * math.pi)
+        next_key = time.monotonic() + self.rng.uniform(0.5, 3.0)
+        held = None
+        next_mode = time.monotonic() + self.rng.expovariate(1.0 / mode_switch_s) if mode_switch_s else None
+        mode = "manual"
+        next_tick = time.monotonic()
+        while time.monotonic() < stop_at:
+            now = time.monotonic()
+            t = now + phase
+            t_ms = time.time() * 1000
+            # Slow sweeps on both sticks, so every flush carries a changed value
+            self.fire('joystick', 'control', {'type': 'left-joystick', 'x': round(3 * math.sin(t), 2),
+                                              'y': round(2 * math.sin(0.5 * t), 2), 't': t_ms})
+            self.fire('joystick', 'control', {'type': 'right-joystick', 'x': round(4 * math.cos(0.7 * t), 2),
+                                              'y': round(4 * math.sin(0.3 * t), 2), 't': t_ms})
+            if now >= next_key:
+                if held is None:
+                    held = self.rng.choice(KEYBOARD_AXES)
+                    self.fire('keyboard', 'control', {'type': 'keyboard', 'code': held, 't': t_ms})
+                    next_key = now + self.rng.uniform(0.2, 1.5)
+                else:
+                    self.fire('keyboard', 'control', {'type': 'keyboard', 'code': 'stop_' + held, 't': t_ms})
+                    held = None
+                    next_key = now + self.rng.uniform(0.5, 3.0)
+            if next_mode is not None and now >= next_mode:
+                mode = "ai" if mode == "manual" else "manual"
+                self.fire('mode', 'mode', mode)
+                next_mode = now + self.rng.expovariate(1.0 / mode_switch_s)
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+        if held is not None:
+            self.fire('keyboard', 'control', {'type': 'keyboard', 'code': 'stop_' + held, 't': time.time() * 1000})
+
+    async def watch(self, stop_at):
+        await asyncio.sleep(max(0.0, stop_at - time.monotonic()))
+
+
+# Server CPU and RSS, summed when the server is several processes
+class ResourceSampler:
+    def __init__(self, pids, interval=0.5):
+        self.interval = interval
+        if isinstance(pids, int):
+            pids = [pids]
+        self.servers = [psutil.Process(pid) for pid in pids or []]
+        self.harness = psutil.Process()
+        self.server_cpu = []
+        self.server_rss = []
+        self.harness_cpu = []
+
+    async def run(self, stop_at):
+        for server in self.servers:
+            server.cpu_percent(None)
+        self.harness.cpu_percent(None)
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(self.interval)
+            if self.servers:
+                try:
+                    self.server_cpu.append(sum(server.cpu_percent(None) for server in self.servers))
+                    self.server_rss.append(sum(server.memory_info().rss for server in self.servers))
+                except psutil.Error:
+                    self.servers = []
+            self.harness_cpu.append(self.harness.cpu_percent(None))
+
+    def report(self):
+        def stats(values, scale=1.0, digits=1):
+            if not values:
+                return None
+            return {"mean": round(statistics.fmean(values) * scale, digits),
+                    "max": round(max(values) * scale, digits)}
+
+        mb = 1.0 / (1024 * 1024)
+        return {
+            "server_cpu_pct": stats(self.server_cpu),
+            "server_rss_mb": dict(stats(self.server_rss, mb), start=round(self.server_rss[0] * mb, 1),
+                                  end=round(self.server_rss[-1] * mb, 1)) if self.server_rss else None,
+            "harness_cpu_pct": stats(self.harness_cpu),
+        }
+
+
+async def run_load(args, url, server_pids):
+    rng = random.Random(args.seed)
+    vehicle_ids = [v["id"] for v in get_json(f"{url}/vehicles", args.insecure)]
+    clients = []
+    for i in range(args.pilots):
+        clients.append(SyntheticClient("pilot", "pilot", vehicle_ids[i % len(vehicle_ids)],
+                                       random.Random(rng.random()), args.insecure))
+    for i in range(args.spectators):
+        clients.append(SyntheticClient("spectator", "dashboard", rng.choice(vehicle_ids),
+                                       random.Random(rng.random()), args.insecure))
+
+    # Ramp connections up in batches instead of one thundering herd
+    connect_start = time.perf_counter()
+    failed = 0
+    for i in range(0, len(clients), args.connect_batch):
+        batch = clients[i:i + args.connect_batch]
+        results = await asyncio.gather(*(c.connect(url) for c in batch), return_exceptions=True)
+        failed += sum(isinstance(r, Exception) for r in results)
+    connect_s = time.perf_counter() - connect_start
+    connected = [c for c in clients if c.sio.connected]
+
+    stop_at = time.monotonic() + args.warmup + args.seconds
+    sampler = ResourceSampler(server_pids)
+    tasks = [c.fly(stop_at, args.mode_switch) if c.role == "pilot" else c.watch(stop_at) for c in connected]
+
+    async def start_recording():
+        await asyncio.sleep(args.warmup)
+        for c in connected:
+            c.recording = True
+        await sampler.run(stop_at)
+        for c in connected:
+            c.recording = False
+
+    before = get_json(f"{url}/telemetry/stats", args.insecure)
+    await asyncio.gather(start_recording(), *tasks)
+    await asyncio.sleep(1.0)  # let outstanding acks land
+    after = {name: get_json(f"{url}/{name}/stats", args.insecure) for name in ("telemetry", "control")}
+    for c in connected:
+        await c.sio.disconnect()
+
+    rtts = {}
+    for c in connected:
+        for kind, values in c.rtts.items():
+            rtts.setdefault(kind, []).extend(values)
+    all_rtts = [v for values in rtts.values() for v in values]
+
+    telemetry = {}
+    for tier in {c.tier for c in connected}:
+        gaps = [g for c in connected if c.tier == tier for g in c.gaps]
+        period = 1.0 / TIER_HZ[tier]
+        deviations = [abs(g - period) for g in gaps]
+        # Every packet received while recording closes one gap
+        received = len(gaps)
+        subscribers = sum(1 for c in connected if c.tier == tier)
+        telemetry[tier] = {
+            "subscribers": subscribers,
+            "delivery_pct": round(100.0 * received / (subscribers * TIER_HZ[tier] * args.seconds), 1),
+            "interarrival_ms": summarize(gaps),
+            "jitter_ms": summarize(deviations),
+            "jitter_stdev_ms": round(statistics.pstdev(gaps) * 1000, 3) if len(gaps) > 1 else 0.0,
+        }
+
+    return {
+        "connect": {"clients": len(clients), "connected": len(connected), "failed": failed,
+                    "seconds": round(connect_s, 2)},
+        "control_rtt_ms": dict(summarize(all_rtts), by_kind={k: summarize(v) for k, v in rtts.items()}),
+        "control_sent": sum(c.sent for c in connected),
+        "control_timeouts": sum(c.timeouts for c in connected),
+        "control_errors": sum(c.errors for c in connected),
+        "telemetry": telemetry,
+        "resources": sampler.report(),
+        "server": {
+            "telemetry_late_ticks": after["telemetry"]["late_ticks"] - before["late_ticks"],
+            "telemetry_emit_p95_ms": after["telemetry"]["emit_latency_p95_ms"],
+            "telemetry_queue_depth": after["telemetry"]["queue_depth"],
+            "control": after["control"],
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Headline numbers shown in the summary and compared between reports
+def headline(report):
+    results = report["results"]
+    rows = {
+        "connected": results["connect"]["connected"],
+        "control rtt p50 ms": results["control_rtt_ms"].get("p50"),
+        "control rtt p95 ms": results["control_rtt_ms"].get("p95"),
+        "control rtt p99 ms": results["control_rtt_ms"].get("p99"),
+        "control timeouts": results["control_timeouts"],
+    }
+    for tier, stats in sorted(results["telemetry"].items()):
+        rows[f"{tier} delivery %"] = stats["delivery_pct"]
+        rows[f"{tier} jitter p95 ms"] = stats["jitter_ms"].get("p95")
+    resources = results["resources"]
+    if resources["server_cpu_pct"]:
+        rows["server cpu mean %"] = resources["server_cpu_pct"]["mean"]
+        rows["server cpu max %"] = resources["server_cpu_pct"]["max"]
+    if resources["server_rss_mb"]:
+        rows["server rss max MB"] = resources["server_rss_mb"]["max"]
+    if resources["harness_cpu_pct"]:
+        rows["harness cpu max %"] = resources["harness_cpu_pct"]["max"]
+    return rows
+
+
+def print_summary(report, baseline=None):
+    rows = headline(report)
+    base = headline(baseline) if baseline else {}
+    for name, value in rows.items():
+        line = f"{name:<24} {value!s:>10}"
+        old = base.get(name)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            line += f"   (was {old}, {value - old:+.3g})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO load test for app.py")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU/memory")
+    parser.add_argument("--insecure", action="store_true", help="skip TLS verification (self-signed certs)")
+    parser.add_argument("--vehicles", type=int, default=4, help="fleet size of the local server")
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--pilots", type=int, default=20)
+    parser.add_argument("--spectators", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--mode-switch", type=float, default=10.0,
+                        help="mean seconds between a pilot's mode switches, 0 to disable")
+    parser.add_argument("--connect-batch", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="report path (default loadtest-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        server = start_server(args.vehicles, args.port)
+        url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+
+    try:
+        results = asyncio.run(run_load(args, url, server_pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    output = args.output or f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+    print(f"Report written to {output}")
+
+
+if __name__ == '__main__':
+    main()
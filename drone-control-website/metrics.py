@@ -0,0 +1,289 @@
+import bisect
+import math
+import threading
+import time
+
+# Process-wide metrics registry with Prometheus text-format output.
+#
+# Used by app.py and streaming.py (each process has its own registry and
+# serves it on /metrics). Built to stay on in flight:
+#   - counters and histograms are sharded per thread: a thread only ever
+#     writes its own cell, so updates take no lock and never contend; the
+#     cells are summed when /metrics is scraped
+#   - histogram buckets are fixed up front, an observation is one bisect and
+#     two adds
+#   - gauges are a single attribute store, or a function evaluated at scrape
+#     time for values that already live elsewhere (viewers, worker state)
+#
+#   FRAMES = metrics.counter("aerosense_capture_frames_total", "Frames captured")
+#   FRAMES.inc()
+#   with metrics.histogram("aerosense_stage_seconds", "Stage time", ["stage"]).labels("encode").time():
+#       ...
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from 100 us to 10 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+# Bytes, from 1 KiB to 1 MiB
+SIZE_BUCKETS = tuple(1024 * 2 ** i for i in range(11))
+
+
+class _Shards:
+    # One list of counters per thread, summed on read
+    def __init__(self, width):
+        self.width = width
+        self.cells = {}
+        self.lock = threading.Lock()
+
+    def cell(self):
+        ident = threading.get_ident()
+        cell = self.cells.get(ident)
+        if cell is None:
+            with self.lock:
+                cell = self.cells.setdefault(ident, [0] * self.width)
+        return cell
+
+    def totals(self):
+        totals = [0] * self.width
+        for cell in list(self.cells.values()):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), **options):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.options = options
+        self.children = {}
+        self.lock = threading.Lock()
+
+    # Child for one combination of label values, created once and cached
+    def labels(self, *values, **named):
+        if named:
+            values = tuple(named[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self.lock:
+                child = self.children.setdefault(key, self._child())
+        return child
+
+    def _unlabelled(self):
+        child = self.children.get(())
+        if child is None:
+            if self.labelnames:
+                raise ValueError(f"{self.name} has labels {self.labelnames}, use .labels()")
+            child = self.labels()
+        return child
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self.shards.cell()[0] += amount
+
+    def value(self):
+        return self.shards.totals()[0]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_format(child.value())}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.current = 0.0
+        self.function = None
+
+    def set(self, value):
+        self.current = value
+
+    def inc(self, amount=1):
+        self.current += amount
+
+    def dec(self, amount=1):
+        self.current -= amount
+
+    # Evaluate fn() at scrape time instead of storing a value
+    def set_function(self, fn):
+        self.function = fn
+
+    def value(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return math.nan
+        return self.current
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set_function(self, fn):
+        self._unlabelled().set_function(fn)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_format(child.value())}"]
+
+
+class _HistogramChild:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket, +Inf, then the sum
+        self.shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value):
+        cell = self.shards.cell()
+        cell[bisect.bisect_left(self.bounds, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def _render_child(self, key, child):
+        totals = child.shards.totals()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), totals[:-1]):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else _format(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_format(totals[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    # Get or create, so modules can declare the metrics they use independently
+    def _get(self, cls, name, help, labelnames=(), **options):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labelnames, **options)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered differently")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    # Called before every render, to refresh gauges from other state
+    def on_collect(self, hook):
+        self.hooks.append(hook)
+
+    def render(self):
+        for hook in self.hooks:
+            try:
+                hook()
+            except Exception:
+                pass
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+on_collect = REGISTRY.on_collect
+render = REGISTRY.render
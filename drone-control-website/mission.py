@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Non-blocking arm / take-off / land for a vehicle backend (vehicle.py).
+#
+# The old arm_and_takeoff() and land_drone() polled the vehicle with
+# time.sleep(1) on the caller's thread, so a landing gesture froze the camera
+# loop until touchdown. MissionExecutor only sends the command and returns;
+# the phase advances in step(), which the vision loop calls every frame: it
+# reads the backend's state snapshot (kept current by MavlinkVehicle's reader
+# thread, no lock and no MAVLink round trip), reacts to arming changes and
+# altitude, and enforces timeouts.
+#
+#   landed -> arming -> taking_off -> flying -> landing -> landed
+#                   \___________\________________\-> failed (timeout)
+#
+# Each request has a priority. A request preempts the running phase only if
+# it outranks it: a land gesture aborts an ongoing take-off, while movement
+# gestures are refused until the vehicle is flying and no phase is running.
+# state() returns a snapshot of the progress, and on_change() listeners get
+# every transition.
+
+ARMING = "arming"
+TAKING_OFF = "taking_off"
+FLYING = "flying"
+LANDING = "landing"
+LANDED = "landed"
+FAILED = "failed"
+
+# Request priorities; the running phase holds the priority of the request that started it
+PRIORITY = {"move": 1, "takeoff": 2, "land": 3}
+PHASE_PRIORITY = {ARMING: PRIORITY["takeoff"], TAKING_OFF: PRIORITY["takeoff"], LANDING: PRIORITY["land"]}
+
+
+class MissionExecutor:
+    def __init__(self, vehicle, arm_timeout=30.0, takeoff_timeout=60.0, land_timeout=180.0):
+        self.vehicle = vehicle
+        self.timeouts = {ARMING: arm_timeout, TAKING_OFF: takeoff_timeout, LANDING: land_timeout}
+        self.armed = vehicle.state.armed  # last armed state step() saw
+        self.phase = LANDED if not self.armed else FLYING
+        self.phase_started = time.monotonic()
+        self.target_altitude = None
+        self.start_altitude = 0.0
+        self.altitude = 0.0
+        self.error = None
+        self.listeners = []
+        self.lock = threading.RLock()
+
+    def on_change(self, listener):
+        self.listeners.append(listener)
+
+    # Whether a request of this kind may run now
+    def allows(self, action):
+        with self.lock:
+            priority = PRIORITY[action]
+            running = PHASE_PRIORITY.get(self.phase)
+            if running is not None:
+                return priority > running
+            if action == "move":
+                return self.phase == FLYING
+            return True
+
+    def takeoff(self, target_altitude):
+        with self.lock:
+            if not self.allows("takeoff") or self.phase == FLYING:
+                return False
+            self.target_altitude = target_altitude
+            self.start_altitude = self.altitude
+            self.error = None
+            if self.vehicle.state.armed:
+                self._start_climb()
+            else:
+                logger.info("Arming motors...")
+                self.vehicle.arm()
+                self._set_phase(ARMING)
+            return True
+
+    def land(self):
+        with self.lock:
+            if not self.allows("land") or self.phase == LANDED:
+                return False
+            if self.phase in (ARMING, TAKING_OFF):
+                logger.warning(f"Landing requested during {self.phase}, aborting it")
+            if not self.vehicle.state.armed:
+                self.vehicle.disarm()  # cancels an arming request still in flight
+                self._set_phase(LANDED)
+                return True
+            logger.info("Landing...")
+            self.vehicle.land()
+            self.start_altitude = self.altitude
+            self._set_phase(LANDING)
+            return True
+
+    # Follow the vehicle state and enforce phase timeouts; call regularly,
+    # e.g. once per frame
+    def step(self):
+        state = self.vehicle.state
+        with self.lock:
+            if state.armed != self.armed:
+                self.armed = state.armed
+                self._on_armed(state.armed)
+            self._on_altitude(state.alt)
+            timeout = self.timeouts.get(self.phase)
+            if timeout is None or time.monotonic() - self.phase_started < timeout:
+                return
+            self.error = f"{self.phase} timed out after {timeout:.0f} s"
+            logger.error(self.error)
+            self._set_phase(FAILED)
+
+    def state(self):
+        with self.lock:
+            return {
+                "phase": self.phase,
+                "progress": round(self._progress(), 2),
+                "altitude": round(self.altitude, 2),
+                "target_altitude": self.target_altitude,
+                "elapsed": round(time.monotonic() - self.phase_started, 1),
+                "error": self.error,
+            }
+
+    # Fraction of the running phase done, from the altitude change
+    def _progress(self):
+        if self.phase == TAKING_OFF and self.target_altitude:
+            span = self.target_altitude - self.start_altitude
+            return min(1.0, max(0.0, (self.altitude - self.start_altitude) / span)) if span > 0 else 1.0
+        if self.phase == LANDING:
+            return min(1.0, max(0.0, 1.0 - self.altitude / self.start_altitude)) if self.start_altitude > 0 else 0.0
+        return 1.0 if self.phase in (FLYING, LANDED) else 0.0
+
+    def _start_climb(self):
+        logger.info("Taking off!")
+        self.vehicle.takeoff(self.target_altitude)
+        self._set_phase(TAKING_OFF)
+
+    def _set_phase(self, phase):
+        self.phase = phase
+        self.phase_started = time.monotonic()
+        snapshot = self.state()
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Mission listener failed: {e}")
+
+    def _on_armed(self, armed):
+        if armed and self.phase == ARMING:
+            self._start_climb()
+        elif armed and self.phase == LANDED:
+            # Armed outside the executor (RC, ground station), as in __init__
+            self._set_phase(FLYING)
+        elif not armed and self.phase != LANDED:
+            logger.info("Landed and motors disarmed.")
+            self._set_phase(LANDED)
+
+    def _on_altitude(self, altitude):
+        self.altitude = altitude
+        if self.phase == TAKING_OFF and self.altitude >= self.target_altitude * 0.95:
+            logger.info("Reached target altitude!")
+            self._set_phase(FLYING)
@@ -0,0 +1,183 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# On-demand profiling for the hot loops (capture, gesture detection).
+#
+# StageTimers: per-stage wall time around each loop step. Off by default;
+# when off, stage() returns one shared no-op context manager, so the loop
+# pays a method call and nothing else. When on, it keeps count/total/max per
+# stage and logs a summary every report_interval seconds.
+#
+# SamplingProfiler: a time-boxed sampler of every thread's stack, using
+# sys._current_frames() from a background thread. Nothing runs until a
+# profile is requested (SIGUSR1 or an admin endpoint). The result is written
+# as collapsed stacks ("thread;file:func;... count" per line), which
+# flamegraph.pl, speedscope and inferno read directly. Each stack starts with
+# the thread name, so time spent in, say, the capture thread versus the
+# uvicorn event loop is visible at the root of the graph.
+#
+#   kill -USR1 <pid>                       # 10 s profile to AEROSENSE_PROFILE_DIR
+#   flamegraph.pl profiles/streaming-*.folded > flame.svg
+
+PROFILE_DIR = os.environ.get("AEROSENSE_PROFILE_DIR", "profiles")
+DEFAULT_SECONDS = 10.0
+MAX_SECONDS = 120.0
+DEFAULT_INTERVAL = 0.005
+
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timers.add(self.name, time.perf_counter() - self.start)
+
+
+class StageTimers:
+    def __init__(self, name, enabled=False, report_interval=10.0):
+        self.name = name
+        self.enabled = enabled
+        self.report_interval = report_interval
+        self.stages = {}  # stage -> [count, total seconds, max seconds]
+        self.stage_contexts = {}
+        self.last_report = time.monotonic()
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        context = self.stage_contexts.get(name)
+        if context is None:
+            context = self.stage_contexts[name] = _Stage(self, name)
+        return context
+
+    def add(self, name, seconds):
+        with self.lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    # Log and reset the per-stage summary once every report_interval; call once per loop iteration
+    def tick(self):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self.last_report < self.report_interval:
+            return
+        elapsed = now - self.last_report
+        self.last_report = now
+        summary = self.snapshot(reset=True)
+        lines = [f"{self.name} stage timings over {elapsed:.1f} s (mean / max ms, share of wall time):"]
+        for stage, entry in summary.items():
+            lines.append(f"  {stage:<16} {entry['mean_ms']:8.2f} / {entry['max_ms']:8.2f}  "
+                         f"x{entry['count']:<6} {entry['total_s'] / elapsed * 100:5.1f}%")
+        logger.info("\n".join(lines))
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            stages = self.stages
+            if reset:
+                self.stages = {}
+            else:
+                stages = {name: list(entry) for name, entry in stages.items()}
+        return {name: {"count": count, "total_s": total, "mean_ms": total / count * 1000, "max_ms": peak * 1000}
+                for name, (count, total, peak) in sorted(stages.items(), key=lambda item: -item[1][1])}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class SamplingProfiler:
+    def __init__(self, name, directory=PROFILE_DIR, interval=DEFAULT_INTERVAL):
+        self.name = name
+        self.directory = directory
+        self.interval = interval
+        self.thread = None
+        self.last_result = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    # Start a profile of `seconds` in the background; returns the output path
+    def start(self, seconds=DEFAULT_SECONDS):
+        seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+        with self.lock:
+            if self.running:
+                raise ProfilerBusy("A profile is already running")
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{self.name}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+            self.thread = threading.Thread(target=self._run, args=(seconds, path), name="sampling-profiler",
+                                           daemon=True)
+            self.thread.start()
+        logger.info(f"Sampling all threads for {seconds:.1f} s into {path}")
+        return path
+
+    def _run(self, seconds, path):
+        own = threading.get_ident()
+        counts = {}
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            samples += 1
+            time.sleep(self.interval)
+        elapsed = time.perf_counter() - started
+
+        with open(path, "w") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        self.last_result = {"path": path, "seconds": round(elapsed, 2), "samples": samples,
+                            "rate_hz": round(samples / elapsed, 1), "stacks": len(counts)}
+        logger.info(f"Profile written to {path}: {samples} samples at {self.last_result['rate_hz']} Hz")
+
+    def status(self):
+        return {"running": self.running, "directory": self.directory, "last": self.last_result}
+
+
+# Start a profile whenever the process receives `signum`; must be called from the main thread
+def install_signal_handler(profiler, signum=getattr(signal, "SIGUSR1", None), seconds=DEFAULT_SECONDS):
+    if signum is None:
+        return False
+
+    # The handler runs between bytecodes of the main thread, so it only starts the sampler thread
+    def handle(signum, frame):
+        try:
+            profiler.start(seconds)
+        except ProfilerBusy:
+            logger.warning("Profile requested while one is already running, ignored")
+
+    signal.signal(signum, handle)
+    logger.info(f"Send {signal.Signals(signum).name} to pid {os.getpid()} for a {seconds:.0f} s profile")
+    return True
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+from pymavlink import mavutil
+
+logger = logging.getLogger(__name__)
+
+# Fixed-rate body-frame velocity setpoints while a gesture is held.
+#
+# One-shot goto targets make the autopilot plan a path and converge on it,
+# and a new gesture has to wait for that. Instead, the gesture loop calls
+# hold(forward, right, down, yaw_rate) on every frame the gesture is seen, and
+# a background thread sends the latest velocity as
+# SET_POSITION_TARGET_LOCAL_NED at rate_hz. The vehicle reacts to a new
+# gesture within one setpoint period. When the gesture has not been seen for
+# hold_timeout, one zero setpoint is sent (the vehicle brakes and holds) and
+# streaming pauses until the next hold().
+#
+# Velocities are m/s in the body frame (forward, right, down), yaw rate is
+# rad/s. ArduCopter drops a velocity setpoint after 3 s without a refresh,
+# so the stream also covers hold times longer than that.
+
+# Use vx, vy, vz and yaw rate; ignore position, acceleration and yaw
+VELOCITY_MASK = 0b0000010111000111
+
+
+class SetpointStreamer:
+    def __init__(self, send, rate_hz=10.0, hold_timeout=0.3):
+        self.send = send
+        self.period = 1.0 / rate_hz
+        self.hold_timeout = hold_timeout
+        self.velocity = (0.0, 0.0, 0.0, 0.0)
+        self.held_until = 0.0
+        self.streaming = False
+        self.sent = 0
+        self.wake = threading.Event()
+        self.running = True
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._loop, name="setpoints", daemon=True)
+        self.thread.start()
+
+    def hold(self, forward=0.0, right=0.0, down=0.0, yaw_rate=0.0):
+        with self.lock:
+            changed = (forward, right, down, yaw_rate) != self.velocity
+            self.velocity = (forward, right, down, yaw_rate)
+            self.held_until = time.monotonic() + self.hold_timeout
+        # A new velocity goes out right away instead of at the next tick
+        if changed or not self.streaming:
+            self.wake.set()
+
+    # Stop now instead of after hold_timeout
+    def release(self):
+        with self.lock:
+            self.held_until = 0.0
+        self.wake.set()
+
+    def _loop(self):
+        while self.running:
+            with self.lock:
+                velocity = self.velocity
+                held = time.monotonic() < self.held_until
+            if held:
+                self.streaming = True
+                self._send(*velocity)
+            elif self.streaming:
+                self.streaming = False
+                self._send(0.0, 0.0, 0.0, 0.0)
+            # Sleep a full period while streaming, until the next hold() while idle
+            self.wake.wait(self.period if held else None)
+            self.wake.clear()
+
+    def _send(self, forward, right, down, yaw_rate):
+        try:
+            self.send(forward, right, down, yaw_rate)
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Sending velocity setpoint failed: {e}")
+
+    def stats(self):
+        return {"streaming": self.streaming, "velocity": self.velocity, "sent": self.sent,
+                "rate_hz": round(1.0 / self.period, 1)}
+
+    def close(self):
+        self.running = False
+        self.release()
+        self.thread.join(timeout=1.0)
+
+
+# Sender for a MavlinkVehicle (vehicle.py); shares its send lock with the
+# vehicle's own commands
+def mavlink_sender(vehicle):
+    def send(forward, right, down, yaw_rate):
+        master = vehicle.master
+        with vehicle.send_lock:
+            master.mav.set_position_target_local_ned_send(
+                0, master.target_system, master.target_component,
+                mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED, VELOCITY_MASK,
+                0, 0, 0, forward, right, down, 0, 0, 0, 0, yaw_rate)
+    return send
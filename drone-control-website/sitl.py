@@ -0,0 +1,311 @@
+import argparse
+import logging
+import math
+import threading
+import time
+
+from pymavlink import mavutil
+
+# Lightweight local MAVLink vehicle simulator.
+#
+# Stands in for a real autopilot (or ArduPilot SITL) so the control stack can
+# be run, tested and benchmarked without a vehicle or network. It speaks
+# enough ArduCopter-flavoured MAVLink for MavlinkVehicle, as used by app.py
+# and hand_gesture_drone.py, and for ground stations or DroneKit scripts:
+#   - HEARTBEAT, GLOBAL_POSITION_INT, ATTITUDE, SYS_STATUS, GPS_RAW_INT,
+#     VFR_HUD, RADIO_STATUS streams; rates follow SET_MESSAGE_INTERVAL
+#   - arm/disarm, takeoff, SET_MODE (GUIDED/LAND/LOITER/...), guided goto
+#     (MISSION_ITEM current=2 or SET_POSITION_TARGET_GLOBAL_INT)
+#   - velocity setpoints (SET_POSITION_TARGET_LOCAL_NED) and MANUAL_CONTROL
+#   - a handful of parameters so dronekit's wait_ready completes
+#
+# Usage: python sitl.py [--address udpout:127.0.0.1:14550]
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+mavlink = mavutil.mavlink
+
+EARTH_RADIUS = 6378137.0
+
+# ArduCopter custom modes
+MODES = {"STABILIZE": 0, "ALT_HOLD": 2, "AUTO": 3, "GUIDED": 4, "LOITER": 5, "RTL": 6, "LAND": 9}
+
+# Default stream rates in Hz before any SET_MESSAGE_INTERVAL
+DEFAULT_RATES = {
+    "HEARTBEAT": 1,
+    "GLOBAL_POSITION_INT": 4,
+    "ATTITUDE": 4,
+    "SYS_STATUS": 1,
+    "GPS_RAW_INT": 1,
+    "VFR_HUD": 2,
+    "RADIO_STATUS": 1,
+}
+
+PARAMS = {"SYSID_THISMAV": 1.0, "WPNAV_SPEED": 500.0, "PILOT_SPEED_UP": 250.0, "LAND_SPEED": 50.0}
+
+CLIMB_RATE = 2.5    # m/s
+LAND_RATE = 1.0     # m/s
+GOTO_SPEED = 5.0    # m/s
+STICK_SPEED = 5.0   # m/s at full stick
+SETPOINT_TIMEOUT = 1.0
+
+
+class MavlinkSimulator:
+    def __init__(self, address="udpout:127.0.0.1:14550", home=(51.5074, -0.1278), rate_hz=50.0):
+        self.address = address
+        self.home = home
+        self.rate_hz = rate_hz
+        self.conn = None
+        self.running = False
+        self.thread = None
+
+        self.lat, self.lon = home
+        self.alt = 0.0
+        self.vn = self.ve = self.vd = 0.0
+        self.yaw = 0.0
+        self.yaw_rate = 0.0
+        self.armed = False
+        self.mode = "STABILIZE"
+        self.battery = 100.0
+        self.takeoff_alt = None
+        self.goto = None
+        self.velocity_setpoint = None  # (vn, ve, vd, timestamp)
+        self.params = dict(PARAMS)
+
+        self.names = {getattr(mavlink, f"MAVLINK_MSG_ID_{name}"): name for name in DEFAULT_RATES}
+        self.intervals = {name: 1.0 / hz for name, hz in DEFAULT_RATES.items()}
+        self.next_send = {name: 0.0 for name in DEFAULT_RATES}
+        self.started = time.monotonic()
+
+    def start(self):
+        self.conn = mavutil.mavlink_connection(self.address, source_system=1, source_component=1)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="sitl", daemon=True)
+        self.thread.start()
+        logger.info(f"MAVLink simulator running on {self.address}")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        if self.conn:
+            self.conn.close()
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        last = time.monotonic()
+        while self.running:
+            while True:
+                msg = self.conn.recv_match(blocking=False)
+                if msg is None:
+                    break
+                self._handle(msg)
+            now = time.monotonic()
+            self._step(now - last)
+            last = now
+            self._send_streams(now)
+            time.sleep(max(0.0, period - (time.monotonic() - now)))
+
+    # ----------------------------------------------------------------------
+    # Physics
+    # ----------------------------------------------------------------------
+    def _step(self, dt):
+        vn = ve = vd = 0.0
+        if self.armed:
+            if self.mode == "LAND":
+                vd = LAND_RATE
+            elif self.takeoff_alt is not None and self.alt < self.takeoff_alt:
+                vd = -CLIMB_RATE
+            elif self.velocity_setpoint and time.monotonic() - self.velocity_setpoint[3] < SETPOINT_TIMEOUT:
+                vn, ve, vd = self.velocity_setpoint[:3]
+            elif self.goto is not None:
+                lat, lon, alt = self.goto
+                dn = math.radians(lat - self.lat) * EARTH_RADIUS
+                de = math.radians(lon - self.lon) * EARTH_RADIUS * math.cos(math.radians(self.lat))
+                dd = self.alt - alt
+                dist = math.sqrt(dn * dn + de * de + dd * dd)
+                if dist > 0.1:
+                    speed = min(GOTO_SPEED, dist / max(dt, 1e-3))
+                    vn, ve, vd = dn / dist * speed, de / dist * speed, dd / dist * speed
+
+        self.vn, self.ve, self.vd = vn, ve, vd
+        self.lat += math.degrees(vn * dt / EARTH_RADIUS)
+        self.lon += math.degrees(ve * dt / (EARTH_RADIUS * math.cos(math.radians(self.lat))))
+        self.alt = max(0.0, self.alt - vd * dt)
+        self.yaw = (self.yaw + self.yaw_rate * dt) % (2 * math.pi)
+
+        if self.takeoff_alt is not None and self.alt >= self.takeoff_alt:
+            self.takeoff_alt = None
+        if self.armed:
+            speed = math.sqrt(vn * vn + ve * ve + vd * vd)
+            self.battery = max(0.0, self.battery - dt * (0.02 + 0.01 * speed))
+            if self.mode == "LAND" and self.alt <= 0.0:
+                logger.info("Landed, disarming")
+                self.armed = False
+                self.next_send["HEARTBEAT"] = 0.0
+
+    # ----------------------------------------------------------------------
+    # Incoming messages
+    # ----------------------------------------------------------------------
+    def _ack(self, command, result=mavlink.MAV_RESULT_ACCEPTED):
+        self.conn.mav.command_ack_send(command, result)
+
+    def _handle(self, msg):
+        msg_type = msg.get_type()
+        if msg_type == "COMMAND_LONG":
+            self._handle_command(msg)
+        elif msg_type == "SET_MODE":
+            self._set_mode(msg.custom_mode)
+        elif msg_type == "MANUAL_CONTROL" and self.armed:
+            c, s = math.cos(self.yaw), math.sin(self.yaw)
+            forward, right = msg.x / 1000 * STICK_SPEED, msg.y / 1000 * STICK_SPEED
+            climb = (msg.z - 500) / 500 * CLIMB_RATE
+            self.velocity_setpoint = (forward * c - right * s, forward * s + right * c, -climb,
+                                      time.monotonic())
+            self.yaw_rate = math.radians(msg.r / 1000 * 90)
+        elif msg_type == "SET_POSITION_TARGET_LOCAL_NED":
+            vx, vy, vz = msg.vx, msg.vy, msg.vz
+            if msg.coordinate_frame in (mavlink.MAV_FRAME_BODY_NED, mavlink.MAV_FRAME_BODY_OFFSET_NED):
+                c, s = math.cos(self.yaw), math.sin(self.yaw)
+                vx, vy = vx * c - vy * s, vx * s + vy * c
+            self.velocity_setpoint = (vx, vy, vz, time.monotonic())
+            self.yaw_rate = msg.yaw_rate if not msg.type_mask & 0x800 else 0.0
+        elif msg_type == "SET_POSITION_TARGET_GLOBAL_INT":
+            self.goto = (msg.lat_int / 1e7, msg.lon_int / 1e7, msg.alt)
+        elif msg_type in ("MISSION_ITEM", "MISSION_ITEM_INT") and msg.current == 2:
+            # Guided-mode goto, as sent by dronekit's simple_goto
+            scale = 1e7 if msg_type == "MISSION_ITEM_INT" else 1.0
+            self.goto = (msg.x / scale, msg.y / scale, msg.z)
+            self.velocity_setpoint = None
+            self.conn.mav.mission_ack_send(msg.get_srcSystem(), msg.get_srcComponent(),
+                                           mavlink.MAV_MISSION_ACCEPTED)
+        elif msg_type == "PARAM_REQUEST_LIST":
+            for index, name in enumerate(self.params):
+                self._send_param(name, index)
+        elif msg_type == "PARAM_REQUEST_READ":
+            name = msg.param_id if msg.param_index < 0 else list(self.params)[msg.param_index]
+            if name in self.params:
+                self._send_param(name, list(self.params).index(name))
+        elif msg_type == "PARAM_SET":
+            self.params[msg.param_id] = msg.param_value
+            self._send_param(msg.param_id, list(self.params).index(msg.param_id))
+
+    def _handle_command(self, msg):
+        command = msg.command
+        if command == mavlink.MAV_CMD_COMPONENT_ARM_DISARM:
+            self.armed = msg.param1 == 1
+            if not self.armed:
+                self.takeoff_alt = self.goto = self.velocity_setpoint = None
+            logger.info("Armed" if self.armed else "Disarmed")
+            self._ack(command)
+            self.next_send["HEARTBEAT"] = 0.0  # Report the new state right away
+        elif command == mavlink.MAV_CMD_NAV_TAKEOFF:
+            if not self.armed or self.mode != "GUIDED":
+                self._ack(command, mavlink.MAV_RESULT_DENIED)
+                return
+            self.takeoff_alt = msg.param7
+            self.goto = (self.lat, self.lon, msg.param7)
+            self._ack(command)
+        elif command == mavlink.MAV_CMD_NAV_LAND:
+            self.mode = "LAND"
+            self._ack(command)
+        elif command == mavlink.MAV_CMD_DO_SET_MODE:
+            self._set_mode(int(msg.param2))
+            self._ack(command)
+        elif command == mavlink.MAV_CMD_SET_MESSAGE_INTERVAL:
+            name = self.names.get(int(msg.param1))
+            if name is None:
+                self._ack(command, mavlink.MAV_RESULT_UNSUPPORTED)
+                return
+            interval_us = msg.param2
+            if interval_us < 0:
+                self.intervals[name] = None
+            elif interval_us == 0:
+                self.intervals[name] = 1.0 / DEFAULT_RATES[name]
+            else:
+                self.intervals[name] = interval_us / 1e6
+            self._ack(command)
+        else:
+            self._ack(command, mavlink.MAV_RESULT_UNSUPPORTED)
+
+    def _set_mode(self, custom_mode):
+        for name, number in MODES.items():
+            if number == custom_mode:
+                self.mode = name
+                if name != "GUIDED":
+                    self.goto = self.velocity_setpoint = None
+                logger.info(f"Mode {name}")
+                self.next_send["HEARTBEAT"] = 0.0
+                return
+
+    def _send_param(self, name, index):
+        self.conn.mav.param_value_send(name.encode(), self.params[name],
+                                       mavlink.MAV_PARAM_TYPE_REAL32, len(self.params), index)
+
+    # ----------------------------------------------------------------------
+    # Outgoing streams
+    # ----------------------------------------------------------------------
+    def _send_streams(self, now):
+        for name, interval in self.intervals.items():
+            if interval is None or now < self.next_send[name]:
+                continue
+            # Keep the schedule on its own grid so rates are not quantised down by the loop period
+            self.next_send[name] = max(self.next_send[name] + interval, now - interval)
+            getattr(self, f"_send_{name.lower()}")(now)
+
+    def _send_heartbeat(self, now):
+        base_mode = mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED
+        if self.armed:
+            base_mode |= mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+        status = mavlink.MAV_STATE_ACTIVE if self.armed else mavlink.MAV_STATE_STANDBY
+        self.conn.mav.heartbeat_send(mavlink.MAV_TYPE_QUADROTOR, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                     base_mode, MODES[self.mode], status)
+
+    def _boot_ms(self, now):
+        return int((now - self.started) * 1000) & 0xFFFFFFFF
+
+    def _send_global_position_int(self, now):
+        self.conn.mav.global_position_int_send(
+            self._boot_ms(now), int(self.lat * 1e7), int(self.lon * 1e7),
+            int(self.alt * 1000), int(self.alt * 1000),
+            int(self.vn * 100), int(self.ve * 100), int(self.vd * 100),
+            int(math.degrees(self.yaw) * 100) % 36000)
+
+    def _send_attitude(self, now):
+        self.conn.mav.attitude_send(self._boot_ms(now), 0.0, 0.0, self.yaw, 0.0, 0.0, self.yaw_rate)
+
+    def _send_sys_status(self, now):
+        sensors = 0
+        self.conn.mav.sys_status_send(sensors, sensors, sensors, 250, 12600, -1,
+                                      int(self.battery), 0, 0, 0, 0, 0, 0)
+
+    def _send_gps_raw_int(self, now):
+        self.conn.mav.gps_raw_int_send(int((now - self.started) * 1e6), 3, int(self.lat * 1e7),
+                                       int(self.lon * 1e7), int(self.alt * 1000), 100, 100,
+                                       0, 0, 10)
+
+    def _send_vfr_hud(self, now):
+        speed = math.sqrt(self.vn ** 2 + self.ve ** 2)
+        self.conn.mav.vfr_hud_send(speed, speed, int(math.degrees(self.yaw)) % 360,
+                                   50 if self.armed else 0, self.alt, -self.vd)
+
+    def _send_radio_status(self, now):
+        self.conn.mav.radio_status_send(230, 230, 100, 0, 0, 0, 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local MAVLink vehicle simulator")
+    parser.add_argument("--address", default="udpout:127.0.0.1:14550",
+                        help="pymavlink address the simulator sends to")
+    parser.add_argument("--home", default="51.5074,-0.1278", help="home position as lat,lon")
+    args = parser.parse_args()
+
+    lat, lon = (float(v) for v in args.home.split(","))
+    simulator = MavlinkSimulator(args.address, (lat, lon))
+    simulator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
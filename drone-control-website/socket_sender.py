@@ -0,0 +1,191 @@
+import collections
+import itertools
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Non-blocking Socket.IO client for the AI worker (drone.py).
+#
+# The capture loop only ever calls send(), which puts the payload in a small
+# bounded queue per event and returns. A sender thread emits from the queues,
+# and a connect thread (re)connects with exponential backoff, so a stalled or
+# dropped link never stalls inference.
+#
+# Every emit asks for an ack, and each event has a window of unacked emits;
+# while the window is full new payloads wait in the queue, where
+#   - the oldest is dropped when the queue is full (frames, landmarks: only
+#     the newest one matters)
+#   - a payload with the same coalesce key as the newest queued one replaces
+#     it (a held gesture resends the same command every frame)
+# so on a slow link the send rate falls to what the link carries instead of
+# the Socket.IO transport buffering seconds of frames. Unacked emits are
+# written off after ack_timeout. Nothing is queued while disconnected.
+
+
+class Channel:
+    def __init__(self, event, maxlen=1, window=1, coalesce=None):
+        self.event = event
+        self.queue = collections.deque(maxlen=maxlen)
+        self.window = window
+        self.coalesce = coalesce  # callable(payload) -> key, or None
+        self.in_flight = {}  # token -> send time
+        self.counts = {"sent": 0, "acked": 0, "dropped": 0, "coalesced": 0, "offline": 0, "timeouts": 0}
+
+
+class SocketSender:
+    def __init__(self, url, ack_timeout=2.0, backoff=(0.5, 30.0), **connect_kwargs):
+        self.url = url
+        self.connect_kwargs = connect_kwargs
+        self.ack_timeout = ack_timeout
+        self.backoff = backoff
+        self.sio = None
+        self.channels = {}
+        self.handlers = []
+        self.connect_callbacks = []
+        self.tokens = itertools.count()
+        self.cond = threading.Condition()
+        self.connected = threading.Event()
+        self.link_lost = threading.Event()
+        self.stopping = threading.Event()
+        self.reconnects = 0
+
+    def channel(self, event, maxlen=1, window=1, coalesce=None):
+        self.channels[event] = Channel(event, maxlen, window, coalesce)
+
+    # Register a server event handler; call before start()
+    def on(self, event, handler):
+        self.handlers.append((event, handler))
+
+    # Run after every (re)connect on the connect thread, e.g. a clock sync
+    def on_connect(self, callback):
+        self.connect_callbacks.append(callback)
+
+    def start(self):
+        import socketio
+        self.sio = socketio.Client(reconnection=False)
+        for event, handler in self.handlers:
+            self.sio.on(event, handler)
+        self.sio.on('disconnect', self._on_disconnect)
+        threading.Thread(target=self._connect_loop, name="socket connect", daemon=True).start()
+        threading.Thread(target=self._send_loop, name="socket send", daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+        self.link_lost.set()
+        with self.cond:
+            self.cond.notify()
+        if self.sio is not None and self.connected.is_set():
+            self.sio.disconnect()
+
+    # Queue a payload for event; never blocks
+    def send(self, event, payload):
+        channel = self.channels[event]
+        with self.cond:
+            if not self.connected.is_set():
+                channel.counts["offline"] += 1
+                return False
+            queue = channel.queue
+            if queue and channel.coalesce is not None and channel.coalesce(queue[-1]) == channel.coalesce(payload):
+                queue[-1] = payload
+                channel.counts["coalesced"] += 1
+            else:
+                if len(queue) == queue.maxlen:
+                    channel.counts["dropped"] += 1
+                queue.append(payload)
+            self.cond.notify()
+        return True
+
+    # Blocking request/response, for the connect callbacks
+    def call(self, event, data, timeout=2):
+        return self.sio.call(event, data, timeout=timeout)
+
+    def _on_disconnect(self, *args):
+        logger.warning("Lost connection to the server")
+        with self.cond:
+            self.connected.clear()
+            for channel in self.channels.values():
+                channel.queue.clear()
+                channel.in_flight.clear()
+        self.link_lost.set()
+
+    def _connect_loop(self):
+        delay = self.backoff[0]
+        while not self.stopping.is_set():
+            try:
+                self.sio.connect(self.url, **self.connect_kwargs)
+            except Exception as e:
+                # Jittered so a fleet of workers does not retry in lockstep
+                wait = delay * random.uniform(0.8, 1.2)
+                logger.warning(f"WebSocket connect failed: {e}, retrying in {wait:.1f} s")
+                self.stopping.wait(wait)
+                delay = min(delay * 2, self.backoff[1])
+                continue
+            delay = self.backoff[0]
+            self.link_lost.clear()
+            for callback in self.connect_callbacks:
+                callback()
+            with self.cond:
+                self.connected.set()
+                self.cond.notify()
+            logger.info(f"Connected to {self.url}")
+            self.link_lost.wait()
+            if not self.stopping.is_set():
+                self.reconnects += 1
+                # A stale engine.io session can survive the disconnect event
+                try:
+                    self.sio.disconnect()
+                except Exception:
+                    pass
+
+    # Payloads that can go now, respecting each channel's ack window
+    def _due(self):
+        now = time.monotonic()
+        due = []
+        for channel in self.channels.values():
+            for token, sent in list(channel.in_flight.items()):
+                if now - sent > self.ack_timeout:
+                    del channel.in_flight[token]
+                    channel.counts["timeouts"] += 1
+            while channel.queue and len(channel.in_flight) < channel.window:
+                token = next(self.tokens)
+                channel.in_flight[token] = now
+                due.append((channel, token, channel.queue.popleft()))
+        return due
+
+    def _send_loop(self):
+        while not self.stopping.is_set():
+            with self.cond:
+                due = self._due() if self.connected.is_set() else []
+                if not due:
+                    # Woken by send()/connect, or wakes to expire unacked emits
+                    self.cond.wait(0.1)
+                    continue
+            for channel, token, payload in due:
+                try:
+                    self.sio.emit(channel.event, payload, callback=self._ack_callback(channel, token))
+                    channel.counts["sent"] += 1
+                except Exception as e:
+                    logger.warning(f"Emit '{channel.event}' failed: {e}")
+                    with self.cond:
+                        channel.in_flight.pop(token, None)
+                        channel.counts["dropped"] += 1
+
+    def _ack_callback(self, channel, token):
+        def acked(*args):
+            with self.cond:
+                if channel.in_flight.pop(token, None) is not None:
+                    channel.counts["acked"] += 1
+                    self.cond.notify()
+        return acked
+
+    def stats(self):
+        with self.cond:
+            return {
+                "connected": self.connected.is_set(),
+                "reconnects": self.reconnects,
+                "events": {event: dict(channel.counts, queued=len(channel.queue), in_flight=len(channel.in_flight))
+                           for event, channel in self.channels.items()},
+            }
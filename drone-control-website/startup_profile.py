@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# Records how long each startup phase (imports, model build, camera open,
+# socket connect, ...) takes and when milestones such as the first command
+# are reached. Phases may run concurrently on different threads.
+class StartupProfile:
+    def __init__(self, enabled=False, start=None):
+        self.enabled = enabled
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = []
+        self.milestones = {}
+        self.lock = threading.Lock()
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.phases.append((name, threading.current_thread().name,
+                                    begin - self.start, end - begin))
+
+    def mark(self, name):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.milestones.setdefault(name, time.perf_counter() - self.start)
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        with self.lock:
+            phases = sorted(self.phases, key=lambda p: p[2])
+            milestones = sorted(self.milestones.items(), key=lambda m: m[1])
+        lines = ["Startup profile (ms since process start):"]
+        for name, thread, offset, duration in phases:
+            lines.append(f"  {name:<24} start {offset * 1000:8.1f}  took {duration * 1000:8.1f}  [{thread}]")
+        for name, offset in milestones:
+            lines.append(f"  * {name:<22} at    {offset * 1000:8.1f}")
+        logger.info("\n".join(lines))
@@ -20,6 +20,17 @@ let connectionCheckInterval;
 let videoCheckInterval;
 let videoRetryCount = 0;
 const MAX_VIDEO_RETRIES = 5;
+// Telemetry tier requested from the server ('pilot' = 20 Hz, 'dashboard' = 2 Hz)
+const TELEMETRY_TIER = 'pilot';
+let lastTelemetryPosition = null;
+// Vehicle this page flies and watches; null until the server sends the fleet
+let currentVehicle = null;
+// Joystick input is sent at the server control loop rate, latest value wins
+const CONTROL_SEND_INTERVAL_MS = 20;
+const pendingJoystick = {};
+const heldJoystick = {};  // deflected sticks, with when they were last sent
+const CONTROL_REFRESH_MS = 250;
+let clockOffset = 0;  // server clock minus local clock, in ms
 
 // Call setupFullscreenListeners in the init function
 function init() {
@@ -59,17 +70,21 @@ function init() {
     // Set up mode switch
     setupModeSwitch();    
 
+    // Set up vehicle picker
+    setupVehicleSelect();
+
     // Add touch-device class to body if it's a touch device
     if (isTouchDevice) {
         document.body.classList.add('touch-device');
         // Initialize joysticks only for touch devices
         setupJoystick('left-joystick', (x, y) => {
-            socket.emit('control', { type: 'left-joystick', x, y });
+            queueJoystick('left-joystick', x, y);
         }, { selfCenterX: true, selfCenterY: false });
 
         setupJoystick('right-joystick', (x, y) => {
-            socket.emit('control', { type: 'right-joystick', x, y });
+            queueJoystick('right-joystick', x, y);
         }, { selfCenterX: true, selfCenterY: true });
+        setInterval(flushJoysticks, CONTROL_SEND_INTERVAL_MS);
     } else {
         // Hide joystick container explicitly
         document.getElementById('joystick-container').style.display = 'none';
@@ -95,6 +110,62 @@ function init() {
     handleModeSwitch();
 }
 
+// Current time on the server clock, used to stamp control inputs
+function serverNow() {
+    return Date.now() + clockOffset;
+}
+
+// Estimate the clock offset from the lowest round-trip of a few pings
+function syncClock(samples = 5) {
+    let best = null;
+    let remaining = samples;
+    function ping() {
+        const sent = Date.now();
+        socket.emit('clock_sync', sent, (serverMs) => {
+            const received = Date.now();
+            const rtt = received - sent;
+            if (best === null || rtt < best.rtt) {
+                best = { rtt, offset: serverMs + rtt / 2 - received };
+            }
+            if (--remaining > 0) {
+                ping();
+            } else {
+                clockOffset = best.offset;
+                console.log(`Clock offset ${clockOffset.toFixed(1)} ms (rtt ${best.rtt} ms)`);
+            }
+        });
+    }
+    ping();
+}
+
+// Remember only the latest position of each joystick
+function queueJoystick(type, x, y) {
+    pendingJoystick[type] = { x, y };
+}
+
+// Send the latest joystick positions that changed since the last flush, and
+// resend deflected sticks every CONTROL_REFRESH_MS: the server zeroes axes
+// that are not refreshed within a second
+function flushJoysticks() {
+    const now = Date.now();
+    for (const type of Object.keys(heldJoystick)) {
+        const held = heldJoystick[type];
+        if (!(type in pendingJoystick) && now - held.sent >= CONTROL_REFRESH_MS) {
+            pendingJoystick[type] = { x: held.x, y: held.y };
+        }
+    }
+    for (const type of Object.keys(pendingJoystick)) {
+        const { x, y } = pendingJoystick[type];
+        delete pendingJoystick[type];
+        socket.emit('control', { type, x, y, t: serverNow() });
+        if (x || y) {
+            heldJoystick[type] = { x, y, sent: now };
+        } else {
+            delete heldJoystick[type];
+        }
+    }
+}
+
 function getFastAPIUrl() {
     // Try to get the fastapiUrl from the global scope if it exists
     if (typeof fastapiUrl !== 'undefined' && fastapiUrl) {
@@ -236,9 +307,27 @@ function showStatusMessage(message) {
     }
 }
 
+// Axis keys being held; auto-repeat only repeats the last key pressed, so
+// they are resent on a timer to keep the server from expiring them
+const AXIS_KEY_CODES = new Set(['throttle_up', 'throttle_down', 'yaw_left', 'yaw_right',
+    'pitch_forward', 'pitch_backward', 'roll_left', 'roll_right']);
+const heldKeys = new Set();
+
 function setupKeyboardControls() {
     document.addEventListener('keydown', handleKeyDown);
     document.addEventListener('keyup', handleKeyUp);
+    setInterval(() => {
+        for (const code of heldKeys) {
+            socket.emit('control', { type: 'keyboard', code, t: serverNow() });
+        }
+    }, CONTROL_REFRESH_MS);
+    // Keys released while the page had no focus never send keyup
+    window.addEventListener('blur', () => {
+        for (const code of heldKeys) {
+            socket.emit('control', { type: 'keyboard', code: 'stop_' + code, t: serverNow() });
+        }
+        heldKeys.clear();
+    });
 }
 
 function handleKeyDown(e) {
@@ -269,7 +358,8 @@ function handleKeyDown(e) {
     if (keyActions[key]) {
         activeCommands.add(keyActions[key].cmd);
         updateCommandDisplay();
-        socket.emit('control', { type: 'keyboard', code: keyActions[key].code });
+        if (AXIS_KEY_CODES.has(keyActions[key].code)) heldKeys.add(keyActions[key].code);
+        socket.emit('control', { type: 'keyboard', code: keyActions[key].code, t: serverNow() });
         e.preventDefault();
     }
 }
@@ -295,8 +385,9 @@ function handleKeyUp(e) {
     if (keyActions[key]) {
         activeCommands.delete(keyActions[key].cmd);
         updateCommandDisplay();
+        heldKeys.delete(keyActions[key].code);
         // Optionally send a 'stop' command for this control
-        socket.emit('control', { type: 'keyboard', code: 'stop_' + keyActions[key].code });
+        socket.emit('control', { type: 'keyboard', code: 'stop_' + keyActions[key].code, t: serverNow() });
     }
 }
 
@@ -417,8 +508,19 @@ function setupJoystick(id, callback, options = { selfCenterX: true, selfCenterY:
 }
 
 function setupSocketHandlers() {
-    // Listen for telemetry updates
-    socket.on('telemetry', updateTelemetry);
+    // Listen for telemetry updates (binary tiers and the legacy JSON event),
+    // ignoring stragglers from a vehicle we just switched away from
+    socket.on('telemetry_bin', (buffer, vehicleId) => {
+        if (!isCurrentVehicle(vehicleId)) return;
+        const data = decodeTelemetry(buffer);
+        if (data) updateTelemetry(data);
+    });
+    socket.on('telemetry', (data) => {
+        if (isCurrentVehicle(data.vehicle_id)) updateTelemetry(data);
+    });
+
+    // Fleet list, sent on connect
+    socket.on('vehicles', updateVehicleList);
     
     // Listen for arm/disarm status
     socket.on('arm', updateArmStatus);
@@ -426,11 +528,132 @@ function setupSocketHandlers() {
     // Listen for status messages
     socket.on('status', showStatusMessage);
     
+    // AI worker output: landmark packets drawn over the video, JPEG frames as attachments
+    socket.on('ai_landmarks', (buffer) => drawLandmarks(decodeLandmarks(buffer)));
+    socket.on('ai_frame', showAIFrame);
+
     // Handle connection events
     socket.on('connect', handleConnect);
     socket.on('disconnect', handleDisconnect);
 }
 
+// Decode a binary telemetry packet (see telemetry_codec.py for the layout)
+function decodeTelemetry(buffer) {
+    const view = new DataView(buffer);
+    const flags = view.getUint8(1);
+    const armed = (flags & 0x01) !== 0;
+    let lat, lon, alt, battery, signal;
+
+    if (flags & 0x02) {
+        // Delta packet: int16 offsets from the previous position
+        if (!lastTelemetryPosition) return null;  // Wait for a keyframe
+        lat = lastTelemetryPosition.lat + view.getInt16(8, true);
+        lon = lastTelemetryPosition.lon + view.getInt16(10, true);
+        alt = lastTelemetryPosition.alt + view.getInt16(12, true);
+        battery = view.getUint8(14);
+        signal = view.getUint8(15);
+    } else {
+        lat = view.getInt32(8, true);
+        lon = view.getInt32(12, true);
+        alt = view.getInt32(16, true);
+        battery = view.getUint8(20);
+        signal = view.getUint8(21);
+    }
+    lastTelemetryPosition = { lat, lon, alt };
+
+    return {
+        seq: view.getUint16(2, true),
+        lat: lat / 1e7,
+        lon: lon / 1e7,
+        alt: alt / 100,
+        armed,
+        battery,
+        signal
+    };
+}
+
+// Decode a binary hand landmark packet (see landmark_codec.py for the layout)
+const LANDMARK_COMMANDS = ['down', 'land', 'left', 'right', 'stable', 'up', 'yaw_x', 'yaw_y'];
+
+function decodeLandmarks(buffer) {
+    const view = new DataView(buffer);
+    const count = view.getUint8(9);
+    const hands = [];
+    let offset = 10;
+    for (let h = 0; h < count; h++) {
+        const points = [];
+        for (let i = 0; i < 21; i++, offset += 4) {
+            points.push([view.getUint16(offset, true) / 65535, view.getUint16(offset + 2, true) / 65535]);
+        }
+        hands.push(points);
+    }
+    const code = view.getUint8(8);
+    return {
+        seq: view.getUint16(2, true),
+        t: view.getUint32(4, true),
+        mirrored: (view.getUint8(1) & 0x01) !== 0,
+        command: code < LANDMARK_COMMANDS.length ? LANDMARK_COMMANDS[code] : null,
+        hands
+    };
+}
+
+// MediaPipe hand skeleton
+const HAND_CONNECTIONS = [
+    [0, 1], [1, 2], [2, 3], [3, 4],
+    [0, 5], [5, 6], [6, 7], [7, 8],
+    [5, 9], [9, 10], [10, 11], [11, 12],
+    [9, 13], [13, 14], [14, 15], [15, 16],
+    [13, 17], [0, 17], [17, 18], [18, 19], [19, 20]
+];
+let landmarkClearTimer = null;
+
+function drawLandmarks(packet) {
+    const canvas = document.getElementById('landmark-overlay');
+    if (!canvas) return;
+    const width = canvas.clientWidth, height = canvas.clientHeight;
+    if (canvas.width !== width || canvas.height !== height) {
+        canvas.width = width;
+        canvas.height = height;
+    }
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, width, height);
+
+    ctx.strokeStyle = '#00ff00';
+    ctx.fillStyle = '#ff3333';
+    ctx.lineWidth = 2;
+    for (const points of packet.hands) {
+        const xy = points.map(([x, y]) => [x * width, y * height]);
+        ctx.beginPath();
+        for (const [a, b] of HAND_CONNECTIONS) {
+            ctx.moveTo(xy[a][0], xy[a][1]);
+            ctx.lineTo(xy[b][0], xy[b][1]);
+        }
+        ctx.stroke();
+        for (const [x, y] of xy) {
+            ctx.fillRect(x - 2, y - 2, 4, 4);
+        }
+    }
+    if (packet.command) {
+        ctx.font = 'bold 20px sans-serif';
+        ctx.fillStyle = '#ffffff';
+        ctx.fillText(packet.command.toUpperCase(), 12, 28);
+    }
+
+    // Clear the overlay when the worker stops sending
+    clearTimeout(landmarkClearTimer);
+    landmarkClearTimer = setTimeout(() => ctx.clearRect(0, 0, canvas.width, canvas.height), 500);
+}
+
+let aiFrameUrl = null;
+
+function showAIFrame(jpeg) {
+    const videoStream = document.getElementById('videoStream');
+    if (!videoStream) return;
+    if (aiFrameUrl) URL.revokeObjectURL(aiFrameUrl);
+    aiFrameUrl = URL.createObjectURL(new Blob([jpeg], { type: 'image/jpeg' }));
+    videoStream.src = aiFrameUrl;
+}
+
 function updateTelemetry(data) {
     // Update telemetry display with data from server
     document.getElementById('lat-value').textContent = data.lat.toFixed(6);
@@ -456,8 +679,52 @@ function updateArmStatus(armed) {
     }
 }
 
+function isCurrentVehicle(vehicleId) {
+    return vehicleId === undefined || currentVehicle === null || vehicleId === currentVehicle;
+}
+
+function updateVehicleList({ vehicles, selected }) {
+    const vehicleSelect = document.getElementById('vehicleSelect');
+    if (currentVehicle === null) currentVehicle = selected;
+    if (!vehicleSelect) return;
+    vehicleSelect.innerHTML = vehicles.map(v =>
+        `<option value="${v.id}">Vehicle ${v.id}</option>`
+    ).join('');
+    vehicleSelect.value = currentVehicle;
+    vehicleSelect.style.display = vehicles.length > 1 ? '' : 'none';
+}
+
+// Fly and watch another vehicle; the server moves our telemetry subscription
+function selectVehicle(vehicleId) {
+    socket.emit('select_vehicle', { vehicle_id: vehicleId }, (reply) => {
+        if (!reply.ok) {
+            showStatusMessage(reply.error);
+            return;
+        }
+        currentVehicle = reply.vehicle_id;
+        lastTelemetryPosition = null;
+        updateArmStatus(reply.armed);
+        showStatusMessage(`Vehicle ${currentVehicle} selected`);
+    });
+}
+
+function setupVehicleSelect() {
+    const vehicleSelect = document.getElementById('vehicleSelect');
+    if (vehicleSelect) {
+        vehicleSelect.addEventListener('change', (event) => selectVehicle(event.target.value));
+    }
+}
+
 function handleConnect() {
     console.log('Connected to server');
+    // A new keyframe follows the subscription, so drop any stale delta state
+    lastTelemetryPosition = null;
+    // The server starts us on its default vehicle; go back to ours after a reconnect
+    if (currentVehicle !== null) {
+        socket.emit('select_vehicle', { vehicle_id: currentVehicle });
+    }
+    socket.emit('telemetry_subscribe', { tier: TELEMETRY_TIER });
+    syncClock();
     hideConnectionModal();
 }
 
@@ -673,6 +940,27 @@ document.addEventListener("DOMContentLoaded", () => {
     const userVideo = document.getElementById("userCamera");
     const modeSelect = document.getElementById("modeSelect");
 
+    // MediaPipe's hands.js is only needed in hand tracking mode, so it is
+    // loaded on first use instead of with the page
+    let handsLoader = null;
+    function loadHands() {
+        if (typeof Hands !== 'undefined') return Promise.resolve();
+        if (!handsLoader) {
+            handsLoader = new Promise((resolve, reject) => {
+                const script = document.createElement("script");
+                script.src = (typeof mediapipeAssets !== 'undefined' && mediapipeAssets['hands.js'])
+                    || '/static/mediapipe/hands.js';
+                script.onload = resolve;
+                script.onerror = () => {
+                    handsLoader = null;  // retry on the next start
+                    reject(new Error(`Cannot load ${script.src}`));
+                };
+                document.head.appendChild(script);
+            });
+        }
+        return handsLoader;
+    }
+
     async function startHandTracking() {
         if (cameraStream) {
             document.getElementById("userCamera").style.display = "block";
@@ -687,12 +975,16 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         try {
+            await loadHands();
             cameraStream = await navigator.mediaDevices.getUserMedia({ video: true });
             const videoElement = document.getElementById("userCamera");
             videoElement.srcObject = cameraStream;
             videoElement.style.display = "block";
 
-            const hands = new Hands({ locateFile: (file) => `/static/mediapipe/${file}` });
+            const hands = new Hands({
+                locateFile: (file) => (typeof mediapipeAssets !== 'undefined' && mediapipeAssets[file])
+                    || `/static/mediapipe/${file}`
+            });
             hands.setOptions({
                 maxNumHands: 1,
                 modelComplexity: 1,
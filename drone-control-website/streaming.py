@@ -1,51 +1,122 @@
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from picamera2 import Picamera2
+from picamera2 import MappedArray, Picamera2
 from fastapi import Request
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 import threading
 import time
 import cv2
 import logging
 import numpy as np  # Added missing numpy import
+import metrics
+from frame_pool import FramePool, mjpeg_part, part_jpeg, placeholder_part
+from governor import create_governor
+from profiling import ProfilerBusy, SamplingProfiler, install_signal_handler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Video routes; app below serves them standalone on port 8000, asgi_app.py
+# mounts them next to the control server in one process
+router = APIRouter()
 
+# Prometheus metrics, served on /metrics
+FRAMES = metrics.counter("aerosense_capture_frames_total", "Frames captured and encoded")
+CAPTURE_ERRORS = metrics.counter("aerosense_capture_errors_total", "Frame capture failures")
+CAPTURE_FPS = metrics.gauge("aerosense_capture_fps", "Capture rate over the last 100 frames")
+STAGE_SECONDS = metrics.histogram("aerosense_capture_stage_seconds", "Time per capture loop stage", ["stage"])
+CAPTURE_STAGE = STAGE_SECONDS.labels("capture")
+CONVERT_STAGE = STAGE_SECONDS.labels("convert")
+OVERLAY_STAGE = STAGE_SECONDS.labels("overlay")
+ENCODE_STAGE = STAGE_SECONDS.labels("encode")
+ENCODE_DROPPED = metrics.counter("aerosense_encode_dropped_total", "Frames skipped because every encoder was busy")
+JPEG_BYTES = metrics.histogram("aerosense_jpeg_bytes", "Encoded JPEG frame size", buckets=metrics.SIZE_BUCKETS)
+VIEWERS = metrics.gauge("aerosense_stream_viewers", "Clients connected to /video_feed")
+FRAMES_SENT = metrics.counter("aerosense_stream_frames_sent_total", "Frames sent to viewers")
+BYTES_SENT = metrics.counter("aerosense_stream_bytes_sent_total", "MJPEG bytes sent to viewers")
 
-# Add CORS middleware to allow requests from Flask app
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins (for development only)
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Sampling profiler of all threads, started by SIGUSR1 or POST /debug/profile
+profiler = SamplingProfiler("streaming")
+
+
+# JPEG encoding runs on the capture thread by default. With
+# AEROSENSE_ENCODE_WORKERS > 0 it runs on a pool of that many threads
+# (cv2.imencode releases the GIL), so capturing the next frame overlaps
+# encoding this one; a frame that finds every encoder busy is skipped.
+ENCODE_WORKERS = int(os.environ.get("AEROSENSE_ENCODE_WORKERS", 0))
+encoder = ThreadPoolExecutor(ENCODE_WORKERS, thread_name_prefix="encode") if ENCODE_WORKERS > 0 else None
+encode_slots = threading.Semaphore(ENCODE_WORKERS)
 
-# Shared global frame buffer
+# With AEROSENSE_FRAME_POOL=1 (default) the capture loop reads each frame in
+# place from the camera's buffer and converts it into a pooled array
+# (frame_pool.py), one per frame in flight; 0 allocates fresh arrays per frame.
+FRAME_POOL = os.environ.get("AEROSENSE_FRAME_POOL", "1") == "1"
+pool = FramePool(ENCODE_WORKERS + 1)
+
+# Placeholder frames, encoded once
+CAMERA_ERROR_PART = placeholder_part("Camera Error", (50, 180), 255, (0, 0, 255))
+NO_SIGNAL_PART = placeholder_part("No Video Signal", (180, 180), 0, (255, 255, 255))
+
+# Camera pipeline settings, stepped down by the governor (governor.py) when the
+# Pi runs hot or the capture-to-publish latency misses its target
+STREAM_LADDER = [
+    {"fps": 30, "size": (640, 360), "jpeg_quality": 70},
+    {"fps": 25, "size": (640, 360), "jpeg_quality": 65},
+    {"fps": 20, "size": (640, 360), "jpeg_quality": 60},
+    {"fps": 15, "size": (480, 270), "jpeg_quality": 55},
+    {"fps": 10, "size": (320, 180), "jpeg_quality": 50},
+]
+governor = create_governor("stream", STREAM_LADDER, target_latency=0.030)
+camera_settings = None  # ladder entry the camera is configured for
+
+# Shared global frame buffer: the latest frame as an MJPEG part, built once
+# and sent as is to every viewer, and the JPEG inside it
+frame_part = None
 frame = None
+frame_seq = 0  # capture number of the published frame, so a late encode never replaces a newer one
 lock = threading.Lock()
 camera_active = False
 
+def frame_duration(settings):
+    duration = int(1000000 / settings["fps"])
+    return (duration, duration)
+
+def configure_camera(settings):
+    global camera_settings
+    config = picam2.create_video_configuration(
+        main={"size": settings["size"], "format": "XRGB8888"},
+        lores={"size": (320, 180), "format": "YUV420"},
+        controls={
+            "FrameDurationLimits": frame_duration(settings),  # 30 FPS at full quality
+            "AwbEnable": True,  # Auto white balance
+            "AeEnable": True,   # Auto exposure
+            "AfMode": 1,       # Enable autofocus (1 = Auto)
+            "AfSpeed": 2,       # Autofocus speed (1 = Normal, 2 = Fast)
+        }
+    )
+    picam2.configure(config)
+    camera_settings = settings
+
+# Apply a new governor level between frames: frame rate live, size needs a reconfigure
+def apply_camera_settings(settings):
+    global camera_settings
+    if settings["size"] != camera_settings["size"]:
+        picam2.stop()
+        configure_camera(settings)
+        picam2.start()
+    else:
+        picam2.set_controls({"FrameDurationLimits": frame_duration(settings)})
+        camera_settings = settings
+
 def initialize_camera():
-    global picam2, frame, camera_active
+    global picam2, frame_part, frame, camera_active
     try:
         picam2 = Picamera2()
-        config = picam2.create_video_configuration(
-            main={"size": (640, 360), "format": "XRGB8888"},
-            lores={"size": (320, 180), "format": "YUV420"},
-            controls={
-                "FrameDurationLimits": (33333, 33333),  # 30 FPS
-                "AwbEnable": True,  # Auto white balance
-                "AeEnable": True,   # Auto exposure
-                "AfMode": 1,       # Enable autofocus (1 = Auto)
-                "AfSpeed": 2,       # Autofocus speed (1 = Normal, 2 = Fast)
-            }
-        )
-        picam2.configure(config)
+        configure_camera(governor.settings)
         picam2.start()
         logger.info("Camera initialized successfully")
         
@@ -53,40 +124,70 @@ def initialize_camera():
         time.sleep(1)
         
         # Capture an initial frame to avoid NoneType issues
-        rgb = picam2.capture_array("main")
-        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGBA2BGR)
-        _, jpeg = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+        bgr, _ = capture_bgr()
+        try:
+            _, jpeg = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), camera_settings["jpeg_quality"]])
+        finally:
+            release_frame(bgr)
+        part = mjpeg_part(jpeg)
         
         with lock:
-            frame = jpeg.tobytes()  # Set an initial frame
+            frame_part = part  # Set an initial frame
+            frame = part_jpeg(part)
             camera_active = True
             
         logger.info("Initial frame captured")
         return True
     except Exception as e:
         logger.error(f"Camera initialization failed: {e}")
-        
-        # Create a fallback frame with error message
-        blank_frame = 255 * np.ones((360, 640, 3), dtype=np.uint8)
-        cv2.putText(blank_frame, "Camera Error: " + str(e)[:30], (50, 180), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        _, jpeg = cv2.imencode('.jpg', blank_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-        
-        with lock:
-            frame = jpeg.tobytes()
-            camera_active = False
-            
+        show_camera_error()
         return False
 
+# Publish the error placeholder and mark the camera for reinitialization
+def show_camera_error():
+    global frame_part, frame, camera_active
+    with lock:
+        frame_part = CAMERA_ERROR_PART
+        frame = part_jpeg(CAMERA_ERROR_PART)
+        camera_active = False
+
+# Grab a frame as BGR, with the time it was captured. XRGB8888 is B, G, R, X
+# in memory. Pooled frames go back with release_frame() once encoded.
+def capture_bgr():
+    if not FRAME_POOL:
+        with CAPTURE_STAGE.time():
+            rgb = picam2.capture_array("main")
+        captured = time.perf_counter()
+        with CONVERT_STAGE.time():
+            return cv2.cvtColor(rgb, cv2.COLOR_BGRA2BGR), captured
+    with CAPTURE_STAGE.time():
+        request = picam2.capture_request()
+    captured = time.perf_counter()
+    try:
+        with CONVERT_STAGE.time(), MappedArray(request, "main") as mapped:
+            width, height = camera_settings["size"]
+            # A view of the camera's buffer (rows may be padded), no copy
+            image = mapped.array[:height, :width]
+            bgr = pool.acquire((height, width, 3))
+            cv2.cvtColor(image, cv2.COLOR_BGRA2BGR, dst=bgr)
+    finally:
+        # Back to the camera as soon as it is converted
+        request.release()
+    return bgr, captured
+
+def release_frame(bgr):
+    if FRAME_POOL:
+        pool.release(bgr)
+
 # Capture frames in a background thread
 def capture_frames():
-    global frame, camera_active
     logger.info("Frame capture thread started")
     
     frame_count = 0
     start_time = time.time()
     
     while True:
+        bgr = None  # a pooled buffer not yet handed to encode_frame()
         try:
             if not camera_active:
                 logger.warning("Camera not active, attempting to reinitialize...")
@@ -96,80 +197,108 @@ def capture_frames():
                     logger.error("Failed to reinitialize camera")
                     time.sleep(5)  # Wait before trying again
                     continue
+            if governor.settings is not camera_settings:
+                apply_camera_settings(governor.settings)
 
-            rgb = picam2.capture_array("main")
-            bgr = cv2.cvtColor(rgb, cv2.COLOR_RGBA2BGR)
-            
-            # Add timestamp to frame
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            cv2.putText(bgr, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.7, (255, 255, 255), 2, cv2.LINE_AA)
+            bgr, captured = capture_bgr()
             
-            # Add telemetry placeholder - in real app this would show actual drone data
-            cv2.putText(bgr, "Camera Feed Active", (10, bgr.shape[0] - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+            with OVERLAY_STAGE.time():
+                # Add timestamp to frame
+                timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+                cv2.putText(bgr, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+                            0.7, (255, 255, 255), 2, cv2.LINE_AA)
+                
+                # Add telemetry placeholder - in real app this would show actual drone data
+                cv2.putText(bgr, "Camera Feed Active", (10, bgr.shape[0] - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
             
-            _, jpeg = cv2.imencode('.jpg', rgb, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            frame_count += 1
+            quality = camera_settings["jpeg_quality"]
+            image, bgr = bgr, None
+            if encoder is None:
+                encode_frame(image, frame_count, captured, quality)
+            elif encode_slots.acquire(blocking=False):
+                encoder.submit(encode_frame, image, frame_count, captured, quality, encode_slots)
+            else:
+                ENCODE_DROPPED.inc()
+                release_frame(image)
 
-            with lock:
-                frame = jpeg.tobytes()
-            
             # Calculate FPS every 100 frames
-            frame_count += 1
             if frame_count % 100 == 0:
                 end_time = time.time()
                 fps = 100 / (end_time - start_time)
+                CAPTURE_FPS.set(fps)
                 logger.info(f"Current FPS: {fps:.2f}")
                 start_time = time.time()
                 
             time.sleep(0.01)  # ~30 FPS
         except Exception as e:
             logger.error(f"Error capturing frame: {e}")
-            
-            # Create an error frame
-            blank_frame = 255 * np.ones((360, 640, 3), dtype=np.uint8)
-            cv2.putText(blank_frame, "Camera Error", (50, 180), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            try:
-                _, jpeg = cv2.imencode('.jpg', blank_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-                with lock:
-                    frame = jpeg.tobytes()
-                    camera_active = False
-            except Exception as inner_e:
-                logger.error(f"Error creating error frame: {inner_e}")
-                
+            CAPTURE_ERRORS.inc()
+            if bgr is not None:
+                release_frame(bgr)
+            show_camera_error()
             time.sleep(1)  # Pause briefly before retrying
 
-# Generate frames for streaming
-def generate_frames():
-    global frame
-    while True:
-        try:
-            with lock:
-                current_frame = frame
-                
-            if current_frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + current_frame + b'\r\n')
-            else:
-                # If no frame is available, send a blank frame with error message
-                blank = np.zeros((360, 640, 3), dtype=np.uint8)
-                cv2.putText(blank, "No Video Signal", (180, 180), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                _, encoded = cv2.imencode('.jpg', blank)
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + encoded.tobytes() + b'\r\n')
-                      
-            time.sleep(0.033)  # ~30 FPS
-        except Exception as e:
-            logger.error(f"Error in generate_frames: {e}")
-            time.sleep(0.5)
+# Encode a captured frame and publish it, on the capture thread or an encoder
+def encode_frame(image, seq, captured, quality, slot=None):
+    global frame_part, frame, frame_seq
+    try:
+        with ENCODE_STAGE.time():
+            _, jpeg = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        JPEG_BYTES.observe(jpeg.size)
+        # The part is the only copy of the JPEG (no tobytes())
+        part = mjpeg_part(jpeg)
+        with lock:
+            if seq > frame_seq:
+                frame_part = part
+                frame = part_jpeg(part)
+                frame_seq = seq
+        FRAMES.inc()
+        # Capture-to-publish latency, what the governor holds to its target
+        governor.observe(time.perf_counter() - captured)
+    except Exception as e:
+        logger.error(f"Error encoding frame: {e}")
+        CAPTURE_ERRORS.inc()
+    finally:
+        # The buffer goes back to the pool whether or not the encode worked
+        release_frame(image)
+        if slot is not None:
+            slot.release()
 
-@app.get("/")
-def root():
-    return {"message": "Video streaming server is running"}
+# Generate frames for streaming; async so a viewer holds no thread between frames
+async def generate_frames():
+    VIEWERS.inc()
+    try:
+        while True:
+            try:
+                with lock:
+                    chunk = frame_part
+                    
+                if chunk is None:
+                    # If no frame is available, send the no-signal placeholder
+                    chunk = NO_SIGNAL_PART
+                yield chunk
+                FRAMES_SENT.inc()
+                BYTES_SENT.inc(len(chunk))
+                          
+                await asyncio.sleep(0.033)  # ~30 FPS
+            except Exception as e:
+                logger.error(f"Error in generate_frames: {e}")
+                await asyncio.sleep(0.5)
+    finally:
+        # Runs when the client disconnects and the generator is closed
+        VIEWERS.dec()
+
+# Camera and capture thread (always started, it reconnects the camera if needed)
+def start_capture():
+    governor.start()
+    initialize_camera()
+    thread = threading.Thread(target=capture_frames, name="capture", daemon=True)
+    thread.start()
+    return thread
 
-@app.get("/video_feed")
+@router.get("/video_feed")
 def video_feed():
     return StreamingResponse(
         generate_frames(),
@@ -177,7 +306,27 @@ def video_feed():
         headers={"Access-Control-Allow-Origin": "*"}
     )
 
-@app.get("/healthcheck")
+@router.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.post("/debug/profile")
+def start_profile(seconds: float = 10.0):
+    try:
+        path = profiler.start(seconds)
+    except ProfilerBusy as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=409)
+    return {"success": True, "path": path}
+
+@router.get("/debug/profile")
+def profile_status():
+    return profiler.status()
+
+@router.get("/governor")
+def governor_state():
+    return governor.state()
+
+@router.get("/healthcheck")
 def healthcheck():
     with lock:
         has_frame = frame is not None
@@ -189,7 +338,7 @@ def healthcheck():
         "has_frame": has_frame
     }
 
-@app.post("/select_object")
+@router.post("/select_object")
 async def select_object(request: Request):
     data = await request.json()
     with lock:
@@ -224,7 +373,7 @@ async def select_object(request: Request):
             }
         }
 
-@app.get("/track_object")
+@router.get("/track_object")
 def track_object():
     # Implement your actual object tracking logic here
     # This should return current object position
@@ -250,16 +399,30 @@ def track_object(frame):
     success, bbox = tracker.update(frame)
     return success, bbox
 
+app = FastAPI()
+
+# Add CORS middleware to allow requests from Flask app
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allow all origins (for development only)
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.get("/")
+def root():
+    return {"message": "Video streaming server is running"}
+
+app.include_router(router)
+
 # Initialize everything
 if __name__ == '__main__':
     import uvicorn
     
-    # Try to initialize camera
-    camera_ready = initialize_camera()
-    
-    # Start frame capture thread (always start it, it will try to reconnect if needed)
-    thread = threading.Thread(target=capture_frames, daemon=True)
-    thread.start()
+    install_signal_handler(profiler)
+
+    start_capture()
     
     logger.info("Starting FastAPI server on port 8000")
     uvicorn.run(app, host="0.0.0.0", port=8000,ssl_keyfile="/home/GokulDragon/ssl/key.pem", 
@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import metrics
+from telemetry_codec import TelemetryEncoder
+
+logger = logging.getLogger(__name__)
+
+EMITS = metrics.counter("aerosense_socketio_emits_total", "Socket.IO emits by event", ["event"])
+EMIT_BYTES = metrics.counter("aerosense_telemetry_bytes_total",
+                             "Binary telemetry bytes sent (packet size x room size)", ["tier"])
+EMIT_SECONDS = metrics.histogram("aerosense_telemetry_emit_seconds", "Time spent in one telemetry emit call")
+LATE_TICKS = metrics.counter("aerosense_telemetry_late_ticks_total", "Telemetry ticks that started late")
+
+# One process-wide telemetry publisher.
+#
+# A single background task samples the fleet and serves every subscription
+# from one encoding per (vehicle, tier) channel: each channel has its own rate
+# and Socket.IO room, and the packet is encoded once and emitted to the room,
+# so only clients watching that vehicle at that tier receive it. It runs on
+# socketio.start_background_task / socketio.sleep, so under the eventlet
+# server it is a green thread rather than an OS thread. It idles while no
+# client is connected, and only vehicles with subscribers are sampled.
+#
+# Packets carry the vehicle id: binary 'telemetry_bin' events as a second
+# argument after the packet, JSON 'telemetry' events as a 'vehicle_id' key.
+
+# New connections get the JSON stream until they pick a binary tier
+DEFAULT_TIER = "json"
+
+
+class TelemetryTier:
+    def __init__(self, name, rate_hz, binary=True, delta=False):
+        self.name = name
+        self.rate_hz = rate_hz
+        self.binary = binary
+        self.delta = delta
+        self.event = 'telemetry_bin' if binary else 'telemetry'
+
+
+# One vehicle's stream at one tier
+class TelemetryChannel:
+    def __init__(self, vehicle_id, tier):
+        self.vehicle_id = vehicle_id
+        self.tier = tier
+        self.room = f"telemetry:{vehicle_id}:{tier.name}"
+        self.encoder = TelemetryEncoder(delta=tier.delta) if tier.binary else None
+        self.subscribers = set()
+        self.next_due = 0.0
+        self.emitted = 0
+        self.bytes_sent = 0
+
+    def encode(self, sample, t_ms):
+        if self.encoder is not None:
+            return self.encoder.encode(sample, t_ms)
+        return dict(sample, vehicle_id=self.vehicle_id)
+
+
+def default_tiers(rate_hz=10.0):
+    return {
+        # 2 Hz keyframes for spectators and dashboards
+        "dashboard": TelemetryTier("dashboard", 2.0),
+        # 20 Hz delta-encoded stream for the pilot view
+        "pilot": TelemetryTier("pilot", 20.0, delta=True),
+        # Original JSON 'telemetry' event for older clients
+        "json": TelemetryTier("json", rate_hz, binary=False),
+    }
+
+
+class TelemetryPublisher:
+    def __init__(self, socketio, sample, rate_hz=10.0, tiers=None, namespace='/', default_vehicle=None):
+        self.socketio = socketio
+        self.sample = sample  # callable(dt, vehicle_ids) -> {vehicle_id: telemetry dict}
+        self.tiers = tiers or default_tiers(rate_hz)
+        self.namespace = namespace
+        self.default_vehicle = default_vehicle
+        self.channels = {}  # (vehicle_id, tier name) -> TelemetryChannel
+        self.client_tiers = {}  # sid -> {vehicle_id: tier name}
+        self.lock = threading.Lock()
+        self.task = None
+        self.started = time.monotonic()
+        self.ticks = 0
+        self.emitted = 0
+        self.late_ticks = 0
+        self.emit_latencies = deque(maxlen=1000)  # seconds
+        self.queue_depth = 0
+
+    @property
+    def subscribers(self):
+        return len(self.client_tiers)
+
+    def set_rate(self, rate_hz, tier="json"):
+        self.tiers[tier].rate_hz = max(0.1, float(rate_hz))
+
+    # Tier a client currently receives for a vehicle, or None
+    def client_tier(self, sid, vehicle_id=None):
+        vehicle_id = self.default_vehicle if vehicle_id is None else vehicle_id
+        return self.client_tiers.get(sid, {}).get(vehicle_id)
+
+    # Put a client in a vehicle's tier (also used to switch tiers); a client
+    # can watch several vehicles, each at one tier
+    def subscribe(self, sid, tier=DEFAULT_TIER, vehicle_id=None):
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown telemetry tier: {tier}")
+        vehicle_id = self.default_vehicle if vehicle_id is None else vehicle_id
+        with self.lock:
+            self._leave(sid, vehicle_id)
+            key = (vehicle_id, tier)
+            channel = self.channels.get(key)
+            if channel is None:
+                channel = self.channels[key] = TelemetryChannel(vehicle_id, self.tiers[tier])
+            channel.subscribers.add(sid)
+            self.client_tiers.setdefault(sid, {})[vehicle_id] = tier
+            if channel.encoder is not None:
+                channel.encoder.request_keyframe()
+            if self.task is None:
+                self.task = self.socketio.start_background_task(self._run)
+        self.socketio.server.enter_room(sid, channel.room, namespace=self.namespace)
+
+    # Stop one vehicle's stream for a client, or all of them
+    def unsubscribe(self, sid, vehicle_id=None):
+        with self.lock:
+            if vehicle_id is not None:
+                self._leave(sid, vehicle_id)
+                return
+            for watched in list(self.client_tiers.get(sid, ())):
+                self._leave(sid, watched)
+            self.client_tiers.pop(sid, None)
+
+    def _leave(self, sid, vehicle_id):
+        tier = self.client_tiers.get(sid, {}).pop(vehicle_id, None)
+        if tier is not None:
+            channel = self.channels[(vehicle_id, tier)]
+            channel.subscribers.discard(sid)
+            self.socketio.server.leave_room(sid, channel.room, namespace=self.namespace)
+
+    # Outgoing packets waiting in the Engine.IO per-client queues
+    def _outgoing_queue_depth(self):
+        try:
+            sockets = list(self.socketio.server.eio.sockets.values())
+            return sum(s.queue.qsize() for s in sockets)
+        except Exception:
+            return 0
+
+    def emit(self, channel, payload):
+        start = time.perf_counter()
+        if channel.tier.binary:
+            # A tuple goes out as two event arguments; Flask-SocketIO would
+            # pass a second positional argument on as the recipient
+            self.socketio.emit(channel.tier.event, (payload, channel.vehicle_id),
+                               to=channel.room, namespace=self.namespace)
+        else:
+            self.socketio.emit(channel.tier.event, payload, to=channel.room, namespace=self.namespace)
+        elapsed = time.perf_counter() - start
+        self.emit_latencies.append(elapsed)
+        EMIT_SECONDS.observe(elapsed)
+        EMITS.labels(channel.tier.event).inc()
+        self.emitted += 1
+        channel.emitted += 1
+        if channel.tier.binary:
+            sent = len(payload) * len(channel.subscribers)
+            channel.bytes_sent += sent
+            EMIT_BYTES.labels(channel.tier.name).inc(sent)
+
+    def _run(self):
+        logger.info("Telemetry publisher started")
+        next_tick = time.monotonic()
+        last_sample = next_tick
+        while True:
+            with self.lock:
+                active = [channel for channel in self.channels.values() if channel.subscribers]
+            if not active:
+                # Nobody listening: skip sampling and emitting until someone connects
+                self.socketio.sleep(0.25)
+                next_tick = last_sample = time.monotonic()
+                continue
+
+            now = time.monotonic()
+            samples = self.sample(now - last_sample, {channel.vehicle_id for channel in active})
+            last_sample = now
+            self.ticks += 1
+            t_ms = (now - self.started) * 1000
+            for channel in active:
+                sample = samples.get(channel.vehicle_id)
+                if sample is not None and now >= channel.next_due:
+                    self.emit(channel, channel.encode(sample, t_ms))
+                    channel.next_due = max(channel.next_due + 1.0 / channel.tier.rate_hz, now)
+            self.queue_depth = self._outgoing_queue_depth()
+
+            # Tick at the fastest active tier's rate
+            next_tick += 1.0 / max(channel.tier.rate_hz for channel in active)
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Fell behind: count it and restart the schedule instead of bursting
+                self.late_ticks += 1
+                LATE_TICKS.inc()
+                next_tick = time.monotonic()
+                delay = 0
+            self.socketio.sleep(delay)
+
+    def metrics(self):
+        latencies = sorted(self.emit_latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+
+        tiers = {name: {"rate_hz": tier.rate_hz, "subscribers": 0, "emitted": 0, "bytes_sent": 0}
+                 for name, tier in self.tiers.items()}
+        vehicles = {}
+        for channel in list(self.channels.values()):
+            totals = tiers[channel.tier.name]
+            totals["subscribers"] += len(channel.subscribers)
+            totals["emitted"] += channel.emitted
+            totals["bytes_sent"] += channel.bytes_sent
+            vehicles[channel.vehicle_id] = vehicles.get(channel.vehicle_id, 0) + len(channel.subscribers)
+
+        return {
+            "subscribers": self.subscribers,
+            "ticks": self.ticks,
+            "emitted": self.emitted,
+            "late_ticks": self.late_ticks,
+            "emit_latency_p50_ms": percentile(0.5),
+            "emit_latency_p95_ms": percentile(0.95),
+            "emit_latency_max_ms": percentile(1.0),
+            "queue_depth": self.queue_depth,
+            "tiers": tiers,
+            "vehicles": vehicles,
+        }
@@ -0,0 +1,94 @@
+import struct
+
+# Compact binary telemetry packets, sent as Socket.IO binary attachments.
+#
+# Keyframe (22 bytes, little-endian):
+#   u8  version
+#   u8  flags        bit0 armed, bit1 delta packet
+#   u16 seq
+#   u32 t_ms         server time in ms (wraps)
+#   i32 lat          1e-7 degrees
+#   i32 lon          1e-7 degrees
+#   i32 alt          centimetres
+#   u8  battery      percent
+#   u8  signal       percent
+#
+# Delta (16 bytes): same header, then i16 lat/lon/alt deltas (same units)
+# against the previous packet, then battery and signal. A keyframe is sent
+# every keyframe_interval packets, when a delta would overflow, and whenever
+# a new client joins the stream. decodeTelemetry in static/scripts.js is the
+# browser-side decoder.
+
+VERSION = 1
+FLAG_ARMED = 0x01
+FLAG_DELTA = 0x02
+
+KEYFRAME = struct.Struct("<BBHIiiiBB")
+DELTA = struct.Struct("<BBHIhhhBB")
+
+INT16_MAX = 32767
+
+
+def quantize(sample):
+    return (
+        int(round(sample["lat"] * 1e7)),
+        int(round(sample["lon"] * 1e7)),
+        int(round(sample["alt"] * 100)),
+        max(0, min(255, int(round(sample["battery"])))),
+        max(0, min(255, int(round(sample["signal"])))),
+    )
+
+
+class TelemetryEncoder:
+    def __init__(self, delta=False, keyframe_interval=50):
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.last = None
+        self.since_keyframe = 0
+
+    def request_keyframe(self):
+        self.last = None
+
+    def encode(self, sample, t_ms):
+        lat, lon, alt, battery, signal = quantize(sample)
+        flags = FLAG_ARMED if sample["armed"] else 0
+        self.seq = (self.seq + 1) & 0xFFFF
+        t_ms = int(t_ms) & 0xFFFFFFFF
+
+        if self.delta and self.last is not None and self.since_keyframe < self.keyframe_interval:
+            deltas = (lat - self.last[0], lon - self.last[1], alt - self.last[2])
+            if all(abs(d) <= INT16_MAX for d in deltas):
+                self.last = (lat, lon, alt)
+                self.since_keyframe += 1
+                return DELTA.pack(VERSION, flags | FLAG_DELTA, self.seq, t_ms, *deltas, battery, signal)
+
+        self.last = (lat, lon, alt)
+        self.since_keyframe = 0
+        return KEYFRAME.pack(VERSION, flags, self.seq, t_ms, lat, lon, alt, battery, signal)
+
+
+class TelemetryDecoder:
+    def __init__(self):
+        self.last = None
+
+    def decode(self, payload):
+        flags = payload[1]
+        if flags & FLAG_DELTA:
+            if self.last is None:
+                return None  # Waiting for a keyframe
+            _, _, seq, t_ms, dlat, dlon, dalt, battery, signal = DELTA.unpack(payload)
+            lat, lon, alt = self.last[0] + dlat, self.last[1] + dlon, self.last[2] + dalt
+        else:
+            _, _, seq, t_ms, lat, lon, alt, battery, signal = KEYFRAME.unpack(payload)
+        self.last = (lat, lon, alt)
+        return {
+            "seq": seq,
+            "t_ms": t_ms,
+            "lat": lat / 1e7,
+            "lon": lon / 1e7,
+            "alt": alt / 100,
+            "armed": bool(flags & FLAG_ARMED),
+            "battery": battery,
+            "signal": signal,
+        }
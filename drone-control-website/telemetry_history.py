@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+
+# Fixed-memory telemetry history.
+#
+# Every recorded sample goes into preallocated NumPy columns used as a ring
+# buffer: appends are O(1) and never allocate, memory is fixed at
+# capacity * ~37 bytes, and the oldest samples are overwritten once full.
+# Queries pick a time range with a binary search on each of the (at most
+# two) chronological segments of the ring and downsample it to a fixed
+# number of points, so a chart over hours of flight costs the same as a
+# chart over a minute:
+#   lttb    Largest-Triangle-Three-Buckets, keeps the visual shape of one field
+#   minmax  the min and max sample of one field per bucket, keeps every spike
+
+COLUMNS = {
+    "t": np.float64,       # unix time, seconds
+    "lat": np.float64,
+    "lon": np.float64,
+    "alt": np.float32,
+    "battery": np.float32,
+    "signal": np.float32,
+    "armed": np.uint8,
+}
+FIELDS = tuple(name for name in COLUMNS if name != "t")
+METHODS = ("lttb", "minmax")
+
+
+class TelemetryHistory:
+    def __init__(self, capacity=36000):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.head = 0  # next write position
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, t, sample):
+        with self.lock:
+            i = self.head
+            self.columns["t"][i] = t
+            for name in FIELDS:
+                self.columns[name][i] = sample[name]
+            self.head = (i + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    # Index ranges of the ring in chronological order
+    def _segments(self):
+        if self.size < self.capacity:
+            return [(0, self.size)]
+        return [(self.head, self.capacity), (0, self.head)]
+
+    # Samples with t_from <= t <= t_to, as a dict of column arrays (copies)
+    def range(self, t_from=None, t_to=None):
+        with self.lock:
+            t = self.columns["t"]
+            parts = []
+            for start, stop in self._segments():
+                segment = t[start:stop]
+                lo = start + (np.searchsorted(segment, t_from, 'left') if t_from is not None else 0)
+                hi = start + (np.searchsorted(segment, t_to, 'right') if t_to is not None else stop - start)
+                if hi > lo:
+                    parts.append(slice(lo, hi))
+            if len(parts) == 1:
+                return {name: column[parts[0]].copy() for name, column in self.columns.items()}
+            return {name: np.concatenate([column[part] for part in parts]) if parts else column[:0].copy()
+                    for name, column in self.columns.items()}
+
+    def query(self, t_from=None, t_to=None, points=1000, method="lttb", field="alt"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        if field not in FIELDS:
+            raise ValueError(f"Unknown telemetry field: {field}")
+        series = self.range(t_from, t_to)
+        count = len(series["t"])
+        if method == "lttb":
+            index = lttb(series["t"], series[field].astype(np.float64), points)
+        else:
+            index = min_max(series[field], points)
+        return count, {name: column[index] for name, column in series.items()}
+
+
+def _buckets(n, buckets):
+    return np.linspace(0, n, buckets + 1).astype(np.intp)
+
+
+# Indices of the LTTB selection of at most `points` samples
+def lttb(x, y, points):
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.linspace(0, n - 1, max(points, 0)).astype(np.intp)
+
+    # First and last points are kept, the rest are split into points - 2 buckets
+    edges = 1 + _buckets(n - 2, points - 2)
+    starts, ends = edges[:-1], edges[1:]
+    # Average of each bucket, used as the third triangle corner for the previous bucket
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    avg_x = np.append(avg_x[1:], x[n - 1])
+    avg_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(points - 2):
+        start, end = starts[b], ends[b]
+        ax, ay = x[a], y[a]
+        # Twice the triangle area (a, candidate, next bucket average); the factor doesn't matter
+        area = np.abs((ax - avg_x[b]) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y[b] - ay))
+        a = start + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+# Indices of the min and max sample of each bucket, in time order
+def min_max(y, points):
+    n = len(y)
+    buckets = max(1, points // 2)
+    if n <= points:
+        return np.arange(n)
+    starts = _buckets(n, buckets)[:-1]
+    bucket = np.repeat(np.arange(buckets), np.diff(_buckets(n, buckets)))
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    # First index per bucket that hits the bucket's min/max
+    first_min = np.flatnonzero(y == mins[bucket])
+    first_min = first_min[np.unique(bucket[first_min], return_index=True)[1]]
+    first_max = np.flatnonzero(y == maxs[bucket])
+    first_max = first_max[np.unique(bucket[first_max], return_index=True)[1]]
+    return np.unique(np.concatenate([first_min, first_max]))
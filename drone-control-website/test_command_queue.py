@@ -0,0 +1,79 @@
+import time
+
+from command_queue import MOVEMENT, SAFETY, SETUP, TTL, Command, CommandQueue, priority_of
+
+
+def make_queue():
+    executed = []
+    return CommandQueue(lambda command: executed.append(command.name)), executed
+
+
+def test_priorities():
+    assert [priority_of(name) for name in ("land", "stop", "disarm")] == [SAFETY] * 3
+    assert [priority_of(name) for name in ("arm", "takeoff")] == [SETUP] * 2
+    # Neutral sticks are movement, so they never preempt anything
+    assert [priority_of(name) for name in ("stable", "forward", "left")] == [MOVEMENT] * 3
+
+
+def test_drain_runs_in_priority_order():
+    queue, executed = make_queue()
+    for name in ("forward", "arm", "land"):
+        queue.put(Command(name))
+    assert queue.drain() == 2
+    # land dropped the movement command queued before it, not the setup one
+    assert executed == ["land", "arm"]
+    queue.put(Command("forward"))
+    queue.put(Command("takeoff"))
+    queue.put(Command("arm"))
+    queue.drain()
+    assert executed == ["land", "arm", "takeoff", "arm", "forward"]
+
+
+def test_latest_movement_wins():
+    queue, executed = make_queue()
+    for name in ("forward", "left", "stable"):
+        queue.put(Command(name))
+    queue.drain()
+    assert executed == ["stable"]
+    assert queue.counts["replaced"] == 2
+
+
+def test_stale_commands_are_dropped():
+    queue, executed = make_queue()
+    now = time.time()
+    queue.put(Command("forward", created=now - TTL[MOVEMENT] - 0.1))
+    queue.put(Command("arm", created=now - TTL[SETUP] - 0.1))
+    queue.put(Command("takeoff", created=now, ttl=10))
+    queue.drain()
+    assert executed == ["takeoff"]
+    assert queue.counts["stale"] == 2
+
+
+def test_creation_time_in_the_future_is_clamped():
+    command = Command("forward", created=time.time() + 3600)
+    assert command.deadline <= time.time() + 1.0 + TTL[MOVEMENT] + 0.1
+
+
+def test_safety_preempts_queued_movement():
+    queue, executed = make_queue()
+    queue.put(Command("forward"))
+    queue.put(Command("takeoff"))
+    queue.put(Command("stop"))
+    queue.drain()
+    assert executed == ["stop", "takeoff"]
+    assert queue.counts["preempted"] == 1
+
+
+def test_preemption_uses_receive_time():
+    queue, executed = make_queue()
+    # Received before the stop but put() after it: dropped
+    late = Command("forward")
+    time.sleep(0.001)
+    queue.put(Command("stop"))
+    assert queue.put(late) is False
+    # Sender's clock far behind the safety sender's: still received after the stop, so kept
+    time.sleep(0.001)
+    assert queue.put(Command("left", created=time.time() - 0.3)) is True
+    queue.drain()
+    assert executed == ["stop", "left"]
+    assert queue.counts["preempted"] == 1
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from flight_log import (FlightLogWriter, decode_floats, decode_ints, decode_times, encode_floats, encode_ints,
+                        encode_times, open_table, unzigzag, zigzag)
+
+
+def test_zigzag_round_trip():
+    values = np.array([0, -1, 1, -2, 2, 2 ** 40, -(2 ** 40)], dtype=np.int64)
+    assert list(zigzag(values)[:5]) == [0, 1, 2, 3, 4]
+    assert np.array_equal(unzigzag(zigzag(values)), values)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 1000])
+def test_times_round_trip(count):
+    rng = np.random.default_rng(count)
+    # 10 Hz samples with scheduling jitter and an occasional gap
+    steps = 100000 + rng.integers(-3000, 3000, count)
+    steps[rng.random(count) < 0.01] += 2000000
+    t = 1760000000000000 + np.cumsum(steps)
+    assert np.array_equal(decode_times(encode_times(t), count), t)
+
+
+def test_regular_times_pack_to_header():
+    t = 1760000000000000 + np.arange(1000, dtype=np.int64) * 100000
+    # Constant interval: every delta-of-delta is zero, so no bits follow the header
+    assert len(encode_times(t)) == 17
+    assert np.array_equal(decode_times(encode_times(t), len(t)), t)
+
+
+@pytest.mark.parametrize("values", [[7], [0, 1, 1, 0, 1], [5, -3, 2 ** 40, -(2 ** 40), 0]])
+def test_ints_round_trip(values):
+    values = np.array(values, dtype=np.int64)
+    assert np.array_equal(decode_ints(encode_ints(values), len(values)), values)
+
+
+@pytest.mark.parametrize("values", [
+    [1.5],
+    [12.5] * 100,
+    np.linspace(47.39, 47.40, 500),
+    [0.0, -0.0, 1e-300, -1e300, np.inf, -np.inf, 3.25],
+])
+def test_floats_round_trip(values):
+    values = np.array(values, dtype=np.float64)
+    decoded = decode_floats(encode_floats(values), len(values))
+    # Bit-exact, including the sign of zero
+    assert np.array_equal(decoded.view(np.uint64), values.view(np.uint64))
+
+
+def test_nan_round_trip():
+    values = np.array([1.0, np.nan, 2.0])
+    decoded = decode_floats(encode_floats(values), 3)
+    assert decoded[0] == 1.0 and np.isnan(decoded[1]) and decoded[2] == 2.0
+
+
+def test_repeated_floats_pack_to_header():
+    assert len(encode_floats(np.full(1000, 98.0))) == 10
+
+
+def test_writer_and_table_round_trip(tmp_path):
+    writer = FlightLogWriter(str(tmp_path), flight_id="flight", block_size=64, flush_interval=60)
+    start = 1760000000.0
+    for i in range(200):
+        writer.record("drone/1", "telemetry", start + i * 0.1,
+                      {"lat": 47.39 + i * 1e-6, "lon": 8.54, "alt": i * 0.5, "battery": 100 - i * 0.01,
+                       "signal": 99, "armed": i >= 50})
+    writer.close()
+
+    table = open_table(str(tmp_path), "flight", "drone/1")
+    assert len(table) == 200
+    rows = table.read()
+    assert np.allclose(rows["t"], start + np.arange(200) * 0.1, rtol=0, atol=1e-6)
+    assert np.array_equal(rows["alt"], np.arange(200) * 0.5)
+    assert np.array_equal(rows["armed"], (np.arange(200) >= 50).astype(np.int64))
+
+    window = table.read(start + 5, start + 9.95, columns=["alt"])
+    assert np.array_equal(window["alt"], np.arange(50, 100) * 0.5)
@@ -0,0 +1,66 @@
+import pytest
+
+from telemetry_codec import DELTA, FLAG_DELTA, KEYFRAME, TelemetryDecoder, TelemetryEncoder
+
+
+def sample(lat=47.3977419, lon=8.5455938, alt=12.34, armed=True, battery=87.4, signal=99.0):
+    return {"lat": lat, "lon": lon, "alt": alt, "armed": armed, "battery": battery, "signal": signal}
+
+
+def test_keyframe_round_trip():
+    payload = TelemetryEncoder().encode(sample(), 1234)
+    assert len(payload) == KEYFRAME.size
+    decoded = TelemetryDecoder().decode(payload)
+    assert decoded["seq"] == 1
+    assert decoded["t_ms"] == 1234
+    assert decoded["lat"] == pytest.approx(47.3977419, abs=1e-7)
+    assert decoded["lon"] == pytest.approx(8.5455938, abs=1e-7)
+    assert decoded["alt"] == pytest.approx(12.34, abs=0.01)
+    assert decoded["armed"] is True
+    assert (decoded["battery"], decoded["signal"]) == (87, 99)
+
+
+def test_delta_round_trip():
+    encoder, decoder = TelemetryEncoder(delta=True), TelemetryDecoder()
+    # A vehicle drifting north-east and climbing, disarming half way
+    track = [sample(lat=47.3977419 + i * 2e-6, lon=8.5455938 + i * 3e-6, alt=10 + i * 0.25, armed=i < 10)
+             for i in range(20)]
+    payloads = [encoder.encode(s, i * 50) for i, s in enumerate(track)]
+    assert len(payloads[0]) == KEYFRAME.size
+    assert all(len(p) == DELTA.size and p[1] & FLAG_DELTA for p in payloads[1:])
+    for s, payload in zip(track, payloads):
+        decoded = decoder.decode(payload)
+        assert decoded["lat"] == pytest.approx(s["lat"], abs=1e-7)
+        assert decoded["lon"] == pytest.approx(s["lon"], abs=1e-7)
+        assert decoded["alt"] == pytest.approx(s["alt"], abs=0.01)
+        assert decoded["armed"] == s["armed"]
+
+
+def test_delta_before_keyframe_is_skipped():
+    encoder = TelemetryEncoder(delta=True)
+    encoder.encode(sample(), 0)
+    assert TelemetryDecoder().decode(encoder.encode(sample(alt=13.0), 50)) is None
+
+
+def test_keyframe_interval_and_request():
+    encoder = TelemetryEncoder(delta=True, keyframe_interval=3)
+    kinds = [len(encoder.encode(sample(alt=10 + i), i)) for i in range(8)]
+    assert kinds == [KEYFRAME.size, DELTA.size, DELTA.size, DELTA.size] * 2
+    encoder.request_keyframe()
+    assert len(encoder.encode(sample(), 9)) == KEYFRAME.size
+
+
+def test_overflowing_delta_sends_keyframe():
+    encoder, decoder = TelemetryEncoder(delta=True), TelemetryDecoder()
+    decoder.decode(encoder.encode(sample(), 0))
+    # 0.01 degrees is 100000 units of 1e-7, past the i16 range
+    payload = encoder.encode(sample(lat=47.4077419), 50)
+    assert len(payload) == KEYFRAME.size
+    assert decoder.decode(payload)["lat"] == pytest.approx(47.4077419, abs=1e-7)
+
+
+def test_counters_wrap():
+    encoder = TelemetryEncoder()
+    encoder.seq = 0xFFFF
+    decoded = TelemetryDecoder().decode(encoder.encode(sample(), 2 ** 32 + 5))
+    assert (decoded["seq"], decoded["t_ms"]) == (0, 5)
@@ -0,0 +1,300 @@
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Vehicle backends used by the control server.
+#
+# Every backend exposes the latest VehicleState as an immutable snapshot that
+# is replaced as a whole on update, so readers (telemetry, control loop, web
+# handlers) never take a lock: `vehicle.state` is always a consistent copy.
+#
+#   SimulatedVehicle  random-walk stand-in (the old simulated_drone dict)
+#   MavlinkVehicle    real autopilot or sitl.py over MAVLink (pymavlink)
+#
+# Constructing a backend never blocks: MavlinkVehicle opens the link and
+# waits for the first heartbeat on its reader thread, so building the server
+# (or importing app.py) does not hang on an absent vehicle. Callers that
+# need a live link before acting, like hand_gesture_drone.py, call
+# wait_ready().
+
+VehicleState = namedtuple("VehicleState", [
+    "lat", "lon", "alt", "armed", "mode", "battery", "signal",
+    "roll", "pitch", "yaw", "vx", "vy", "vz", "timestamp",
+])
+VehicleState.__new__.__defaults__ = (
+    0.0, 0.0, 0.0, False, "UNKNOWN", 0.0, 0.0,
+    0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+)
+
+
+def telemetry_dict(state):
+    return {
+        'lat': state.lat,
+        'lon': state.lon,
+        'alt': state.alt,
+        'armed': state.armed,
+        'battery': state.battery,
+        'signal': state.signal,
+    }
+
+
+class VehicleBackend:
+    state = VehicleState()
+
+    # Advance simulated backends by dt seconds; real vehicles update themselves
+    def update(self, dt):
+        pass
+
+    # Block until the vehicle is connected and has reported a position;
+    # False on timeout
+    def wait_ready(self, timeout=None):
+        return True
+
+    def arm(self):
+        raise NotImplementedError
+
+    def disarm(self):
+        raise NotImplementedError
+
+    def takeoff(self, altitude):
+        raise NotImplementedError
+
+    def land(self):
+        raise NotImplementedError
+
+    # Stick setpoint from the control loop: roll/pitch/yaw/throttle in [-10, 10]
+    def send_setpoint(self, setpoint):
+        raise NotImplementedError
+
+    # Backend-specific counters for the stats endpoint
+    def stats(self):
+        return {"backend": type(self).__name__}
+
+    def close(self):
+        pass
+
+
+class SimulatedVehicle(VehicleBackend):
+    def __init__(self, lat=51.5074, lon=-0.1278, alt=10.0):
+        self.state = VehicleState(lat=lat, lon=lon, alt=alt, mode="GUIDED",
+                                  battery=85.0, signal=98.0, timestamp=time.time())
+        self.setpoint = None
+
+    def update(self, dt):
+        # Random walk scaled to the original 0.1 s step, independent of the caller's rate
+        k = min(dt, 1.0) / 0.1
+        s = self.state
+        self.state = s._replace(
+            lat=s.lat + random.uniform(-0.0001, 0.0001) * k,
+            lon=s.lon + random.uniform(-0.0001, 0.0001) * k,
+            alt=s.alt + random.uniform(-0.1, 0.1) * k,
+            battery=max(0, min(100, s.battery + random.uniform(-0.05, 0.01) * k)),
+            signal=max(0, min(100, s.signal + random.uniform(-0.5, 0.5) * k)),
+            timestamp=time.time(),
+        )
+
+    def arm(self):
+        self.state = self.state._replace(armed=True)
+
+    def disarm(self):
+        self.state = self.state._replace(armed=False)
+        self.setpoint = None
+
+    def takeoff(self, altitude):
+        self.state = self.state._replace(mode="GUIDED")
+
+    def land(self):
+        self.state = self.state._replace(mode="LAND")
+
+    def send_setpoint(self, setpoint):
+        if self.state.armed:
+            self.setpoint = setpoint
+
+
+# Messages requested from the autopilot and their rates in Hz
+DEFAULT_STREAM_RATES = {
+    "HEARTBEAT": 1,
+    "GLOBAL_POSITION_INT": 10,
+    "ATTITUDE": 10,
+    "SYS_STATUS": 2,
+    "RADIO_STATUS": 1,
+}
+
+
+class MavlinkVehicle(VehicleBackend):
+    def __init__(self, connection_string, stream_rates=None, source_system=255, timeout=30):
+        from pymavlink import mavutil
+        self.mavutil = mavutil
+        self.stream_rates = stream_rates or DEFAULT_STREAM_RATES
+        self.state = VehicleState(timestamp=time.time())
+        self.listeners = {}
+        self.running = True
+        self.send_lock = threading.Lock()
+        self.connection_string = connection_string
+        self.connected = threading.Event()   # first heartbeat seen, streams requested
+        self.positioned = threading.Event()  # first GLOBAL_POSITION_INT seen
+        # Warn once if no heartbeat arrives by then; the reader keeps listening
+        self.heartbeat_deadline = time.monotonic() + timeout
+
+        logger.info(f"Connecting to vehicle on {connection_string}")
+        self.master = mavutil.mavlink_connection(connection_string, source_system=source_system)
+
+        self.handlers = {
+            "HEARTBEAT": self._on_heartbeat,
+            "GLOBAL_POSITION_INT": self._on_position,
+            "ATTITUDE": self._on_attitude,
+            "SYS_STATUS": self._on_sys_status,
+            "RADIO_STATUS": self._on_radio_status,
+        }
+        self.reader = threading.Thread(target=self._read_loop, name="mavlink-reader", daemon=True)
+        self.reader.start()
+
+    # Ask for each message at its own rate with MAV_CMD_SET_MESSAGE_INTERVAL
+    def request_streams(self, rates):
+        mavlink = self.mavutil.mavlink
+        for name, hz in rates.items():
+            msg_id = getattr(mavlink, f"MAVLINK_MSG_ID_{name}")
+            interval_us = -1 if hz <= 0 else int(1e6 / hz)
+            self.command_long(mavlink.MAV_CMD_SET_MESSAGE_INTERVAL, msg_id, interval_us)
+
+    def command_long(self, command, *params):
+        params = list(params) + [0] * (7 - len(params))
+        with self.send_lock:
+            self.master.mav.command_long_send(self.master.target_system, self.master.target_component,
+                                              command, 0, *params)
+
+    def wait_ready(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for event in (self.connected, self.positioned):
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            if not event.wait(remaining):
+                return False
+        return True
+
+    # Register a callback for a message type, called from the reader thread
+    def on(self, msg_type, callback):
+        self.listeners.setdefault(msg_type, []).append(callback)
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                msg = self.master.recv_match(blocking=True, timeout=1)
+            except Exception as e:
+                if not self.running:
+                    break
+                logger.error(f"MAVLink read failed: {e}")
+                time.sleep(0.1)
+                continue
+            if msg is None:
+                if self.heartbeat_deadline is not None and time.monotonic() > self.heartbeat_deadline:
+                    logger.warning(f"No heartbeat from {self.connection_string} yet, still waiting")
+                    self.heartbeat_deadline = None
+                continue
+            msg_type = msg.get_type()
+            handler = self.handlers.get(msg_type)
+            if handler:
+                handler(msg)
+            for callback in self.listeners.get(msg_type, ()):
+                callback(msg)
+
+    def _on_heartbeat(self, msg):
+        # pymavlink locks target_system onto the first vehicle heartbeat
+        if msg.get_srcSystem() != self.master.target_system:
+            return
+        if not self.connected.is_set():
+            logger.info(f"Heartbeat from system {self.master.target_system}")
+            self.heartbeat_deadline = None
+            self.request_streams(self.stream_rates)
+            self.connected.set()
+        armed = bool(msg.base_mode & self.mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED)
+        self.state = self.state._replace(armed=armed, mode=self.mavutil.mode_string_v10(msg),
+                                         timestamp=time.time())
+
+    def _on_position(self, msg):
+        self.state = self.state._replace(
+            lat=msg.lat / 1e7, lon=msg.lon / 1e7, alt=msg.relative_alt / 1000.0,
+            vx=msg.vx / 100.0, vy=msg.vy / 100.0, vz=msg.vz / 100.0, timestamp=time.time())
+        self.positioned.set()
+
+    def _on_attitude(self, msg):
+        self.state = self.state._replace(roll=msg.roll, pitch=msg.pitch, yaw=msg.yaw,
+                                         timestamp=time.time())
+
+    def _on_sys_status(self, msg):
+        if msg.battery_remaining >= 0:
+            self.state = self.state._replace(battery=float(msg.battery_remaining), timestamp=time.time())
+
+    def _on_radio_status(self, msg):
+        self.state = self.state._replace(signal=msg.rssi * 100.0 / 255, timestamp=time.time())
+
+    def set_mode(self, mode):
+        mode_id = self.master.mode_mapping().get(mode)
+        if mode_id is None:
+            raise ValueError(f"Unknown mode: {mode}")
+        with self.send_lock:
+            self.master.set_mode(mode_id)
+
+    def arm(self):
+        self.command_long(self.mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1)
+
+    def disarm(self):
+        self.command_long(self.mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 0)
+
+    def takeoff(self, altitude):
+        self.set_mode("GUIDED")
+        self.command_long(self.mavutil.mavlink.MAV_CMD_NAV_TAKEOFF, 0, 0, 0, 0, 0, 0, altitude)
+
+    def land(self):
+        self.set_mode("LAND")
+
+    def send_setpoint(self, setpoint):
+        # MANUAL_CONTROL: x pitch, y roll, r yaw in [-1000, 1000], z throttle in [0, 1000]
+        with self.send_lock:
+            self.master.mav.manual_control_send(
+                self.master.target_system,
+                int(setpoint["pitch"] * 100), int(setpoint["roll"] * 100),
+                int(500 + setpoint["throttle"] * 50), int(setpoint["yaw"] * 100), 0)
+
+    def stats(self):
+        return {"backend": type(self).__name__, "connected": self.connected.is_set()}
+
+    def close(self):
+        self.running = False
+        self.master.close()
+
+
+# Build a backend from a spec: "sim" or a pymavlink connection string
+def create_vehicle(spec="sim"):
+    if spec in (None, "", "sim"):
+        return SimulatedVehicle()
+    return MavlinkVehicle(spec)
+
+
+# Build a fleet from comma-separated "[id=]backend" entries, e.g.
+# "sim", "fleet:20" or "alpha=udpin:0.0.0.0:14550,beta=udpin:0.0.0.0:14560".
+# "fleet:<count>" adds count vehicles backed by one vectorized FleetSimulator.
+# Unnamed vehicles are numbered "1", "2", ...; returns {vehicle_id: backend}.
+def create_vehicles(spec="sim"):
+    vehicles = {}
+
+    def add(vehicle_id, backend):
+        if vehicle_id in vehicles:
+            raise ValueError(f"Duplicate vehicle id: {vehicle_id}")
+        vehicles[vehicle_id] = backend
+
+    for entry in (spec or "sim").split(","):
+        name, _, backend = entry.strip().rpartition("=")
+        if backend.startswith("fleet"):
+            from fleet_sim import FleetSimulator, FleetVehicle
+            count = int(backend.partition(":")[2] or 1)
+            fleet = FleetSimulator(count)
+            for i in range(count):
+                # The first view steps the shared simulator for the whole fleet
+                add(f"{name}-{i + 1}" if name else str(len(vehicles) + 1), FleetVehicle(fleet, i, owner=i == 0))
+        else:
+            add(name or str(len(vehicles) + 1), create_vehicle(backend))
+    return vehicles
@@ -1,12 +1,26 @@
+import math
+import os
 import cv2
 import mediapipe as mp
-import math
-import numpy as np
-from collections import deque
-from dronekit import connect, VehicleMode, LocationGlobalRelative
+from pymavlink import mavutil
+import threading
 import time
 import logging
 
+# The gesture, mission and vehicle modules are shared with the web app and
+# live in drone-control-website/; run from the repository root with
+#   PYTHONPATH=drone-control-website python hand_gesture_drone.py
+from command_queue import Command, CommandQueue
+from geodesy import LocalNED, body_to_ned
+from geofence import load_geofence
+from governor import create_governor
+from gestures import FINGERS, command_for_fingers, hand_labels, landmarks_to_array
+from landmark_filter import GestureFilter
+from mission import MissionExecutor
+from profiling import SamplingProfiler, StageTimers, install_signal_handler
+from setpoint_streamer import SetpointStreamer, mavlink_sender
+from vehicle import create_vehicle
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,175 +33,215 @@ mp_draw = mp.solutions.drawing_utils
 # Initialize webcam
 cap = cv2.VideoCapture(0)
 
-# Track the last state of raised fingers using a buffer (deque)
-finger_state_history = deque(maxlen=10)  # Stores the last 10 states
+# Smooth landmarks and finger states (One-Euro filter + hysteresis instead of
+# a 10-frame majority vote, see bench_gesture_filter.py)
+gesture_filter = GestureFilter()
 
-# Connect to the drone (replace with your connection string)logger.info("Starting main loop...")
+# AEROSENSE_PROFILE_STAGES=1 logs per-stage loop timings every 10 s; SIGUSR1
+# writes a 10 s sampling profile of all threads (see profiling.py)
+stages = StageTimers("gesture loop", enabled=os.environ.get("AEROSENSE_PROFILE_STAGES") == "1")
+profiler = SamplingProfiler("hand_gesture_drone")
+
+# Hand inference rate, stepped down when the Pi runs hot or inference misses
+# its target (governor.py, AEROSENSE_GOVERNOR)
+INFERENCE_LADDER = [{"inference_hz": hz} for hz in (30, 20, 15, 10, 5)]
+governor = create_governor("inference", INFERENCE_LADDER, target_latency=0.060)
+
+# Connect to the drone (replace with your connection string)
+logger.info("Starting main loop...")
 logger.info("Webcam initialized...")
-logger.info("Drone connection established...")
 logger.info("MediaPipe hands module initialized...")
-connection_string = "172.25.192.1:14550"  # For SITL
-vehicle = connect(connection_string, wait_ready=True)
+# A pymavlink connection string (vehicle.py's MavlinkVehicle). For a local
+# stand-in run `python drone-control-website/sitl.py` and set
+# AEROSENSE_VEHICLE=127.0.0.1:14550. The link comes up in the background;
+# main() waits for it before taking off.
+connection_string = os.environ.get("AEROSENSE_VEHICLE", "172.25.192.1:14550")  # For SITL
+vehicle = create_vehicle(connection_string)
+CONNECT_TIMEOUT = 30.0
+
+# Arm, take-off and land run in the background (stepped from the camera
+# loop), so the camera loop keeps running during them
+mission = MissionExecutor(vehicle)
+mission.on_change(lambda state: logger.info(f"Mission: {state}"))
+
+# Movement gestures stream body-frame velocities while held (see
+# setpoint_streamer.py) instead of sending one-shot goto targets
+setpoints = SetpointStreamer(mavlink_sender(vehicle), rate_hz=float(os.environ.get("AEROSENSE_SETPOINT_HZ", 10)))
+GESTURE_SPEED = 2.0  # m/s sideways
+CLIMB_SPEED = 1.0    # m/s
+MIN_ALTITUDE, MAX_ALTITUDE = 5.0, 15.0  # Down/Up gestures stop here
+
+# Local NED frame around the start position, for the position readout; set
+# in main() once the vehicle has reported a position
+home = None
+last_heading = None
+
+# Optional keep-out zones (GeoJSON, see geofence.py); movement that would
+# enter one within FENCE_LOOKAHEAD seconds is refused
+geofence_path = os.environ.get("AEROSENSE_GEOFENCE")
+geofence = load_geofence(geofence_path) if geofence_path else None
+FENCE_LOOKAHEAD = 2.0
 
 # --------------------------------------------------------------------------
 # Drone Control Functions
 # --------------------------------------------------------------------------
 def arm_and_takeoff(target_altitude):
-    logger.info("Arming motors...")
-    vehicle.mode = VehicleMode("GUIDED")
-    vehicle.armed = True
-
-    while not vehicle.armed:
-        logger.info("Waiting for arming...")
-        time.sleep(1)
-
-    logger.info("Taking off!")
-    vehicle.simple_takeoff(target_altitude)
-
-    while True:
-        altitude = vehicle.location.global_relative_frame.alt
-        logger.info(f"Current Altitude: {altitude:.2f}")
-        if altitude >= target_altitude * 0.95:
-            logger.info("Reached target altitude!")
-            break
-        time.sleep(1)
+    return mission.takeoff(target_altitude)
 
 def land_drone():
-    logger.info("Landing...")
-    vehicle.mode = VehicleMode("LAND")
-
-    while vehicle.armed:
-        logger.info("Waiting for landing...")
-        time.sleep(1)
-
-    logger.info("Landed and motors disarmed.")
-
-def move_forward(distance):
-    logger.info(f"Moving forward by {distance} meters...")
-    current_location = vehicle.location.global_relative_frame
-    target_location = LocationGlobalRelative(
-        current_location.lat + (distance / 111319.9),
-        current_location.lon,
-        current_location.alt
-    )
-    vehicle.simple_goto(target_location)
-
+    return mission.land()
+
+# Stream a body-frame velocity unless it would carry the vehicle into a keep-out zone
+def hold_velocity(forward=0.0, right=0.0, down=0.0):
+    if geofence is not None:
+        location = vehicle.state
+        north, east = body_to_ned(forward, right, math.degrees(location.yaw) % 360)
+        zone = geofence.check_motion(location.lat, location.lon, location.alt, north, east, down, FENCE_LOOKAHEAD)
+        if zone is not None:
+            logger.warning(f"Movement blocked by geofence zone {zone}")
+            setpoints.release()
+            return
+    setpoints.hold(forward, right, down)
+
+# Turn to an absolute heading, once per new heading
 def yaw_drone(heading):
+    global last_heading
+    if heading == last_heading:
+        return
+    last_heading = heading
     logger.info(f"Yawing to {heading} degrees...")
-    vehicle.simple_goto(vehicle.location.global_relative_frame, heading=heading)
+    vehicle.command_long(mavutil.mavlink.MAV_CMD_CONDITION_YAW, heading, 0, 1, 0)
 
 # --------------------------------------------------------------------------
 # Gesture Detection Functions
 # --------------------------------------------------------------------------
-def calculate_angle(a, b, c):
-    ab = np.array([a[0] - b[0], a[1] - b[1]])
-    bc = np.array([c[0] - b[0], c[1] - b[1]])
-    dot_product = np.dot(ab, bc)
-    mag_ab = np.linalg.norm(ab)
-    mag_bc = np.linalg.norm(bc)
-    angle = np.arccos(dot_product / (mag_ab * mag_bc))
-    return math.degrees(angle)
-
-def get_majority_fingers_state():
-    if not finger_state_history:
-        return []
-    finger_count = {}
-    for state in finger_state_history:
-        state_tuple = tuple(sorted(state))
-        finger_count[state_tuple] = finger_count.get(state_tuple, 0) + 1
-    majority_state = max(finger_count, key=finger_count.get)
-    return list(majority_state)
-
 def check_drone_mode(fingers_raised):
-    if not fingers_raised:
+    command = command_for_fingers(fingers_raised)
+    if command:
+        commands.put(Command(command))
+
+# Runs on the command queue thread; stale or preempted commands never get here
+def execute_command(command):
+    name = command.name
+    if name == "stable":
         logger.info("Drone Stable Mode")
-    elif set(fingers_raised) == {"Thumb", "Index", "Middle", "Ring", "Pinky"}:
-        logger.info("Drone Landing")
-        land_drone()
-    elif set(fingers_raised) == {"Index", "Middle"}:
+        setpoints.release()
+    elif name == "land":
+        # Outranks take-off, so it aborts one that is still running
+        setpoints.release()
+        if land_drone():
+            logger.info("Drone Landing")
+    elif not mission.allows("move"):
+        # Movement waits until take-off finishes and stops once landing starts
+        return
+    elif name == "down":
         logger.info("Drone Down")
-        vehicle.simple_goto(vehicle.location.global_relative_frame, altitude=5)
-    elif set(fingers_raised) == {"Index"}:
+        if vehicle.state.alt > MIN_ALTITUDE:
+            hold_velocity(down=CLIMB_SPEED)
+    elif name == "up":
         logger.info("Drone Up")
-        vehicle.simple_goto(vehicle.location.global_relative_frame, altitude=15)
-    elif set(fingers_raised) == {"Index", "Middle", "Ring"}:
+        if vehicle.state.alt < MAX_ALTITUDE:
+            hold_velocity(down=-CLIMB_SPEED)
+    elif name == "yaw_x":
         logger.info("Drone X Yaw")
         yaw_drone(90)
-    elif set(fingers_raised) == {"Index", "Middle", "Ring", "Pinky"}:
+    elif name == "yaw_y":
         logger.info("Drone Y Yaw")
         yaw_drone(180)
-    elif set(fingers_raised) == {"Thumb"}:
+    elif name == "right":
         logger.info("Drone Right")
-        move_forward(5)
-    elif set(fingers_raised) == {"Pinky"}:
+        hold_velocity(right=GESTURE_SPEED)
+    elif name == "left":
         logger.info("Drone Left")
-        move_forward(-5)
+        hold_velocity(right=-GESTURE_SPEED)
+
+# Gestures become timestamped commands; land/stable preempt movement and
+# commands older than their deadline are dropped (see command_queue.py)
+commands = CommandQueue(execute_command, name="gestures")
+commands_thread = threading.Thread(target=commands.run, name="commands", daemon=True)
 
 # --------------------------------------------------------------------------
 # Main Loop
 # --------------------------------------------------------------------------
 def main():
-    # Arm and takeoff to 10 meters initially
+    global home
+    install_signal_handler(profiler)
+    if not vehicle.wait_ready(CONNECT_TIMEOUT):
+        logger.error(f"No heartbeat and position from {connection_string} within {CONNECT_TIMEOUT:.0f} s")
+        cap.release()
+        setpoints.close()
+        vehicle.close()
+        return
+    logger.info("Drone connection established...")
+    start = vehicle.state
+    home = LocalNED(start.lat, start.lon, 0.0)
+    commands_thread.start()
+    governor.start()
+    last_inference = 0.0
+
+    # Arm and take off to 10 meters in the background; gestures are processed meanwhile
     arm_and_takeoff(10)
 
     while cap.isOpened():
-        ret, frame = cap.read()
+        stages.tick()
+        mission.step()
+        with stages.stage("capture"):
+            ret, frame = cap.read()
         if not ret:
             break
 
         # Mirror and resize the frame
-        frame = cv2.flip(frame, 1)
-        frame = cv2.resize(frame, (640, 480))
-
-        # Process hand landmarks
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(rgb_frame)
-
-        if not results.multi_hand_landmarks:
-            current_fingers_raised = []
-        else:
-            current_fingers_raised = []
-            for landmarks in results.multi_hand_landmarks:
-                mp_draw.draw_landmarks(frame, landmarks, mp_hands.HAND_CONNECTIONS)
-                fingers = {
-                    "Thumb": (4, 3),
-                    "Index": (8, 6),
-                    "Middle": (12, 10),
-                    "Ring": (16, 14),
-                    "Pinky": (20, 18),
-                }
-                h, w, c = frame.shape
-                for finger_name, (tip_id, base_id) in fingers.items():
-                    tip_x = landmarks.landmark[tip_id].x
-                    tip_y = landmarks.landmark[tip_id].y
-                    base_x = landmarks.landmark[base_id].x
-                    base_y = landmarks.landmark[base_id].y
-
-                    if finger_name == "Thumb":
-                        point1 = (landmarks.landmark[0].x, landmarks.landmark[0].y)
-                        point3 = (base_x, base_y)
-                        point4 = (tip_x, tip_y)
-                        angle = calculate_angle(point1, point3, point4)
-                        if angle > 150:
-                            current_fingers_raised.append("Thumb")
-                    else:
-                        if tip_y < base_y:
-                            current_fingers_raised.append(finger_name)
-
-                    tip_x_screen = int(tip_x * w)
-                    tip_y_screen = int(tip_y * h)
-                    cv2.circle(frame, (tip_x_screen, tip_y_screen), 10, (0, 255, 0), -1)
-
-            finger_state_history.append(current_fingers_raised)
-            smoothed_fingers_raised = get_majority_fingers_state()
-            check_drone_mode(smoothed_fingers_raised)
-
-        cv2.imshow('Hand Tracking', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        with stages.stage("preprocess"):
+            frame = cv2.flip(frame, 1)
+            frame = cv2.resize(frame, (640, 480))
+
+            # Process hand landmarks
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # The governor caps the inference rate; frames between its slots are only displayed
+        results = None
+        if time.monotonic() - last_inference >= 1.0 / governor.settings["inference_hz"]:
+            last_inference = time.monotonic()
+            with stages.stage("hands.process"):
+                results = hands.process(rgb_frame)
+            governor.observe(time.monotonic() - last_inference)
+
+        if results is not None and not results.multi_hand_landmarks:
+            gesture_filter.update([], time.time())
+        elif results is not None:
+            hands_points = []
+            with stages.stage("draw"):
+                for landmarks in results.multi_hand_landmarks:
+                    mp_draw.draw_landmarks(frame, landmarks, mp_hands.HAND_CONNECTIONS)
+                    points = landmarks_to_array(landmarks)
+                    hands_points.append(points)
+                    h, w, c = frame.shape
+                    for tip_id, _ in FINGERS.values():
+                        tip_x_screen = int(points[tip_id][0] * w)
+                        tip_y_screen = int(points[tip_id][1] * h)
+                        cv2.circle(frame, (tip_x_screen, tip_y_screen), 10, (0, 255, 0), -1)
+
+            with stages.stage("gesture filter"):
+                smoothed_fingers_raised = gesture_filter.update(hands_points, time.time(), hand_labels(results))
+            with stages.stage("command"):
+                check_drone_mode(smoothed_fingers_raised)
+
+        with stages.stage("display"):
+            state = mission.state()
+            location = vehicle.state
+            north, east, _ = home.to_ned(location.lat, location.lon, 0.0)
+            cv2.putText(frame, f"{state['phase']} {state['progress'] * 100:.0f}%  alt {state['altitude']:.1f} m",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2, cv2.LINE_AA)
+            cv2.putText(frame, f"N {north:.1f} m  E {east:.1f} m", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2, cv2.LINE_AA)
+            cv2.imshow('Hand Tracking', frame)
+            key = cv2.waitKey(1)
+        if key & 0xFF == ord('q'):
             break
 
     cap.release()
     cv2.destroyAllWindows()
+    commands.stop()
+    setpoints.close()
     vehicle.close()
 
 if __name__ == "__main__":
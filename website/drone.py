@@ -1,9 +1,20 @@
-import cv2
-import mediapipe as mp
-import math
-import numpy as np
+import time
+
+_process_start = time.perf_counter()
+
 import logging
-from collections import deque
+import os
+import sys
+import threading
+
+# gestures.py, landmark_filter.py and hand_model.py are shared with the web
+# app's AI worker and live in drone-control-website/; run from the repository
+# root with
+#   PYTHONPATH=drone-control-website python website/drone.py
+from gestures import FINGERS, hand_labels, landmarks_to_array
+from hand_model import load_hands
+from landmark_filter import GestureFilter
+from startup_profile import StartupProfile
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -19,30 +30,50 @@ stream_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 logger.addHandler(stream_handler)
 
+# The startup profile reports through its own module's logger
+profile_logger = logging.getLogger("startup_profile")
+profile_logger.setLevel(logging.INFO)
+profile_logger.addHandler(file_handler)
+profile_logger.addHandler(stream_handler)
+
+# MediaPipe is imported, built and warmed up on a thread while the camera
+# opens (hand_model.py); frames are shown without detection until it is
+# ready. AEROSENSE_PROFILE_STARTUP=1 or --profile-startup logs the time spent
+# in each startup phase once the first frame has been processed.
+profile = StartupProfile(
+    enabled=os.environ.get("AEROSENSE_PROFILE_STARTUP") == "1" or "--profile-startup" in sys.argv,
+    start=_process_start,
+)
+model = None  # (mp_hands, hands, mp_draw) once loaded
+model_ready = threading.Event()
+model_failed = threading.Event()
+
+
+def load_model():
+    global model
+    try:
+        model = load_hands(profile)
+    except Exception:
+        logger.exception("Loading the hand model failed")
+        model_failed.set()
+        return
+    model_ready.set()
+
+
+threading.Thread(target=load_model, name="model", daemon=True).start()
+
+with profile.phase("import cv2"):
+    import cv2
+
 # Initialize device camera
-cap = cv2.VideoCapture(0)
-cap.set(3, 640)  # Set width
-cap.set(4, 480)  # Set height
-
-# Initialize MediaPipe hands module
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_draw = mp.solutions.drawing_utils
-
-# Track the last state of raised fingers using a buffer (deque)
-finger_state_history = deque(maxlen=2)  # Stores the last 2 states of raised fingers
-
-# Function to calculate angle between three points (in degrees)
-def calculate_angle(a, b, c):
-    ab = np.array([a[0] - b[0], a[1] - b[1]])
-    bc = np.array([c[0] - b[0], c[1] - b[1]])
-    
-    dot_product = np.dot(ab, bc)
-    mag_ab = np.linalg.norm(ab)
-    mag_bc = np.linalg.norm(bc)
-    
-    angle = np.arccos(dot_product / (mag_ab * mag_bc))  # in radians
-    return math.degrees(angle)  # convert to degrees
+with profile.phase("open camera"):
+    cap = cv2.VideoCapture(0)
+    cap.set(3, 640)  # Set width
+    cap.set(4, 480)  # Set height
+profile.mark("camera open")
+
+# Smooth landmarks and finger states (replaces the 2-frame majority vote)
+gesture_filter = GestureFilter()
 
 # Function to check the drone's mode based on raised fingers
 def check_drone_mode(fingers_raised):
@@ -63,69 +94,45 @@ def check_drone_mode(fingers_raised):
     elif set(fingers_raised) == {"Pinky"}:    
         logger.info("Drone Left")
 
-# Smooth transition: Calculate majority of raised fingers over recent frames
-def get_majority_fingers_state():
-    if len(finger_state_history) == 0:
-        return []
-    finger_count = {}
-    for state in finger_state_history:
-        state_tuple = tuple(sorted(state))  # Sort to avoid duplicate configurations
-        finger_count[state_tuple] = finger_count.get(state_tuple, 0) + 1
-    
-    majority_state = max(finger_count, key=finger_count.get)
-    return list(majority_state)
-
-while cap.isOpened():
+while cap.isOpened() and not model_failed.is_set():
     ret, frame = cap.read()
     if not ret:
         logger.error("Failed to capture frame from camera")
         break
+
+    profile.mark("first frame")
+    if not model_ready.is_set():
+        cv2.imshow('Hand Tracking', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+        continue
+    mp_hands, hands, mp_draw = model
     
     # Convert frame to RGB for MediaPipe
     results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    profile.mark("first inference")
+    profile.report()
 
     if not results.multi_hand_landmarks:
         logger.info("Drone Stable Mode")
-        current_fingers_raised = []
+        gesture_filter.update([], time.time())
     else:
-        current_fingers_raised = []
+        hands_points = []
 
         for landmarks in results.multi_hand_landmarks:
             mp_draw.draw_landmarks(frame, landmarks, mp_hands.HAND_CONNECTIONS)
 
-            # List of finger tip and base landmarks
-            fingers = {
-                "Thumb": (4, 3),
-                "Index": (8, 6),
-                "Middle": (12, 10),
-                "Ring": (16, 14),
-                "Pinky": (20, 18),
-            }
+            points = landmarks_to_array(landmarks)
+            hands_points.append(points)
 
+            # Mark finger tips
             h, w, c = frame.shape
-            for finger_name, (tip_id, base_id) in fingers.items():
-                tip_x = landmarks.landmark[tip_id].x
-                tip_y = landmarks.landmark[tip_id].y
-                base_x = landmarks.landmark[base_id].x
-                base_y = landmarks.landmark[base_id].y
-
-                if finger_name == "Thumb":
-                    point1 = (landmarks.landmark[0].x, landmarks.landmark[0].y)
-                    point3 = (base_x, base_y)
-                    point4 = (tip_x, tip_y)
-                    angle = calculate_angle(point1, point3, point4)
-                    if angle > 150:
-                        current_fingers_raised.append("Thumb")
-                else:
-                    if tip_y < base_y:
-                        current_fingers_raised.append(finger_name)
-
-                tip_x_screen = int(tip_x * w)
-                tip_y_screen = int(tip_y * h)
+            for tip_id, _ in FINGERS.values():
+                tip_x_screen = int(points[tip_id][0] * w)
+                tip_y_screen = int(points[tip_id][1] * h)
                 cv2.circle(frame, (tip_x_screen, tip_y_screen), 10, (0, 255, 0), -1)
 
-        finger_state_history.append(current_fingers_raised)
-        smoothed_fingers_raised = get_majority_fingers_state()
+        smoothed_fingers_raised = gesture_filter.update(hands_points, time.time(), hand_labels(results))
         check_drone_mode(smoothed_fingers_raised)
 
     cv2.imshow('Hand Tracking', frame)
@@ -135,3 +142,5 @@ while cap.isOpened():
 
 cap.release()
 cv2.destroyAllWindows()
+if model_failed.is_set():
+    sys.exit(1)